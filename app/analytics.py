@@ -0,0 +1,156 @@
+"""Posting history reports computed server-side with aggregation pipelines.
+
+    python -m app.analytics posts-per-day [--days 30] [--platform x] [--account default]
+    python -m app.analytics error-rate [--days 30]
+    python -m app.analytics top-sources [--days 30] [--limit 10]
+
+Only the aggregated rows come back to Python. Results are cached in Mongo for
+ANALYTICS_CACHE_SECONDS (default 300) so repeated dashboard/CLI calls are cheap.
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING
+
+from app.db_mongo import POSTED_FILTER, get_mongo_collection, get_mongo_db
+
+CACHE_SECONDS = int(os.getenv("ANALYTICS_CACHE_SECONDS", "300"))
+
+_cache_ready = False
+
+
+def _cache_collection():
+    global _cache_ready
+    col = get_mongo_db()[os.getenv("MONGO_ANALYTICS_CACHE_COLLECTION", "analytics_cache")]
+    if not _cache_ready:
+        col.create_index([("expire_at", ASCENDING)], expireAfterSeconds=0)
+        _cache_ready = True
+    return col
+
+
+def _base_match(field: str, days: int, platform: Optional[str], account_id: Optional[str]) -> Dict[str, Any]:
+    match: Dict[str, Any] = {field: {"$gte": datetime.utcnow() - timedelta(days=days)}}
+    if platform:
+        match["platform"] = platform
+    if account_id:
+        match["account_id"] = account_id
+    return match
+
+
+def posts_per_day_pipeline(days: int, platform: Optional[str] = None, account_id: Optional[str] = None) -> List[Dict]:
+    # Range on posted_at is served by the posted_at index; unposted records have posted_at null
+    return [
+        {"$match": _base_match("posted_at", days, platform, account_id)},
+        {"$group": {
+            "_id": {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$posted_at"}}, "platform": "$platform"},
+            "posts": {"$sum": 1},
+        }},
+        {"$project": {"_id": 0, "day": "$_id.day", "platform": "$_id.platform", "posts": 1}},
+        {"$sort": {"day": 1, "platform": 1}},
+    ]
+
+
+def error_rate_pipeline(days: int, platform: Optional[str] = None, account_id: Optional[str] = None) -> List[Dict]:
+    # Every attempt touches updated_at, so it is the window for attempts; served by (platform, updated_at)
+    return [
+        {"$match": _base_match("updated_at", days, platform, account_id)},
+        {"$group": {
+            "_id": "$platform",
+            "attempts": {"$sum": 1},
+            "errors": {"$sum": {"$cond": [{"$eq": [{"$type": "$posted_at"}, "date"]}, 0, 1]}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "platform": "$_id",
+            "attempts": 1,
+            "errors": 1,
+            "error_rate": {"$round": [{"$divide": ["$errors", "$attempts"]}, 4]},
+        }},
+        {"$sort": {"platform": 1}},
+    ]
+
+
+def top_sources_pipeline(
+    days: int, platform: Optional[str] = None, account_id: Optional[str] = None, limit: int = 10
+) -> List[Dict]:
+    return [
+        {"$match": {**_base_match("posted_at", days, platform, account_id), **POSTED_FILTER}},
+        # Keep only the URL's host so nothing else is carried through the pipeline
+        {"$project": {"_id": 0, "host": {"$regexFind": {"input": "$source_url", "regex": r"^https?://(?:www\.)?([^/?#]+)"}}}},
+        {"$group": {"_id": {"$ifNull": [{"$arrayElemAt": ["$host.captures", 0]}, "unknown"]}, "posts": {"$sum": 1}}},
+        {"$sort": {"posts": -1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "source": "$_id", "posts": 1}},
+    ]
+
+
+REPORTS = {
+    "posts-per-day": posts_per_day_pipeline,
+    "error-rate": error_rate_pipeline,
+    "top-sources": top_sources_pipeline,
+}
+
+
+def ensure_indexes() -> None:
+    col = get_mongo_collection()
+    col.create_index([("platform", ASCENDING), ("updated_at", ASCENDING)])
+
+
+def run_report(name: str, *, use_cache: bool = True, **params: Any) -> List[Dict[str, Any]]:
+    key = json.dumps({"report": name, **params}, sort_keys=True, default=str)
+    cache = _cache_collection() if use_cache else None
+    if cache is not None:
+        hit = cache.find_one({"_id": key, "expire_at": {"$gt": datetime.utcnow()}}, {"rows": 1})
+        if hit is not None:
+            return hit["rows"]
+
+    pipeline = REPORTS[name](**params)
+    rows = list(get_mongo_collection().aggregate(pipeline, allowDiskUse=True))
+
+    if cache is not None:
+        cache.update_one(
+            {"_id": key},
+            {"$set": {"rows": rows, "expire_at": datetime.utcnow() + timedelta(seconds=CACHE_SECONDS)}},
+            upsert=True,
+        )
+    return rows
+
+
+def _print_rows(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        print("(no data)")
+        return
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(widths[c]) for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Posting history analytics")
+    parser.add_argument("report", choices=sorted(REPORTS))
+    parser.add_argument("--days", type=int, default=30, help="Look-back window in days (default: 30)")
+    parser.add_argument("--platform", choices=["linkedin", "x"], help="Only this platform")
+    parser.add_argument("--account", help="Only this account_id")
+    parser.add_argument("--limit", type=int, default=10, help="Rows for top-sources (default: 10)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the result cache")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    ensure_indexes()
+    params: Dict[str, Any] = {"days": args.days, "platform": args.platform, "account_id": args.account}
+    if args.report == "top-sources":
+        params["limit"] = args.limit
+    rows = run_report(args.report, use_cache=not args.no_cache, **params)
+    if args.json:
+        print(json.dumps(rows, indent=2, default=str))
+    else:
+        _print_rows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Move old post records out of the hot collection, keeping a Bloom filter of the posted ones for dedup.
+
+    python -m app.archive [--older-than-days 90] [--target mongo|jsonl] [--dir archive] [--batch-size 1000] [--dry-run]
+
+Records not updated for ARCHIVE_AFTER_DAYS (records in the middle of a
+publishing lease are left alone) are copied in bulk batches to monthly
+collections (`posts_archive_2026_01`, by posted_at or else updated_at) or
+appended to gzipped JSONL files (`posts-2026-01.jsonl.gz`). Only then are they
+deleted from the hot collection, so an interrupted run never loses a record.
+
+Every archived *posted* record's (account_id, platform, source_url) goes into
+a Bloom filter stored in MONGO_ARCHIVE_SUMMARY_COLLECTION. load_post_states
+consults it for keys the hot collection does not have. A hit is confirmed
+against the archive collections; keys archived to JSONL are trusted, with a
+false-positive rate of ARCHIVE_BLOOM_FP_RATE.
+"""
+import argparse
+import gzip
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from bson import Binary, json_util
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+
+from app.db_mongo import POSTED_FILTER, PUBLISHING, PostKey, get_mongo_collection, get_mongo_db
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+SUMMARY_COLLECTION = os.getenv("MONGO_ARCHIVE_SUMMARY_COLLECTION", "posts_archive_summary")
+BLOOM_FP_RATE = float(os.getenv("ARCHIVE_BLOOM_FP_RATE", "0.001"))
+# Keys per filter; a full filter is frozen and a new one started (a scalable Bloom filter)
+BLOOM_CAPACITY = int(os.getenv("ARCHIVE_BLOOM_CAPACITY", "200000"))
+# How long a process reuses the loaded summary before re-reading it
+SUMMARY_REFRESH_SECONDS = int(os.getenv("ARCHIVE_SUMMARY_REFRESH_SECONDS", "3600"))
+
+_META_ID = "meta"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (blake2b double hashing)."""
+
+    def __init__(self, capacity: int, fp_rate: float, bits: Optional[bytearray] = None, count: int = 0):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.m = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.m + 7) // 8)
+        self.count = count
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.m for i in range(self.k))
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def to_doc(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "fp_rate": self.fp_rate, "count": self.count, "bits": Binary(bytes(self.bits))}
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> "BloomFilter":
+        return cls(doc["capacity"], doc["fp_rate"], bytearray(doc["bits"]), doc.get("count", 0))
+
+
+def bloom_key(account_id: str, platform: str, source_url: str) -> str:
+    return f"{account_id}\t{platform}\t{source_url}"
+
+
+def _month(doc: Dict[str, Any]) -> str:
+    when = doc.get("posted_at") if isinstance(doc.get("posted_at"), datetime) else doc.get("updated_at")
+    if not isinstance(when, datetime):
+        when = doc["_id"].generation_time if hasattr(doc.get("_id"), "generation_time") else datetime.utcnow()
+    return when.strftime("%Y_%m")
+
+
+def _archive_prefix() -> str:
+    return os.getenv("MONGO_ARCHIVE_PREFIX") or f"{get_mongo_collection().name}_archive_"
+
+
+class Summary:
+    """The Bloom filters and the archive locations, as stored in the summary collection."""
+
+    def __init__(self, filters: List[BloomFilter], collections: List[str], jsonl: bool):
+        self.filters = filters
+        self.collections = collections
+        self.jsonl = jsonl
+
+    def __contains__(self, key: str) -> bool:
+        return any(key in f for f in self.filters)
+
+
+def load_summary() -> Summary:
+    col = get_mongo_db()[SUMMARY_COLLECTION]
+    meta = col.find_one({"_id": _META_ID}) or {}
+    filters = [BloomFilter.from_doc(d) for d in col.find({"_id": {"$ne": _META_ID}}).sort("_id", ASCENDING)]
+    return Summary(filters, list(meta.get("collections") or []), bool(meta.get("jsonl")))
+
+
+def _save_summary(summary: Summary, first_changed: int = 0) -> None:
+    """Write the meta document and the filters from first_changed on (full filters never change again)."""
+    col = get_mongo_db()[SUMMARY_COLLECTION]
+    for i, bloom in enumerate(summary.filters):
+        if i < first_changed:
+            continue
+        col.replace_one({"_id": f"filter_{i:04d}"}, bloom.to_doc(), upsert=True)
+    col.update_one(
+        {"_id": _META_ID},
+        {"$set": {"collections": sorted(summary.collections), "jsonl": summary.jsonl, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+_cached: Optional[Summary] = None
+_cached_at = 0.0
+_cache_lock = threading.Lock()
+
+
+def _summary() -> Optional[Summary]:
+    global _cached, _cached_at
+    with _cache_lock:
+        if _cached is None or time.time() - _cached_at > SUMMARY_REFRESH_SECONDS:
+            try:
+                _cached = load_summary()
+            except Exception as exc:
+                print(f"[Archive] summary unavailable: {exc}")
+                return None
+            _cached_at = time.time()
+        return _cached
+
+
+def archived_posted(keys: Iterable[PostKey]) -> Set[PostKey]:
+    """The keys that were posted and have since been archived."""
+    summary = _summary()
+    if summary is None or not summary.filters:
+        return set()
+    maybe = [key for key in keys if bloom_key(*key) in summary]
+    if not maybe or summary.jsonl:
+        # JSONL archives cannot be queried; trust the filter
+        return set(maybe)
+    found: Set[PostKey] = set()
+    query = {"$or": [{"account_id": a, "platform": p, "source_url": u} for a, p, u in maybe], **POSTED_FILTER}
+    db = get_mongo_db()
+    for name in summary.collections:
+        for doc in db[name].find(query, {"_id": 0, "account_id": 1, "platform": 1, "source_url": 1}):
+            found.add((doc["account_id"], doc["platform"], doc["source_url"]))
+        if len(found) == len(maybe):
+            break
+    return found
+
+
+def _write_mongo(batch: Dict[str, List[Dict[str, Any]]], prefix: str) -> None:
+    db = get_mongo_db()
+    for month, docs in batch.items():
+        col = db[f"{prefix}{month}"]
+        # For confirming Bloom filter hits (archived_posted)
+        col.create_index([("source_url", ASCENDING), ("platform", ASCENDING), ("account_id", ASCENDING)])
+        try:
+            col.insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            # Already copied by an earlier, interrupted run
+            if any(err.get("code") != 11000 for err in exc.details.get("writeErrors", [])):
+                raise
+
+
+def _write_jsonl(batch: Dict[str, List[Dict[str, Any]]], directory: str, prefix: str) -> None:
+    os.makedirs(directory, exist_ok=True)
+    for month, docs in batch.items():
+        # Appending adds a gzip member; readers see one continuous stream
+        path = os.path.join(directory, f"{prefix}{month.replace('_', '-')}.jsonl.gz")
+        with gzip.open(path, "at", encoding="utf-8") as fh:
+            for doc in docs:
+                fh.write(json_util.dumps(doc) + "\n")
+
+
+def archive(
+    *,
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    target: str = "mongo",
+    directory: str = ARCHIVE_DIR,
+    batch_size: int = 1000,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """Archive records not updated for older_than_days. Returns counts of archived and posted records."""
+    if target not in ("mongo", "jsonl"):
+        raise ValueError(f"Unknown archive target: {target}")
+    col = get_mongo_collection()
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    query = {"updated_at": {"$lt": cutoff}, "status": {"$ne": PUBLISHING}}
+    prefix = _archive_prefix() if target == "mongo" else f"{col.name}-"
+    summary = load_summary()
+    if not summary.filters:
+        summary.filters.append(BloomFilter(BLOOM_CAPACITY, BLOOM_FP_RATE))
+    totals = {"archived": 0, "posted": 0}
+
+    def _flush(docs: List[Dict[str, Any]]) -> None:
+        if not docs:
+            return
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for doc in docs:
+            by_month.setdefault(_month(doc), []).append(doc)
+        posted = [d for d in docs if isinstance(d.get("posted_at"), datetime)]
+        totals["archived"] += len(docs)
+        totals["posted"] += len(posted)
+        if dry_run:
+            print(f"[Archive] would archive {len(docs)} records ({', '.join(sorted(by_month))})")
+            return
+        # 1. copy, 2. remember posted keys, 3. delete from the hot collection
+        if target == "mongo":
+            _write_mongo(by_month, prefix)
+            summary.collections = sorted(set(summary.collections) | {f"{prefix}{m}" for m in by_month})
+        else:
+            _write_jsonl(by_month, directory, prefix)
+            summary.jsonl = True
+        first_changed = len(summary.filters) - 1
+        for doc in posted:
+            if summary.filters[-1].full:
+                summary.filters.append(BloomFilter(BLOOM_CAPACITY, BLOOM_FP_RATE))
+            summary.filters[-1].add(bloom_key(doc.get("account_id"), doc.get("platform"), doc.get("source_url")))
+        _save_summary(summary, first_changed)
+        # Skip records that were updated (e.g. retried) after they were read
+        col.delete_many({"_id": {"$in": [d["_id"] for d in docs]}, "updated_at": {"$lt": cutoff}})
+        print(f"[Archive] archived {len(docs)} records ({', '.join(sorted(by_month))})")
+
+    docs: List[Dict[str, Any]] = []
+    for doc in col.find(query, batch_size=batch_size).sort("_id", ASCENDING):
+        docs.append(doc)
+        if len(docs) >= batch_size:
+            _flush(docs)
+            docs = []
+    _flush(docs)
+    return totals
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Scheduled Lambda entrypoint (Mongo target only; Lambda has no lasting disk)."""
+    return archive(older_than_days=int((event or {}).get("older_than_days") or ARCHIVE_AFTER_DAYS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old post records into monthly collections or JSONL.gz files")
+    parser.add_argument(
+        "--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS,
+        help="Archive records not updated for this many days (default: ARCHIVE_AFTER_DAYS or 90)",
+    )
+    parser.add_argument("--target", choices=["mongo", "jsonl"], default="mongo", help="Where to move records (default: mongo)")
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="Directory for --target jsonl (default: ARCHIVE_DIR or ./archive)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Records per bulk copy/delete (default: 1000)")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the records that would move")
+    args = parser.parse_args()
+    totals = archive(
+        older_than_days=args.older_than_days,
+        target=args.target,
+        directory=args.dir,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+    )
+    print(f"[Archive] done: {totals['archived']} records, {totals['posted']} posted")
+
+
+if __name__ == "__main__":
+    main()
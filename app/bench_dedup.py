@@ -0,0 +1,113 @@
+"""Benchmark of the dedup lookup against a large synthetic posts collection.
+
+    python -m app.bench_dedup [--records 1000000] [--lookups 5000] [--keep]
+
+Seeds two scratch collections with the same records, one in the legacy layout
+(ISO-string dates, `posted_at: {$ne: None}` lookup) and one in the current
+layout (BSON dates, partial `posted_dedup` index). It then times random lookups
+against both and prints the mean and p95 latency plus the keys and documents
+examined by one explained query.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from pymongo import ASCENDING
+
+from app.db_mongo import POSTED_FILTER, get_mongo_db
+
+PLATFORMS = ("linkedin", "x")
+
+
+def _seed(col, records: int, legacy: bool, batch: int = 10000) -> None:
+    col.drop()
+    col.create_index(
+        [("account_id", ASCENDING), ("platform", ASCENDING), ("source_url", ASCENDING)], unique=True
+    )
+    if not legacy:
+        col.create_index(
+            [("source_url", ASCENDING), ("platform", ASCENDING), ("account_id", ASCENDING)],
+            name="posted_dedup",
+            partialFilterExpression=POSTED_FILTER,
+        )
+    col.create_index([("posted_at", ASCENDING)])
+    start = datetime.utcnow() - timedelta(days=365)
+    rng = random.Random(42)
+    docs: List[Dict[str, Any]] = []
+    for i in range(records):
+        ts = start + timedelta(seconds=i * 30)
+        posted = rng.random() < 0.8  # roughly the share of successful posts in production
+        docs.append(
+            {
+                "account_id": "default",
+                "platform": PLATFORMS[i % 2],
+                "source_url": f"https://example.com/article/{i // 2}",
+                "title": f"Synthetic article {i // 2}",
+                "posted_at": (ts.isoformat() if legacy else ts) if posted else None,
+                "created_at": ts.isoformat() if legacy else ts,
+                "updated_at": ts.isoformat() if legacy else ts,
+            }
+        )
+        if len(docs) >= batch:
+            col.insert_many(docs, ordered=False)
+            docs = []
+    if docs:
+        col.insert_many(docs, ordered=False)
+
+
+def _time(fn: Callable[[int], Any], lookups: int, records: int) -> List[float]:
+    rng = random.Random(7)
+    samples: List[float] = []
+    for _ in range(lookups):
+        n = rng.randrange(records)
+        t0 = time.perf_counter()
+        fn(n)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def _report(label: str, samples: List[float], explain: Dict[str, Any]) -> None:
+    stats = explain.get("executionStats", {})
+    p95 = sorted(samples)[int(len(samples) * 0.95) - 1]
+    print(
+        f"{label:<8} mean={statistics.mean(samples):.3f}ms p95={p95:.3f}ms "
+        f"keysExamined={stats.get('totalKeysExamined')} docsExamined={stats.get('totalDocsExamined')}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dedup lookups: legacy string dates vs BSON dates + partial index")
+    parser.add_argument("--records", type=int, default=1_000_000, help="Records per scratch collection")
+    parser.add_argument("--lookups", type=int, default=5000, help="Random lookups per layout")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch collections afterwards")
+    args = parser.parse_args()
+
+    db = get_mongo_db()
+    legacy, current = db["posts_bench_legacy"], db["posts_bench_current"]
+    print(f"Seeding {args.records} records per layout...")
+    _seed(legacy, args.records, legacy=True)
+    _seed(current, args.records, legacy=False)
+
+    def legacy_query(n: int) -> Dict[str, Any]:
+        return {"account_id": "default", "platform": PLATFORMS[n % 2],
+                "source_url": f"https://example.com/article/{n // 2}", "posted_at": {"$ne": None}}
+
+    def current_query(n: int) -> Dict[str, Any]:
+        return {"account_id": "default", "platform": PLATFORMS[n % 2],
+                "source_url": f"https://example.com/article/{n // 2}", **POSTED_FILTER}
+
+    for label, col, build in (("legacy", legacy, legacy_query), ("current", current, current_query)):
+        samples = _time(lambda n: col.find_one(build(n), {"_id": 1}), args.lookups, args.records)
+        explain = col.find(build(1), {"_id": 1}).limit(1).explain()
+        _report(label, samples, explain)
+
+    if not args.keep:
+        legacy.drop()
+        current.drop()
+
+
+if __name__ == "__main__":
+    main()
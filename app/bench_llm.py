@@ -0,0 +1,132 @@
+"""Compare the SDK and REST LLM backends: install size, cold import time and call latency.
+
+    python -m app.bench_llm [--imports 5] [--calls 5] [--provider openai|gemini]
+
+Install size is the on-disk size of the installed distributions each backend
+needs beyond what the rest of the app already requires. Import time is measured
+in fresh interpreters, like a Lambda cold start. Call latency needs the
+provider's API key and makes --calls small requests per backend.
+"""
+import argparse
+import importlib.metadata as metadata
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable, List, Set
+
+SDK_DISTS = ("openai", "google-generativeai", "protobuf")
+# Everything else the app needs (requirements-rest.txt)
+CORE_DISTS = ("python-dotenv", "requests", "praw", "APScheduler", "pytz", "tweepy", "pymongo", "pydantic", "numpy")
+
+SDK_IMPORTS = {"openai": "openai", "gemini": "google.generativeai"}
+REST_IMPORT = "app.llm_rest"
+
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._\-]*")
+
+
+def _closure(names: Iterable[str]) -> Set[str]:
+    """Installed distributions reachable from names through their (non-extra) requirements."""
+    seen: Set[str] = set()
+    stack = list(names)
+    while stack:
+        name = stack.pop().lower().replace("_", "-")
+        if name in seen:
+            continue
+        try:
+            dist = metadata.distribution(name)
+        except metadata.PackageNotFoundError:
+            continue
+        seen.add(name)
+        for req in dist.requires or []:
+            if "extra ==" in req:
+                continue
+            match = _NAME.match(req)
+            if match:
+                stack.append(match.group(0))
+    return seen
+
+
+def _dist_size(name: str) -> int:
+    total = 0
+    for f in metadata.distribution(name).files or []:
+        try:
+            total += f.locate().stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+def install_sizes() -> Dict[str, int]:
+    core = _closure(CORE_DISTS)
+    sdk_only = _closure(SDK_DISTS) - core
+    return {"sdk": sum(_dist_size(d) for d in sdk_only), "sdk_dists": len(sdk_only), "rest": 0}
+
+
+def import_seconds(module: str, runs: int) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    samples: List[float] = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=os.getcwd())
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr else f"import {module} failed")
+        samples.append(float(out.stdout.strip()))
+    return statistics.median(samples)
+
+
+def call_latency(provider: str, backend: str, calls: int) -> List[float]:
+    from app.generate import PostGenerator
+
+    key = os.getenv("OPENAI_API_KEY" if provider == "openai" else "GEMINI_API_KEY")
+    if not key:
+        raise RuntimeError(f"{provider} API key not set")
+    gen = PostGenerator(api_key=key, provider=provider, backend=backend,
+                        model=os.getenv("OPENAI_MODEL" if provider == "openai" else "GEMINI_MODEL"))
+    gen.structured = False
+    prompt = 'Return the JSON object {"ok": true} and nothing else.'
+    samples: List[float] = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        if provider == "openai":
+            gen._openai_complete([{"role": "user", "content": prompt}])
+        else:
+            gen._gemini_complete(prompt)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SDK vs REST LLM backends")
+    parser.add_argument("--provider", choices=["openai", "gemini"], default="openai")
+    parser.add_argument("--imports", type=int, default=5, help="Fresh-interpreter import runs per backend (default: 5)")
+    parser.add_argument("--calls", type=int, default=5, help="API calls per backend; 0 skips the latency test (default: 5)")
+    args = parser.parse_args()
+
+    sizes = install_sizes()
+    print(f"install size   sdk: {sizes['sdk'] / 1e6:.1f} MB in {sizes['sdk_dists']} extra distributions   rest: 0 MB")
+
+    for backend, module in (("sdk", SDK_IMPORTS[args.provider]), ("rest", REST_IMPORT)):
+        try:
+            print(f"import {backend:<5} {module:<22} median {import_seconds(module, args.imports) * 1000:.0f} ms")
+        except RuntimeError as exc:
+            print(f"import {backend:<5} {module:<22} failed: {exc}")
+
+    if args.calls > 0:
+        for backend in ("sdk", "rest"):
+            try:
+                samples = call_latency(args.provider, backend, args.calls)
+            except Exception as exc:
+                print(f"call   {backend:<5} skipped: {exc}")
+                continue
+            # The first call includes connection setup
+            warm = samples[1:] or samples
+            print(
+                f"call   {backend:<5} first {samples[0] * 1000:.0f} ms   "
+                f"warm median {statistics.median(warm) * 1000:.0f} ms over {len(warm)} calls"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Record/replay of outbound traffic for offline, repeatable pipeline runs.
+
+HTTP is intercepted at ``requests.adapters.HTTPAdapter.send``, which covers plain
+``requests`` calls as well as tweepy and praw (both sit on requests sessions).
+The OpenAI and Gemini SDKs do not use requests, so ``PostGenerator`` routes its
+model calls through ``call()`` and the generated text is stored instead.
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+
+_lock = threading.Lock()
+_mode = OFF
+_path: Optional[str] = None
+_entries: List[Dict[str, Any]] = []
+_used: set = set()
+_original_send: Optional[Callable] = None
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when no recorded interaction matches a request."""
+
+
+def is_recording() -> bool:
+    return _mode == RECORD
+
+
+def is_replaying() -> bool:
+    return _mode == REPLAY
+
+
+def _digest(data: Any) -> str:
+    if data is None:
+        data = b""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+
+def _match(kind: str, key: str, loose_key: str) -> Dict[str, Any]:
+    # Exact key first; otherwise the next unused interaction of the same shape, so
+    # small differences (timestamps in bodies, prompt tweaks) still replay in order.
+    with _lock:
+        for field, value in (("key", key), ("loose_key", loose_key)):
+            for idx, entry in enumerate(_entries):
+                if idx in _used or entry["kind"] != kind or entry.get(field) != value:
+                    continue
+                _used.add(idx)
+                return entry
+    raise CassetteMiss(f"no recorded {kind} interaction for {loose_key}")
+
+
+def _append(entry: Dict[str, Any]) -> None:
+    with _lock:
+        _entries.append(entry)
+
+
+def _send(adapter: HTTPAdapter, request: requests.PreparedRequest, *args, **kwargs) -> requests.Response:
+    key = f"{request.method} {request.url} {_digest(request.body)}"
+    loose_key = f"{request.method} {(request.url or '').split('?')[0]}"
+
+    if _mode == REPLAY:
+        entry = _match("http", key, loose_key)
+        resp = requests.Response()
+        resp.status_code = entry["status"]
+        resp.reason = entry.get("reason") or ""
+        resp.headers = CaseInsensitiveDict(entry["headers"])
+        resp.url = entry.get("url") or request.url
+        resp.encoding = entry.get("encoding")
+        resp._content = base64.b64decode(entry["body"])
+        resp._content_consumed = True
+        resp.request = request
+        resp.connection = adapter
+        return resp
+
+    resp = _original_send(adapter, request, *args, **kwargs)
+    if _mode == RECORD:
+        body = resp.content  # reads streamed bodies too; they stay available via resp.content
+        _append(
+            {
+                "kind": "http",
+                "key": key,
+                "loose_key": loose_key,
+                "url": resp.url,
+                "status": resp.status_code,
+                "reason": resp.reason,
+                "headers": dict(resp.headers),
+                "encoding": resp.encoding,
+                "body": base64.b64encode(body).decode("ascii"),
+            }
+        )
+    return resp
+
+
+def call(kind: str, key_material: str, fn: Callable[[], Any]) -> Any:
+    """Run an SDK call through the cassette. fn must return a JSON-serialisable value."""
+    if _mode == OFF:
+        return fn()
+    key = f"{kind} {_digest(key_material)}"
+    if _mode == REPLAY:
+        return _match(kind, key, kind)["value"]
+    value = fn()
+    _append({"kind": kind, "key": key, "loose_key": kind, "value": value})
+    return value
+
+
+def activate(mode: str, path: str) -> None:
+    global _mode, _path, _original_send
+    mode = (mode or OFF).lower()
+    if mode not in (RECORD, REPLAY):
+        return
+    _entries.clear()
+    _used.clear()
+    if mode == REPLAY:
+        with open(path, "r", encoding="utf-8") as fh:
+            _entries.extend(json.load(fh)["interactions"])
+        print(f"[Cassette] Replaying {len(_entries)} interactions from {path}")
+    else:
+        print(f"[Cassette] Recording interactions to {path}")
+    if _original_send is None:
+        _original_send = HTTPAdapter.send
+        HTTPAdapter.send = _send
+    _mode, _path = mode, path
+
+
+def save() -> None:
+    if _mode != RECORD or not _path:
+        return
+    with _lock:
+        data = {"version": 1, "interactions": list(_entries)}
+    parent = os.path.dirname(_path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    with open(_path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh)
+    print(f"[Cassette] Saved {len(data['interactions'])} interactions to {_path}")
+
+
+def deactivate() -> None:
+    global _mode, _path, _original_send
+    save()
+    if _original_send is not None:
+        HTTPAdapter.send = _original_send
+        _original_send = None
+    _mode, _path = OFF, None
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import re
+import time
+from typing import Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from app import cassette
+from app.db_mongo import get_mongo_db
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+COOLDOWN_SECONDS = int(os.getenv("BREAKER_COOLDOWN_SECONDS", str(30 * 60)))
+# A probe that never reported back (e.g. the Lambda was killed) frees the slot after this long
+PROBE_TIMEOUT_SECONDS = 5 * 60
+
+# Status codes that mean the endpoint or our credential is unusable right now.
+# 429 is left to the rate limiter and other 4xx mean the endpoint itself answered.
+_OUTAGE_STATUS = re.compile(r"401|403|5\d\d")
+# The status code at the start of a post_x / post_linkedin error ("X error: 503 ...", tweepy's "403 Forbidden ...")
+_LEADING_STATUS = re.compile(r"^(?:(?:X|LinkedIn) error: )?(\d{3})\b")
+# 403s that reject the post itself rather than the credential. Only these exact messages: generic words
+# like "content" or "policy" also appear in auth/permission 403 bodies (Content-Type, app policy text)
+_CONTENT_REJECTIONS = (
+    "you are not allowed to create a tweet with duplicate content",  # X API v2
+    "status is a duplicate",  # X API v1.1 (code 187)
+    "content is a duplicate",  # LinkedIn
+)
+_OUTAGE_MARKERS = ("timed out", "timeout", "connection", "max retries exceeded", "name resolution")
+
+
+def _collection():
+    return get_mongo_db()[os.getenv("MONGO_BREAKER_COLLECTION", "circuit_breakers")]
+
+
+def _breaker_id(platform: str, credential: Optional[str]) -> str:
+    # Never store the credential itself, only a short fingerprint of it
+    fingerprint = hashlib.sha256((credential or "").encode("utf-8")).hexdigest()[:16]
+    return f"{platform}:{fingerprint}"
+
+
+def is_outage_error(error: Optional[str]) -> bool:
+    if not error:
+        return False
+    if error.startswith("rate limited"):
+        return False
+    head = error[:200]
+    lowered = head.lower()
+    status = _LEADING_STATUS.match(head)
+    if status:
+        code = status.group(1)
+        if code == "403" and any(m in lowered for m in _CONTENT_REJECTIONS):
+            return False
+        return bool(_OUTAGE_STATUS.fullmatch(code))
+    return any(m in lowered for m in _OUTAGE_MARKERS)
+
+
+def allow_request(platform: str, credential: Optional[str]) -> Tuple[bool, str]:
+    """Returns (allowed, state). In half-open state only a single caller is let through as the probe."""
+    if cassette.is_replaying():
+        return True, CLOSED
+    key = _breaker_id(platform, credential)
+    now = time.time()
+    try:
+        col = _collection()
+        doc = col.find_one({"_id": key})
+        if not doc or doc.get("state", CLOSED) == CLOSED:
+            return True, CLOSED
+
+        if doc["state"] == OPEN:
+            if now - doc.get("opened_at", 0) < COOLDOWN_SECONDS:
+                return False, OPEN
+            claimed = col.find_one_and_update(
+                {"_id": key, "state": OPEN, "opened_at": doc.get("opened_at")},
+                {"$set": {"state": HALF_OPEN, "probe_started_at": now, "updated_at": now}},
+            )
+            if claimed is not None:
+                print(f"[Breaker] {platform}: cooldown elapsed; sending probe request")
+                return True, HALF_OPEN
+            return False, HALF_OPEN
+
+        # Half-open: a probe is already in flight unless it went stale
+        claimed = col.find_one_and_update(
+            {"_id": key, "state": HALF_OPEN, "probe_started_at": {"$lte": now - PROBE_TIMEOUT_SECONDS}},
+            {"$set": {"probe_started_at": now, "updated_at": now}},
+        )
+        return claimed is not None, HALF_OPEN
+    except Exception as exc:
+        print(f"[Breaker] {platform}: breaker store unavailable ({exc}); allowing call")
+        return True, CLOSED
+
+
+def record_result(platform: str, credential: Optional[str], success: bool, error: Optional[str] = None) -> None:
+    """Feed the outcome of a publish call back into the breaker."""
+    if cassette.is_replaying():
+        return
+    if not success and error and error.startswith("rate limited"):
+        # Skipped by the rate limiter: no network call was made, nothing to learn
+        return
+    key = _breaker_id(platform, credential)
+    now = time.time()
+    try:
+        col = _collection()
+        if success or not is_outage_error(error):
+            # The endpoint answered, so it is healthy even if it rejected this particular post
+            prev = col.find_one_and_update(
+                {"_id": key},
+                {"$set": {"platform": platform, "state": CLOSED, "failures": 0, "updated_at": now},
+                 "$unset": {"opened_at": "", "probe_started_at": ""}},
+                upsert=True,
+            )
+            if prev and prev.get("state") != CLOSED:
+                print(f"[Breaker] {platform}: endpoint recovered; circuit closed")
+            return
+
+        doc = col.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"failures": 1},
+             "$set": {"platform": platform, "last_error": (error or "")[:500], "updated_at": now},
+             "$setOnInsert": {"state": CLOSED}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc.get("state") == HALF_OPEN or doc.get("failures", 0) >= FAILURE_THRESHOLD:
+            col.update_one(
+                {"_id": key},
+                {"$set": {"state": OPEN, "opened_at": now}, "$unset": {"probe_started_at": ""}},
+            )
+            print(f"[Breaker] {platform}: circuit opened for {COOLDOWN_SECONDS}s after: {(error or '')[:120]}")
+    except Exception as exc:
+        print(f"[Breaker] {platform}: failed to record result ({exc})")
@@ -1,14 +1,54 @@
+import json
 import os
-from dataclasses import dataclass
-from typing import List, Optional
+import re
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
+DEFAULT_ACCOUNT_ID = "default"
 
-@dataclass
+
+@dataclass(frozen=True)
+class AccountConfig:
+    """Publishing target: one brand's LinkedIn and X credentials."""
+
+    account_id: str
+    linkedin_access_token: Optional[str] = None
+    linkedin_person_urn: Optional[str] = None
+    x_api_key: Optional[str] = None
+    x_api_secret: Optional[str] = None
+    x_access_token: Optional[str] = None
+    x_access_token_secret: Optional[str] = None
+    x_oauth2_access_token: Optional[str] = None
+
+    @property
+    def has_x_oauth1(self) -> bool:
+        return bool(self.x_api_key and self.x_api_secret and self.x_access_token and self.x_access_token_secret)
+
+    @property
+    def has_x(self) -> bool:
+        return self.has_x_oauth1 or bool(self.x_oauth2_access_token)
+
+    @property
+    def x_credential(self) -> Optional[str]:
+        return self.x_access_token if self.has_x_oauth1 else self.x_oauth2_access_token
+
+
+def account_from_dict(data: Dict[str, Any]) -> AccountConfig:
+    known = {f.name for f in fields(AccountConfig)}
+    values = {k: v for k, v in data.items() if k in known}
+    values["account_id"] = str(data.get("account_id") or DEFAULT_ACCOUNT_ID)
+    return AccountConfig(**values)
+
+
+@dataclass(frozen=True)
 class AppConfig:
+    """Runtime configuration. Immutable; build it once per process via get_config()."""
+
     openai_api_key: str
 
     reddit_client_id: Optional[str]
@@ -36,7 +76,32 @@ class AppConfig:
     gemini_model: Optional[str]
     openai_model: Optional[str]
 
-    keywords: List[str]
+    # Deduped, lower-cased keywords
+    keywords: Tuple[str, ...]
+
+    # Publishing targets; "mongo" means load them from the accounts collection at run time
+    accounts: Tuple[AccountConfig, ...] = ()
+    accounts_source: str = "env"
+    publish_concurrency: int = 4
+    # "inline" posts in the run; "queue" sends one SQS job per post/account/platform to publish_handler
+    publish_mode: str = "inline"
+    publish_queue_url: Optional[str] = None
+
+    # Derived once in read_config so fetchers don't recompute them per run
+    keyword_pattern: Optional[Pattern] = None
+    x_query_shards: Tuple[str, ...] = ()
+    subreddits: Tuple[str, ...] = ()
+
+    # "sdk" or "rest" (app/llm_rest.py, no openai/google-generativeai packages needed)
+    llm_backend: str = "sdk"
+
+    # Source orchestration (see app/sources.py)
+    sources: Tuple[str, ...] = ("x", "reddit")
+    rss_feeds: Tuple[str, ...] = ()
+    source_strategy: str = "all"
+    source_deadline_seconds: float = 20.0
+    source_quota: int = 10
+    x_max_results: int = 10
 
 
 DEFAULT_KEYWORDS = [
@@ -149,12 +214,77 @@ DEFAULT_KEYWORDS = [
 ]
 
 
+_SUBREDDIT_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_]{1,20}$")
+
+
+def normalize_keywords(keywords: Iterable[str]) -> Tuple[str, ...]:
+    seen = set()
+    out: List[str] = []
+    for k in keywords:
+        kl = k.strip().lower()
+        if not kl or kl in seen:
+            continue
+        seen.add(kl)
+        out.append(kl)
+    return tuple(out)
+
+
+def compile_keyword_pattern(keywords: Iterable[str]) -> Pattern:
+    # Same substring semantics as a per-keyword `k in text`, in a single scan.
+    # Longest first so overlapping alternatives don't shadow each other.
+    alternatives = sorted({re.escape(k) for k in keywords if k}, key=len, reverse=True)
+    return re.compile("|".join(alternatives) or r"(?!)", re.IGNORECASE)
+
+
+def validate_subreddits(names: Iterable[str]) -> Tuple[str, ...]:
+    seen = set()
+    out: List[str] = []
+    for name in names:
+        name = name.strip()
+        if not _SUBREDDIT_NAME.match(name) or name.lower() in seen:
+            continue
+        seen.add(name.lower())
+        out.append(name)
+    return tuple(out)
+
+
+def _read_accounts() -> Tuple[AccountConfig, ...]:
+    accounts_env = os.getenv("ACCOUNTS_JSON")
+    if accounts_env:
+        return tuple(account_from_dict(d) for d in json.loads(accounts_env))
+    # Single-account setup: the top-level credentials form the default account
+    return (
+        AccountConfig(
+            account_id=os.getenv("ACCOUNT_ID", DEFAULT_ACCOUNT_ID),
+            linkedin_access_token=os.getenv("LINKEDIN_ACCESS_TOKEN"),
+            linkedin_person_urn=os.getenv("LINKEDIN_PERSON_URN"),
+            x_api_key=os.getenv("X_API_KEY"),
+            x_api_secret=os.getenv("X_API_SECRET"),
+            x_access_token=os.getenv("X_ACCESS_TOKEN"),
+            x_access_token_secret=os.getenv("X_ACCESS_TOKEN_SECRET"),
+            x_oauth2_access_token=os.getenv("X_OAUTH2_ACCESS_TOKEN"),
+        ),
+    )
+
+
+def _csv(value: str, lower: bool = False) -> Tuple[str, ...]:
+    parts = (p.strip() for p in value.split(","))
+    return tuple(dict.fromkeys(p.lower() if lower else p for p in parts if p))
+
+
 def read_config() -> AppConfig:
+    # Imported here: the fetchers import modules that depend on this one
+    from app.fetch_reddit import DEFAULT_SUBREDDITS
+    from app.fetch_x import build_query_shards
+
     keywords_env = os.getenv("KEYWORDS", None)
     if keywords_env:
-        keywords = [k.strip() for k in keywords_env.split(",") if k.strip()]
+        keywords = normalize_keywords(keywords_env.split(","))
     else:
-        keywords = DEFAULT_KEYWORDS
+        keywords = normalize_keywords(DEFAULT_KEYWORDS)
+
+    subreddits_env = os.getenv("SUBREDDITS", None)
+    subreddits = validate_subreddits(subreddits_env.split(",") if subreddits_env else DEFAULT_SUBREDDITS)
 
     return AppConfig(
         openai_api_key=os.getenv("OPENAI_API_KEY", ""),
@@ -178,5 +308,26 @@ def read_config() -> AppConfig:
         keywords=keywords,
         gemini_api_key=os.getenv('GEMINI_API_KEY'),
         gemini_model=os.getenv('GEMINI_MODEL'),
-        openai_model=os.getenv('OPENAI_MODEL')
+        openai_model=os.getenv('OPENAI_MODEL'),
+        accounts=_read_accounts(),
+        accounts_source=os.getenv("ACCOUNTS_SOURCE", "env").lower(),
+        publish_concurrency=int(os.getenv("PUBLISH_CONCURRENCY", "4")),
+        publish_mode=os.getenv("PUBLISH_MODE", "inline").lower(),
+        publish_queue_url=os.getenv("PUBLISH_QUEUE_URL") or None,
+        keyword_pattern=compile_keyword_pattern(keywords),
+        x_query_shards=tuple(build_query_shards(list(keywords))),
+        subreddits=subreddits,
+        sources=_csv(os.getenv("SOURCES", "x,reddit"), lower=True),
+        rss_feeds=_csv(os.getenv("RSS_FEEDS", "")),
+        llm_backend=os.getenv("LLM_BACKEND", "sdk").lower(),
+        source_strategy=os.getenv("SOURCE_STRATEGY", "all").lower(),
+        source_deadline_seconds=float(os.getenv("SOURCE_DEADLINE_SECONDS", "20")),
+        source_quota=int(os.getenv("SOURCE_QUOTA", "10")),
+        x_max_results=int(os.getenv("X_MAX_RESULTS", "10")),
     )
+
+
+@lru_cache(maxsize=1)
+def get_config() -> AppConfig:
+    """Process-wide config; warm Lambda invocations reuse it without re-reading the environment."""
+    return read_config()
@@ -1,46 +1,253 @@
 import os
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 from dotenv import load_dotenv
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, ASCENDING, UpdateOne
 from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+from app.config import DEFAULT_ACCOUNT_ID
 
 load_dotenv()
 
+_CLIENT: Optional[MongoClient] = None
+_INDEXED: Set[str] = set()
+
+# Successfully posted records, i.e. the ones the dedup check looks for
+POSTED_FILTER: Dict[str, Any] = {"posted_at": {"$type": "date"}}
+
+# Publishing lease states (see claim_post/finalize_post)
+PUBLISHING = "publishing"
+POSTED = "posted"
+FAILED = "failed"
+# Released without calling the platform (e.g. circuit open); left for a later run
+PENDING = "pending"
+# Error prefix of records left pending because the account has no credentials for the platform
+MISSING_CREDENTIALS = "pending: missing "
+
+PLATFORMS = ("linkedin", "x")
+
+
+def post_retention() -> timedelta:
+    # Errored/pending records are removed by the TTL index after this long without an update
+    return timedelta(days=int(os.getenv("POST_RETENTION_DAYS", "30")))
+
+
+def get_mongo_client() -> MongoClient:
+    # One client per process; MongoClient pools connections internally
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    return _CLIENT
+
+
+def reset_mongo_client() -> None:
+    global _CLIENT
+    if _CLIENT is not None:
+        try:
+            _CLIENT.close()
+        except Exception:
+            pass
+    _CLIENT = None
+    _INDEXED.clear()
+
+
+def ping_mongo() -> bool:
+    try:
+        get_mongo_client().admin.command("ping")
+        return True
+    except Exception as exc:
+        print(f"[Mongo] ping failed: {exc}")
+        return False
+
+
+def get_mongo_db() -> Database:
+    return get_mongo_client()[os.getenv("MONGO_DB", "autoposter")]
+
 
 def get_mongo_collection() -> Collection:
-    uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-    db_name = os.getenv("MONGO_DB", "autoposter")
     col_name = os.getenv("MONGO_COLLECTION", "posts")
-    client = MongoClient(uri)
-    db = client[db_name]
-    col = db[col_name]
-    # Ensure unique index per platform+source_url
-    col.create_index([("platform", ASCENDING), ("source_url", ASCENDING)], unique=True)
+    col = get_mongo_db()[col_name]
+    if col_name in _INDEXED:
+        return col
+    # Ensure unique index per account+platform+source_url
+    col.create_index(
+        [("account_id", ASCENDING), ("platform", ASCENDING), ("source_url", ASCENDING)],
+        unique=True,
+    )
+    # Dedup lookups only care about posted records; a partial index keeps that index small
+    col.create_index(
+        [("source_url", ASCENDING), ("platform", ASCENDING), ("account_id", ASCENDING)],
+        name="posted_dedup",
+        partialFilterExpression=POSTED_FILTER,
+    )
     # Index on posted_at for queries
     col.create_index([("posted_at", ASCENDING)])
+    # TTL: expire_at is only set on errored/pending records
+    col.create_index([("expire_at", ASCENDING)], expireAfterSeconds=0)
+    _INDEXED.add(col_name)
     return col
 
 
 def initialize_database() -> None:
-    _ = get_mongo_collection()
+    col = get_mongo_collection()
+    # Records written before multi-account support belong to the default account
+    col.update_many({"account_id": {"$exists": False}}, {"$set": {"account_id": DEFAULT_ACCOUNT_ID}})
+    try:
+        # The old per-platform unique index would block posting one URL from several accounts
+        col.drop_index("platform_1_source_url_1")
+    except OperationFailure:
+        pass
+    # Records from before BSON dates hold posted_at as an ISO string, which POSTED_FILTER reads as
+    # not posted; convert them before anything is claimed or reposted (the posted_at index keeps
+    # this check cheap once they are gone)
+    if col.find_one({"posted_at": {"$type": "string"}}, {"_id": 1}) is not None:
+        from app.migrate_dates import migrate
+
+        migrate()
+
 
+def fetch_accounts() -> List[Dict[str, Any]]:
+    col = get_mongo_db()[os.getenv("MONGO_ACCOUNTS_COLLECTION", "accounts")]
+    return list(col.find({"enabled": {"$ne": False}}, {"_id": 0}))
 
-def has_been_posted(platform: str, source_url: str) -> bool:
+
+def fetch_tenants() -> List[Dict[str, Any]]:
+    col = get_mongo_db()[os.getenv("MONGO_TENANTS_COLLECTION", "tenants")]
+    return list(col.find({"enabled": {"$ne": False}}, {"_id": 0}).sort("tenant_id", ASCENDING))
+
+
+def has_been_posted(platform: str, source_url: str, account_id: str = DEFAULT_ACCOUNT_ID) -> bool:
     col = get_mongo_collection()
-    doc = col.find_one({"platform": platform, "source_url": source_url, "posted_at": {"$ne": None}}, {"_id": 1})
+    doc = col.find_one(
+        {"account_id": account_id, "platform": platform, "source_url": source_url, **POSTED_FILTER},
+        {"_id": 1},
+    )
     print(f"Already posted check: ",doc)
-    return doc is not None
+    if doc is None:
+        from app.archive import archived_posted
 
+        return bool(archived_posted([(account_id, platform, source_url)]))
+    return True
 
-def exists_record(platform: str, source_url: str) -> bool:
+
+def exists_record(platform: str, source_url: str, account_id: str = DEFAULT_ACCOUNT_ID) -> bool:
     col = get_mongo_collection()
-    doc = col.find_one({"platform": platform, "source_url": source_url}, {"_id": 1})
+    doc = col.find_one({"account_id": account_id, "platform": platform, "source_url": source_url}, {"_id": 1})
     return doc is not None
 
 
+PostKey = Tuple[str, str, str]  # (account_id, platform, source_url)
+
+
+def load_post_states(account_ids: Iterable[str], source_urls: Iterable[str]) -> Dict[PostKey, bool]:
+    """One query for every record a run may touch: key -> whether it was posted successfully.
+
+    Keys missing from the hot collection are checked against the archive summary (app/archive.py).
+    """
+    from app.archive import archived_posted
+
+    account_ids, source_urls = list(set(account_ids)), list(set(source_urls))
+    col = get_mongo_collection()
+    cursor = col.find(
+        {"account_id": {"$in": account_ids}, "source_url": {"$in": source_urls}},
+        {"_id": 0, "account_id": 1, "platform": 1, "source_url": 1, "posted_at": 1},
+    )
+    states = {(d.get("account_id"), d.get("platform"), d.get("source_url")): d.get("posted_at") is not None for d in cursor}
+    missing = [
+        (a, p, u) for a in account_ids for p in PLATFORMS for u in source_urls if (a, p, u) not in states
+    ]
+    for key in archived_posted(missing):
+        states[key] = True
+    return states
+
+
+def _post_upsert(
+    *,
+    account_id: str,
+    platform: str,
+    source: str,
+    source_url: str,
+    title: Optional[str],
+    linkedin_text: Optional[str],
+    x_text: Optional[str],
+    success: bool,
+    error: Optional[str],
+    posted_at: Optional[datetime],
+    post_id: Optional[str] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    now = datetime.utcnow()
+    update: Dict[str, Any] = {
+        "$set": {
+            "title": title,
+            "linkedin_text": linkedin_text,
+            "x_text": x_text,
+            "posted_at": (posted_at or now) if success else None,
+            "error": error,
+            "updated_at": now,
+        },
+        # Written once, when the record is first created
+        "$setOnInsert": {"source": source, "created_at": now},
+    }
+    if success:
+        update["$unset"] = {"expire_at": ""}
+        if post_id:
+            # Platform id of the created tweet/share, used by the metrics sync
+            update["$set"]["post_id"] = post_id
+    query: Dict[str, Any] = {"account_id": account_id, "platform": platform, "source_url": source_url}
+    if not success:
+        update["$set"]["expire_at"] = now + post_retention()
+        # A failure must never overwrite a record another worker has since posted;
+        # the upsert then hits the unique index and is dropped (see PostWriteBuffer.flush)
+        query["posted_at"] = {"$not": {"$type": "date"}}
+    return query, update
+
+
+class PostWriteBuffer:
+    """Collects post records for a run and writes them with one unordered bulk_write.
+
+    Flushes when max_ops records are pending and when used as a context manager exits.
+    Safe to share between the publisher threads.
+    """
+
+    def __init__(self, max_ops: Optional[int] = None):
+        self.max_ops = max_ops or int(os.getenv("POST_WRITE_BUFFER_SIZE", "500"))
+        self._ops: List[UpdateOne] = []
+        self._lock = threading.Lock()
+
+    def add(self, op: UpdateOne) -> None:
+        with self._lock:
+            self._ops.append(op)
+            full = len(self._ops) >= self.max_ops
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            ops, self._ops = self._ops, []
+        if not ops:
+            return
+        try:
+            get_mongo_collection().bulk_write(ops, ordered=False)
+        except BulkWriteError as exc:
+            errors = [e for e in exc.details.get("writeErrors", []) if e.get("code") != 11000]
+            if errors:
+                print(f"[Mongo] {len(errors)} of {len(ops)} post record writes failed: {errors[0].get('errmsg')}")
+        except Exception as exc:
+            print(f"[Mongo] bulk write of {len(ops)} post records failed: {exc}")
+
+    def __enter__(self) -> "PostWriteBuffer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.flush()
+
+
 def record_post(
     *,
+    account_id: str = DEFAULT_ACCOUNT_ID,
     platform: str,
     source: str,
     source_url: str,
@@ -50,44 +257,176 @@ def record_post(
     success: bool,
     error: Optional[str] = None,
     posted_at: Optional[datetime] = None,
+    post_id: Optional[str] = None,
+    buffer: Optional[PostWriteBuffer] = None,
 ) -> None:
-    col = get_mongo_collection()
-    doc: Dict[str, Any] = {
-        "platform": platform,
-        "source": source,
-        "source_url": source_url,
-        "title": title,
-        "linkedin_text": linkedin_text,
-        "x_text": x_text,
-        "posted_at": (posted_at or datetime.utcnow()).isoformat() if success else None,
-        "error": error,
-        "updated_at": datetime.utcnow().isoformat(),
-        "created_at": datetime.utcnow().isoformat(),
-    }
-    col.update_one(
-        {"platform": platform, "source_url": source_url},
-        {"$set": doc},
-        upsert=True,
+    query, update = _post_upsert(
+        account_id=account_id,
+        platform=platform,
+        source=source,
+        source_url=source_url,
+        title=title,
+        linkedin_text=linkedin_text,
+        x_text=x_text,
+        success=success,
+        error=error,
+        posted_at=posted_at,
+        post_id=post_id,
     )
+    if buffer is not None:
+        buffer.add(UpdateOne(query, update, upsert=True))
+        return
+    try:
+        get_mongo_collection().update_one(query, update, upsert=True)
+    except DuplicateKeyError:
+        pass  # failure for a record that is already posted
 
 
-def fetch_pending_posts(platform: str, limit: int = 10) -> List[Dict[str, Any]]:
-    col = get_mongo_collection()
-    cursor = col.find({"platform": platform, "posted_at": None}).sort("_id", ASCENDING).limit(limit)
-    return list(cursor)
+def claim_post(
+    *,
+    account_id: str = DEFAULT_ACCOUNT_ID,
+    platform: str,
+    source: str,
+    source_url: str,
+    title: Optional[str],
+    linkedin_text: Optional[str],
+    x_text: Optional[str],
+    owner: str,
+    lease_seconds: Optional[int] = None,
+) -> bool:
+    """Atomically take the publishing lease on one record before calling the platform.
+
+    Succeeds when the record is new, not yet posted and not leased, or its lease
+    expired. A posted or currently leased record makes the filter miss, the upsert
+    then hits the unique index, and the claim is lost.
+    """
+    now = datetime.utcnow()
+    lease = timedelta(seconds=lease_seconds or int(os.getenv("PUBLISH_LEASE_SECONDS", "120")))
+    try:
+        get_mongo_collection().update_one(
+            {
+                "account_id": account_id,
+                "platform": platform,
+                "source_url": source_url,
+                "posted_at": {"$not": {"$type": "date"}},
+                "$or": [{"status": {"$ne": PUBLISHING}}, {"lease_expires_at": {"$lt": now}}],
+            },
+            {
+                "$set": {
+                    "status": PUBLISHING,
+                    "owner": owner,
+                    "lease_expires_at": now + lease,
+                    "title": title,
+                    "linkedin_text": linkedin_text,
+                    "x_text": x_text,
+                    "updated_at": now,
+                    "expire_at": now + post_retention(),
+                },
+                "$setOnInsert": {"source": source, "created_at": now, "posted_at": None},
+            },
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+def finalize_post(
+    *,
+    account_id: str = DEFAULT_ACCOUNT_ID,
+    platform: str,
+    source_url: str,
+    owner: str,
+    success: bool,
+    error: Optional[str] = None,
+    post_id: Optional[str] = None,
+    pending: bool = False,
+) -> bool:
+    """Release the lease taken by claim_post and store the outcome. Written immediately, never buffered.
+
+    pending releases a claim whose platform call was never made. Returns False if
+    this owner no longer held the lease (it expired and another worker took it over).
+    """
+    now = datetime.utcnow()
+    query: Dict[str, Any] = {"account_id": account_id, "platform": platform, "source_url": source_url, "owner": owner}
+    if success:
+        update: Dict[str, Any] = {
+            "$set": {"status": POSTED, "posted_at": now, "error": None, "updated_at": now},
+            "$unset": {"owner": "", "lease_expires_at": "", "expire_at": ""},
+        }
+        if post_id:
+            update["$set"]["post_id"] = post_id
+    else:
+        update = {
+            "$set": {
+                "status": PENDING if pending else FAILED,
+                "error": error,
+                "updated_at": now,
+                "expire_at": now + post_retention(),
+            },
+            "$unset": {"owner": "", "lease_expires_at": ""},
+        }
+    res = get_mongo_collection().update_one(query, update)
+    if res.matched_count:
+        return True
+    if success:
+        # The post exists on the platform either way; never lose that fact
+        query.pop("owner")
+        get_mongo_collection().update_one(query, update)
+    print(f"[Mongo] lease on {platform} {source_url} ({account_id}) was lost before finalize")
+    return False
+
+
+def fetch_pending_posts(
+    account_ids: Iterable[str],
+    *,
+    max_age: timedelta,
+    limit: int = 10,
+    updated_before: Optional[datetime] = None,
+    credentialed: Iterable[Tuple[str, str]] = (),
+) -> List[Dict[str, Any]]:
+    """Oldest unposted records still marked "pending: ..." (deadline, open circuit) for these accounts,
+    created within max_age and not leased by a running publisher.
+
+    Records pending on missing credentials are never touched until the credentials
+    are added, so they are only picked for the (account_id, platform) pairs in
+    credentialed, i.e. the ones that have credentials now.
+    """
+    now = datetime.utcnow()
+    retryable: List[Dict[str, Any]] = [{"error": {"$regex": "^pending: (?!missing )"}}]
+    by_platform: Dict[str, List[str]] = {}
+    for account_id, platform in credentialed:
+        by_platform.setdefault(platform, []).append(account_id)
+    for platform, ids in by_platform.items():
+        retryable.append(
+            {"platform": platform, "account_id": {"$in": ids}, "error": {"$regex": f"^{MISSING_CREDENTIALS}"}}
+        )
+    query: Dict[str, Any] = {
+        "account_id": {"$in": list(dict.fromkeys(account_ids))},
+        "posted_at": {"$not": {"$type": "date"}},
+        "created_at": {"$gte": now - max_age},
+        "$and": [
+            {"$or": retryable},
+            {"$or": [{"status": {"$ne": PUBLISHING}}, {"lease_expires_at": {"$lt": now}}]},
+        ],
+    }
+    if updated_before is not None:
+        query["updated_at"] = {"$lt": updated_before}
+    return list(get_mongo_collection().find(query).sort("created_at", ASCENDING).limit(limit))
 
 
-def update_post_success(platform: str, source_url: str) -> None:
+def update_post_success(platform: str, source_url: str, account_id: str = DEFAULT_ACCOUNT_ID) -> None:
     col = get_mongo_collection()
     col.update_one(
-        {"platform": platform, "source_url": source_url},
-        {"$set": {"posted_at": datetime.utcnow().isoformat(), "error": None, "updated_at": datetime.utcnow().isoformat()}},
+        {"account_id": account_id, "platform": platform, "source_url": source_url},
+        {"$set": {"posted_at": datetime.utcnow(), "error": None, "updated_at": datetime.utcnow()}, "$unset": {"expire_at": ""}},
     )
 
 
-def update_post_error(platform: str, source_url: str, error: str) -> None:
+def update_post_error(platform: str, source_url: str, error: str, account_id: str = DEFAULT_ACCOUNT_ID) -> None:
     col = get_mongo_collection()
+    # Never put a TTL on a record that was already posted
     col.update_one(
-        {"platform": platform, "source_url": source_url},
-        {"$set": {"error": error, "updated_at": datetime.utcnow().isoformat()}},
+        {"account_id": account_id, "platform": platform, "source_url": source_url, "posted_at": {"$not": {"$type": "date"}}},
+        {"$set": {"error": error, "updated_at": datetime.utcnow(), "expire_at": datetime.utcnow() + post_retention()}},
     )
@@ -0,0 +1,62 @@
+"""Run deadline shared by the pipeline stages.
+
+On Lambda the handler builds one from `context.get_remaining_time_in_millis()`;
+each stage asks for its budget before starting slow work:
+
+    deadline = Deadline.from_lambda_context(context)
+    with_timeout = deadline.budget("fetch")
+
+A stage's budget is its share of the time left, split between it and the
+stages still to come, so time a fast stage does not use goes to the later ones.
+"""
+import os
+import time
+from typing import Any, Optional
+
+# Seconds kept back from the Lambda timeout for writing pending records and returning
+SAFETY_SECONDS = float(os.getenv("DEADLINE_SAFETY_SECONDS", "5"))
+
+# Relative share of the remaining time per stage, in run order
+STAGE_SHARES = (
+    ("fetch", float(os.getenv("DEADLINE_SHARE_FETCH", "0.3"))),
+    ("rank", float(os.getenv("DEADLINE_SHARE_RANK", "0.1"))),
+    ("generate", float(os.getenv("DEADLINE_SHARE_GENERATE", "0.3"))),
+    ("publish", float(os.getenv("DEADLINE_SHARE_PUBLISH", "0.3"))),
+)
+
+
+class Deadline:
+    """A point in time (time.monotonic) the run must be finished by."""
+
+    def __init__(self, seconds: float):
+        self.total = max(0.0, seconds)
+        self.at = time.monotonic() + self.total
+
+    @classmethod
+    def from_lambda_context(cls, context: Any, margin: float = SAFETY_SECONDS) -> Optional["Deadline"]:
+        """None when there is no Lambda context (local runs have no deadline)."""
+        getter = getattr(context, "get_remaining_time_in_millis", None)
+        if getter is None:
+            return None
+        return cls(getter() / 1000.0 - margin)
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self, reserve: float = 0.0) -> bool:
+        """True when less than reserve seconds are left."""
+        return self.remaining() <= reserve
+
+    def budget(self, stage: str) -> float:
+        """Seconds the stage may use: its share of the time left, weighed against the stages after it."""
+        names = [name for name, _ in STAGE_SHARES]
+        if stage not in names:
+            raise ValueError(f"Unknown stage: {stage}")
+        shares = [share for _, share in STAGE_SHARES[names.index(stage):]]
+        total = sum(shares)
+        if total <= 0:
+            return self.remaining()
+        return self.remaining() * shares[0] / total
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.1f}s)"
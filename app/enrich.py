@@ -0,0 +1,264 @@
+"""Article enrichment: fetch the top-ranked candidate pages so the model sees more than a headline.
+
+Pages are fetched concurrently with a byte cap and a per-page deadline, reduced
+to their main text, and cached in Mongo by canonical URL. A cached page is
+reused as-is while fresh and revalidated with ETag/Last-Modified afterwards, so
+repeat candidates cost nothing or a 304.
+"""
+import os
+import re
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+import requests
+from pymongo import ASCENDING
+
+from app import tracing
+from app.db_mongo import get_mongo_db
+from app.http_cache import conditional_get
+
+TOP_N = int(os.getenv("ARTICLE_FETCH_TOP_N", "5"))
+MAX_WORKERS = int(os.getenv("ARTICLE_FETCH_CONCURRENCY", "5"))
+MAX_BYTES = int(os.getenv("ARTICLE_MAX_BYTES", "1500000"))
+PAGE_DEADLINE_SECONDS = float(os.getenv("ARTICLE_FETCH_TIMEOUT_SECONDS", "10"))
+FRESH_SECONDS = int(os.getenv("ARTICLE_CACHE_FRESH_SECONDS", "21600"))
+RETENTION_DAYS = int(os.getenv("ARTICLE_CACHE_RETENTION_DAYS", "14"))
+MAX_TEXT_CHARS = 20000
+EXCERPT_CHARS = 600
+USER_AGENT = "linkedin-x-autoposter/1.0 (+article-preview)"
+
+# Links to these hosts are the social post itself, not an article
+SKIP_HOSTS = {"twitter.com", "x.com", "reddit.com", "old.reddit.com", "i.redd.it", "v.redd.it"}
+TRACKING_PARAMS = re.compile(r"^(utm_|fbclid$|gclid$|mc_cid$|mc_eid$|ref$|ref_src$)")
+
+_cache_ready = False
+
+
+def canonical_url(url: str) -> str:
+    """Lower-case scheme/host, drop default ports, fragments and tracking params, sort the query."""
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = urllib.parse.urlencode(
+        sorted(
+            (k, v)
+            for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+            if not TRACKING_PARAMS.match(k)
+        )
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urllib.parse.urlunsplit((scheme, host, path, query, ""))
+
+
+def _fetchable(url: str) -> bool:
+    parts = urllib.parse.urlsplit(url or "")
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return parts.scheme in ("http", "https") and bool(host) and host not in SKIP_HOSTS
+
+
+class _TextExtractor(HTMLParser):
+    """Collects paragraph-level text, preferring <article>/<main> when the page has one."""
+
+    SKIP = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "template"}
+    BLOCKS = {"p", "h1", "h2", "h3", "h4", "li", "blockquote", "pre"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._skip_depth = 0
+        self._main_depth = 0
+        self._block: List[str] = []
+        self._in_block = 0
+        self.title = ""
+        self._in_title = False
+        self.description = ""
+        self.main_blocks: List[str] = []
+        self.blocks: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip_depth += 1
+        elif tag in ("article", "main"):
+            self._main_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            a = dict(attrs)
+            if (a.get("name") or a.get("property") or "").lower() in ("description", "og:description"):
+                self.description = self.description or (a.get("content") or "").strip()
+        elif tag in self.BLOCKS:
+            self._in_block += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in ("article", "main"):
+            self._main_depth = max(0, self._main_depth - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in self.BLOCKS and self._in_block:
+            self._in_block -= 1
+            if not self._in_block:
+                self._flush()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif self._in_block and not self._skip_depth:
+            self._block.append(data)
+
+    def _flush(self):
+        text = re.sub(r"\s+", " ", "".join(self._block)).strip()
+        self._block = []
+        # Short fragments are mostly bylines, buttons and captions
+        if len(text) >= 40:
+            self.blocks.append(text)
+            if self._main_depth:
+                self.main_blocks.append(text)
+
+
+def extract_text(html: str) -> Dict[str, str]:
+    parser = _TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass  # keep whatever was parsed before malformed markup
+    blocks = parser.main_blocks if len(" ".join(parser.main_blocks)) >= 500 else parser.blocks
+    text = "\n".join(blocks)[:MAX_TEXT_CHARS]
+    excerpt = text[:EXCERPT_CHARS] if text else parser.description[:EXCERPT_CHARS]
+    if len(text) > EXCERPT_CHARS:
+        excerpt = excerpt.rsplit(" ", 1)[0] + "…"
+    return {"title": parser.title.strip(), "text": text, "excerpt": excerpt}
+
+
+def _cache_collection():
+    global _cache_ready
+    col = get_mongo_db()[os.getenv("MONGO_ARTICLE_CACHE_COLLECTION", "article_cache")]
+    if not _cache_ready:
+        col.create_index([("expire_at", ASCENDING)], expireAfterSeconds=0)
+        _cache_ready = True
+    return col
+
+
+def _load_cached(keys: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    try:
+        return {d["_id"]: d for d in _cache_collection().find({"_id": {"$in": keys}})}
+    except Exception as exc:
+        # Enrichment is best effort; without the cache every page is fetched fresh
+        print(f"[Enrich] cache unavailable: {exc}")
+        return None
+
+
+def _store(key: str, doc: Dict[str, Any], use_cache: bool = True) -> None:
+    if not use_cache:
+        return
+    now = datetime.utcnow()
+    try:
+        _cache_collection().update_one(
+            {"_id": key},
+            {"$set": {**doc, "checked_at": now, "expire_at": now + timedelta(days=RETENTION_DAYS)}},
+            upsert=True,
+        )
+    except Exception as exc:
+        print(f"[Enrich] cache write failed for {key}: {exc}")
+
+
+def fetch_article(
+    session: requests.Session,
+    url: str,
+    cached: Optional[Dict[str, Any]] = None,
+    use_cache: bool = True,
+    deadline: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """Return {text, excerpt, ...} for url, reusing or revalidating the cached record when possible."""
+    key = canonical_url(url)
+    if cached and cached.get("checked_at") and datetime.utcnow() - cached["checked_at"] < timedelta(seconds=FRESH_SECONDS):
+        return cached
+
+    result = conditional_get(
+        session,
+        url,
+        cached=cached,
+        max_bytes=MAX_BYTES,
+        deadline=min(time.monotonic() + PAGE_DEADLINE_SECONDS, deadline or float("inf")),
+        headers={"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"},
+        # Links come from Reddit/X/feed content; never let them reach internal or metadata addresses
+        public_only=True,
+    )
+    if result.not_modified and cached:
+        _store(key, {}, use_cache)
+        return cached
+    if not result.ok:
+        print(f"[Enrich] {url}: {result.error or f'HTTP {result.status}'}")
+        return cached
+    if "html" not in result.content_type.lower():
+        _store(key, {"url": url, "text": "", "excerpt": "", "content_type": result.content_type}, use_cache)
+        return None
+
+    doc = {
+        "url": url,
+        **extract_text(result.text()),
+        "etag": result.etag,
+        "last_modified": result.last_modified,
+        "truncated": result.truncated,
+        "fetched_at": datetime.utcnow(),
+    }
+    _store(key, doc, use_cache)
+    return doc
+
+
+def enrich_items(
+    items: List[Dict],
+    *,
+    session: Optional[requests.Session] = None,
+    top_n: int = TOP_N,
+    max_workers: int = MAX_WORKERS,
+    deadline: Optional[float] = None,
+) -> List[Dict]:
+    """Add `excerpt` to the top_n highest-scored fetchable items. Returns the items in their original order.
+
+    deadline (time.monotonic) caps every page fetch; pages not started by then are skipped.
+    """
+    ranked = sorted(
+        (it for it in items if _fetchable(it.get("url") or "")),
+        key=lambda d: d.get("score", 0),
+        reverse=True,
+    )[:top_n]
+    if not ranked:
+        return items
+
+    session = session or requests.Session()
+    cached = _load_cached([canonical_url(it["url"]) for it in ranked])
+    use_cache = cached is not None
+    cached = cached or {}
+
+    def _one(it: Dict) -> Optional[Dict[str, Any]]:
+        if deadline is not None and time.monotonic() >= deadline:
+            return cached.get(canonical_url(it["url"]))
+        try:
+            with tracing.span("article", url=it["url"]):
+                return fetch_article(session, it["url"], cached.get(canonical_url(it["url"])), use_cache, deadline)
+        except Exception as exc:
+            print(f"[Enrich] {it['url']}: {exc}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ranked)))) as pool:
+        docs = list(pool.map(_one, ranked))
+
+    enriched = 0
+    for it, doc in zip(ranked, docs):
+        if doc and doc.get("excerpt"):
+            it["excerpt"] = doc["excerpt"]
+            enriched += 1
+    print(f"[Enrich] {enriched}/{len(ranked)} candidates enriched")
+    return items
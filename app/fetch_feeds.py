@@ -0,0 +1,222 @@
+"""RSS/Atom and Hacker News sources.
+
+Feeds are fetched concurrently with conditional GETs. Validators and the parsed
+items of each feed are kept in the `feed_cache` collection, so an unchanged
+feed costs one 304 and no parsing.
+"""
+import json
+import os
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Tuple
+
+import requests
+from pymongo import ASCENDING
+
+from app.db_mongo import get_mongo_db
+from app.http_cache import conditional_get
+
+FEED_MAX_BYTES = int(os.getenv("FEED_MAX_BYTES", "2000000"))
+FEED_CONCURRENCY = int(os.getenv("FEED_CONCURRENCY", "8"))
+FEED_CACHE_RETENTION_DAYS = int(os.getenv("FEED_CACHE_RETENTION_DAYS", "30"))
+HN_FRONT_PAGE_URL = "https://hn.algolia.com/api/v1/search?tags=front_page&hitsPerPage=50"
+USER_AGENT = "linkedin-x-autoposter/1.0 (+feed-reader)"
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+_cache_ready = False
+
+
+def _cache_collection():
+    global _cache_ready
+    col = get_mongo_db()[os.getenv("MONGO_FEED_CACHE_COLLECTION", "feed_cache")]
+    if not _cache_ready:
+        col.create_index([("expire_at", ASCENDING)], expireAfterSeconds=0)
+        _cache_ready = True
+    return col
+
+
+def _load_cache(urls: Sequence[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    try:
+        return {d["_id"]: d for d in _cache_collection().find({"_id": {"$in": list(urls)}})}
+    except Exception as exc:
+        print(f"[Feeds] cache unavailable: {exc}")
+        return None
+
+
+def _save_cache(url: str, update: Dict[str, Any]) -> None:
+    now = datetime.utcnow()
+    try:
+        _cache_collection().update_one(
+            {"_id": url},
+            {"$set": {**update, "checked_at": now, "expire_at": now + timedelta(days=FEED_CACHE_RETENTION_DAYS)}},
+            upsert=True,
+        )
+    except Exception as exc:
+        print(f"[Feeds] cache write failed for {url}: {exc}")
+
+
+def _timestamp(value: Optional[str]) -> float:
+    if not value:
+        return 0.0
+    value = value.strip()
+    try:
+        return parsedate_to_datetime(value).timestamp()  # RSS: RFC 822
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()  # Atom: RFC 3339
+    except ValueError:
+        return 0.0
+
+
+def _text(el: Optional[ET.Element]) -> str:
+    return (el.text or "").strip() if el is not None else ""
+
+
+def parse_feed(body: bytes, source: str = "rss") -> List[Dict[str, Any]]:
+    """Items from an RSS 2.0 or Atom document, newest first."""
+    root = ET.fromstring(body)
+    items: List[Dict[str, Any]] = []
+    if root.tag == f"{ATOM}feed":
+        for entry in root.findall(f"{ATOM}entry"):
+            link = next(
+                (l.get("href") for l in entry.findall(f"{ATOM}link") if l.get("rel", "alternate") == "alternate"),
+                None,
+            )
+            published = _text(entry.find(f"{ATOM}published")) or _text(entry.find(f"{ATOM}updated"))
+            items.append({
+                "title": _text(entry.find(f"{ATOM}title")),
+                "url": (link or "").strip(),
+                "summary": _text(entry.find(f"{ATOM}summary")),
+                "created_utc": _timestamp(published),
+            })
+    else:
+        for item in root.iter("item"):
+            items.append({
+                "title": _text(item.find("title")),
+                "url": _text(item.find("link")),
+                "summary": _text(item.find("description")),
+                "created_utc": _timestamp(_text(item.find("pubDate"))),
+            })
+    out = [{"source": source, **it, "score": 0} for it in items if it["title"] and it["url"]]
+    out.sort(key=lambda d: d["created_utc"], reverse=True)
+    return out
+
+
+def _fetch_one(
+    session: requests.Session, url: str, cached: Optional[Dict[str, Any]], use_cache: bool
+) -> Tuple[List[Dict[str, Any]], str]:
+    result = conditional_get(session, url, cached=cached, max_bytes=FEED_MAX_BYTES, headers={"User-Agent": USER_AGENT})
+    if result.not_modified and cached:
+        if use_cache:
+            _save_cache(url, {})
+        return cached.get("items", []), "304"
+    if not result.ok:
+        # Serve the last good copy rather than dropping the feed for this run
+        return (cached or {}).get("items", []), result.error or f"HTTP {result.status}"
+    try:
+        items = parse_feed(result.body)
+    except ET.ParseError as exc:
+        return (cached or {}).get("items", []), f"parse error: {exc}"
+    if use_cache:
+        _save_cache(url, {"etag": result.etag, "last_modified": result.last_modified, "items": items})
+    return items, "200"
+
+
+def fetch_feed_items(
+    *,
+    feeds: Sequence[str],
+    keyword_pattern: Optional[Pattern] = None,
+    limit_per_feed: int = 20,
+    session: Optional[requests.Session] = None,
+    max_workers: int = FEED_CONCURRENCY,
+    deadline: Optional[float] = None,
+    partial: Optional[List[Dict]] = None,
+) -> Tuple[List[Dict], bool]:
+    """Items of every feed matching keyword_pattern, in feed order. Feeds not started by
+    deadline (time.monotonic) are skipped; each feed's items are added to partial as it completes."""
+    if not feeds:
+        return [], False
+    session = session or requests.Session()
+    cache = _load_cache(feeds)
+    use_cache = cache is not None
+    cache = cache or {}
+
+    def _one(url: str) -> Tuple[List[Dict], str]:
+        if deadline is not None and time.monotonic() >= deadline:
+            return [], "deadline"
+        try:
+            feed_items, status = _fetch_one(session, url, cache.get(url), use_cache)
+        except Exception as exc:
+            return [], str(exc)
+        kept: List[Dict] = []
+        for it in feed_items:
+            if keyword_pattern is not None and not keyword_pattern.search(f"{it['title']}\n{it.get('summary', '')}"):
+                continue
+            kept.append({**{k: v for k, v in it.items() if k != "summary"}, "feed": url})
+            if len(kept) >= limit_per_feed:
+                break
+        return kept, status
+
+    results: Dict[str, Tuple[List[Dict], str]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(feeds)))) as pool:
+        futures = {pool.submit(_one, url): url for url in feeds}
+        for fut in as_completed(futures):
+            results[futures[fut]] = fut.result()
+            if partial is not None:
+                partial.extend(results[futures[fut]][0])
+
+    items: List[Dict] = []
+    statuses: Dict[str, int] = {}
+    for feed in dict.fromkeys(feeds):
+        feed_items, status = results[feed]
+        statuses[status] = statuses.get(status, 0) + 1
+        items.extend(feed_items)
+    print(f"[Feeds] {len(feeds)} feeds ({', '.join(f'{k}: {v}' for k, v in sorted(statuses.items()))}), {len(items)} items")
+    return items, False
+
+
+def fetch_hackernews_items(
+    *,
+    keyword_pattern: Optional[Pattern] = None,
+    session: Optional[requests.Session] = None,
+    url: str = HN_FRONT_PAGE_URL,
+) -> Tuple[List[Dict], bool]:
+    session = session or requests.Session()
+    cache = _load_cache([url])
+    cached = (cache or {}).get(url)
+    result = conditional_get(session, url, cached=cached, max_bytes=FEED_MAX_BYTES, headers={"User-Agent": USER_AGENT})
+    if result.not_modified and cached:
+        hits = cached.get("items", [])
+    elif result.ok:
+        try:
+            payload = json.loads(result.body)
+        except ValueError as exc:
+            print(f"[HN] invalid response: {exc}")
+            return [], False
+        hits = [
+            {
+                "source": "hackernews",
+                "title": h.get("title") or "",
+                "url": h.get("url") or f"https://news.ycombinator.com/item?id={h.get('objectID')}",
+                "created_utc": h.get("created_at_i") or time.time(),
+                "score": int(h.get("points") or 0),
+            }
+            for h in payload.get("hits", [])
+            if h.get("title")
+        ]
+        if cache is not None:
+            _save_cache(url, {"etag": result.etag, "last_modified": result.last_modified, "items": hits})
+    else:
+        if result.status == 429:
+            return [], True
+        print(f"[HN] {result.error or f'HTTP {result.status}'}")
+        return (cached or {}).get("items", []), False
+
+    items = [h for h in hits if keyword_pattern is None or keyword_pattern.search(h["title"])]
+    items.sort(key=lambda d: (d.get("score", 0), d.get("created_utc", 0)), reverse=True)
+    return items, False
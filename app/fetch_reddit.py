@@ -1,7 +1,11 @@
-from typing import Iterable, List, Dict, Optional, Tuple
+from typing import Iterable, List, Dict, Optional, Pattern, Tuple
 import os
 import time
 
+import requests
+
+from app import rate_limit
+
 try:
     import praw
     from prawcore.exceptions import TooManyRequests as PrawTooManyRequests  # type: ignore
@@ -65,6 +69,20 @@ def _keyword_in_text(text: str, keywords: List[str]) -> bool:
     return any(k.lower() in lowered for k in keywords)
 
 
+def make_reddit_client(*, client_id: str, client_secret: str, user_agent: str):
+    if praw is None:
+        return None
+    # Route praw through our own session so X-Ratelimit-* headers feed the shared budget
+    session = requests.Session()
+    session.hooks["response"].append(rate_limit.response_hook(rate_limit.REDDIT_LISTING))
+    return praw.Reddit(
+        client_id=client_id,
+        client_secret=client_secret,
+        user_agent=user_agent,
+        requestor_kwargs={"session": session},
+    )
+
+
 def fetch_reddit_items(
     *,
     client_id: str,
@@ -73,21 +91,37 @@ def fetch_reddit_items(
     keywords: List[str],
     limit_per_subreddit: int = 20,
     subreddits: Optional[List[str]] = None,
+    keyword_pattern: Optional[Pattern] = None,
+    reddit=None,
+    deadline: Optional[float] = None,
+    partial: Optional[List[Dict]] = None,
 ) -> Tuple[List[Dict], bool]:
+    """Hot posts matching the keywords, best first. Stops before the next subreddit once
+    deadline (time.monotonic) has passed; each subreddit's matches are added to partial as they arrive."""
     if praw is None:
         return [], False
 
     subs = subreddits or DEFAULT_SUBREDDITS
 
     try:
-        reddit = praw.Reddit(
-            client_id=client_id,
-            client_secret=client_secret,
-            user_agent=user_agent,
-        )
+        reddit = reddit or make_reddit_client(client_id=client_id, client_secret=client_secret, user_agent=user_agent)
 
         items: List[Dict] = []
+        rate_limited = False
+        tried = failed = 0
+        last_exc: Optional[Exception] = None
         for sub in subs:
+            left = deadline - time.monotonic() if deadline is not None else 5.0
+            if left <= 0:
+                print(f"[Reddit] Fetch deadline reached; stopping before r/{sub}")
+                break
+            allowed, _ = rate_limit.acquire(rate_limit.REDDIT_LISTING, max_wait=min(5.0, left))
+            if not allowed:
+                print(f"[Reddit] Listing budget exhausted; stopping before r/{sub}")
+                rate_limited = True
+                break
+            tried += 1
+            found: List[Dict] = []
             try:
                 subreddit = reddit.subreddit(sub)
                 for submission in subreddit.hot(limit=limit_per_subreddit):
@@ -95,9 +129,12 @@ def fetch_reddit_items(
                     url = submission.url or ""
                     selftext = submission.selftext or ""
                     fulltext = f"{title}\n\n{selftext}"
-                    if not _keyword_in_text(fulltext, keywords):
+                    if keyword_pattern is not None:
+                        if not keyword_pattern.search(fulltext):
+                            continue
+                    elif not _keyword_in_text(fulltext, keywords):
                         continue
-                    items.append(
+                    found.append(
                         {
                             "source": "reddit",
                             "subreddit": sub,
@@ -107,12 +144,27 @@ def fetch_reddit_items(
                             "score": getattr(submission, "score", 0),
                         }
                     )
-            except Exception:
+                items.extend(found)
+                if partial is not None:
+                    partial.extend(found)
+            except Exception as sub_exc:
+                if PrawTooManyRequests is not None and isinstance(sub_exc, PrawTooManyRequests):
+                    rate_limited = True
+                    break
+                failed += 1
+                last_exc = sub_exc
                 continue
 
+        if tried and failed == tried:
+            # Every listing failed, so the client itself is broken (e.g. revoked credentials);
+            # raised so the runtime drops it
+            raise ConnectionError(f"every Reddit listing failed: {last_exc}")
+
         # sort by score then recency
         items.sort(key=lambda d: (d.get("score", 0), d.get("created_utc", 0)), reverse=True)
-        return items, False
+        return items, rate_limited
+    except ConnectionError:
+        raise
     except Exception as exc:
         msg = str(exc)
         if PrawTooManyRequests is not None and isinstance(exc, PrawTooManyRequests):
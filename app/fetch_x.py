@@ -1,4 +1,7 @@
-from typing import List, Dict, Tuple
+import time
+from typing import List, Dict, Optional, Sequence, Tuple
+
+from app import rate_limit
 
 try:
     import tweepy
@@ -49,35 +52,80 @@ def trim_keywords_for_limit(keywords: List[str]) -> List[str]:
     return keywords[:best]
 
 
+def build_query_shards(keywords: List[str]) -> List[str]:
+    """Pack keywords, in order, into as few queries under MAX_QUERY_LEN as possible."""
+    shards: List[str] = []
+    current: List[str] = []
+    for k in keywords:
+        if current and len(build_search_query(current + [k])) > MAX_QUERY_LEN:
+            shards.append(build_search_query(current))
+            current = []
+        current.append(k)
+    if current:
+        shards.append(build_search_query(current))
+    return shards
+
+
+def make_search_client(bearer_token: str, bucket: str = rate_limit.X_SEARCH):
+    """App-only client whose responses (including 429s) refresh the shared budget of `bucket`.
+
+    Use one client per endpoint: X rate-limits search and tweet lookup separately.
+    """
+    if tweepy is None:
+        return None
+    client = tweepy.Client(bearer_token=bearer_token, wait_on_rate_limit=False)
+    client.session.hooks["response"].append(rate_limit.response_hook(bucket))
+    return client
+
+
 def _search(client, query: str, max_results: int):
     return client.search_recent_tweets(
         query=query,
-        max_results=min(max_results, 100),
+        # The endpoint rejects max_results outside 10..100
+        max_results=max(10, min(max_results, 100)),
         tweet_fields=["created_at", "public_metrics", "lang"],
     )
 
 
-def fetch_x_items(*, bearer_token: str, keywords: List[str], max_results: int = 3) -> Tuple[List[Dict], bool]:
+def fetch_x_items(
+    *,
+    bearer_token: str,
+    keywords: List[str],
+    max_results: int = 3,
+    queries: Optional[Sequence[str]] = None,
+    client=None,
+    deadline: Optional[float] = None,
+    partial: Optional[List[Dict]] = None,
+) -> Tuple[List[Dict], bool]:
+    """Recent tweets for the first query attempt that returns any. No new attempt is started
+    once deadline (time.monotonic) has passed; the items found are added to partial."""
     if tweepy is None:
         print("[X] Tweepy not available; skipping X fetch")
         return [], False
 
     try:
-        client = tweepy.Client(bearer_token=bearer_token, wait_on_rate_limit=False)
-        base_keywords = dedupe_preserve_order(keywords)
-        # Progressive attempts: trimmed, half, minimal fallback
-        attempts: List[List[str]] = []
-        trimmed = trim_keywords_for_limit(base_keywords)
-        attempts.append(trimmed)
-        if len(trimmed) > MIN_KEYWORDS:
-            attempts.append(trimmed[: max(MIN_KEYWORDS, len(trimmed) // 2)])
-        attempts.append(FALLBACK_KEYWORDS)
+        client = client or make_search_client(bearer_token)
+        if queries:
+            # Precomputed shards (see AppConfig.x_query_shards), then the minimal fallback
+            attempts: List[str] = list(queries) + [build_search_query(FALLBACK_KEYWORDS)]
+        else:
+            base_keywords = dedupe_preserve_order(keywords)
+            # Progressive attempts: trimmed, half, minimal fallback
+            trimmed = trim_keywords_for_limit(base_keywords)
+            attempts = [build_search_query(trimmed)] if trimmed else []
+            if len(trimmed) > MIN_KEYWORDS:
+                attempts.append(build_search_query(trimmed[: max(MIN_KEYWORDS, len(trimmed) // 2)]))
+            attempts.append(build_search_query(FALLBACK_KEYWORDS))
 
         last_error = None
-        for kws in attempts:
-            if not kws:
-                continue
-            query = build_search_query(kws)
+        for query in attempts:
+            if deadline is not None and time.monotonic() >= deadline:
+                print("[X] Fetch deadline reached; no further search attempts")
+                break
+            allowed, _ = rate_limit.acquire(rate_limit.X_SEARCH)
+            if not allowed:
+                print("[X] Search budget exhausted; skipping X this run")
+                return [], True
             try:
                 resp = _search(client, query, max_results)
                 items: List[Dict] = []
@@ -95,21 +143,23 @@ def fetch_x_items(*, bearer_token: str, keywords: List[str], max_results: int =
                     )
                 items.sort(key=lambda d: d.get("created_at", ""), reverse=True)
                 if items:
-                    return items[:3], False
+                    if partial is not None:
+                        partial.extend(items[:max_results])
+                    return items[:max_results], False
                 else:
                     last_error = "empty"
             except Exception as sub_exc:
                 msg = str(sub_exc)
                 last_error = msg
                 if TweepyTooManyRequests is not None and isinstance(sub_exc, TweepyTooManyRequests):
-                    print("[X] Rate limited by X API; will fallback to Reddit")
+                    print("[X] Rate limited by X API; skipping X this run")
                     return [], True
                 if "403" in msg or "Forbidden" in msg:
                     print("[X] Forbidden: your app may lack search permissions or access level")
                     break
                 if "401" in msg or "Unauthorized" in msg:
-                    print("[X] Unauthorized: check X_BEARER_TOKEN")
-                    break
+                    # Raised so the runtime drops this client
+                    raise PermissionError("X search unauthorized: check X_BEARER_TOKEN") from sub_exc
                 if "400" in msg or "Bad Request" in msg:
                     print("[X] Bad request: trimming keywords and retrying")
                     continue
@@ -118,10 +168,12 @@ def fetch_x_items(*, bearer_token: str, keywords: List[str], max_results: int =
         if last_error == "empty":
             print("[X] search returned no results for provided keywords")
         return [], False
+    except PermissionError:
+        raise
     except Exception as exc:
         msg = str(exc)
         if TweepyTooManyRequests is not None and isinstance(exc, TweepyTooManyRequests):
-            print("[X] Rate limited by X API; will fallback to Reddit")
+            print("[X] Rate limited by X API; skipping X this run")
             return [], True
         print(f"[X] Error fetching tweets: {msg}")
         return [], False
@@ -1,28 +1,193 @@
+import ast
 import json
-from typing import Dict, List, Optional
-from openai import OpenAI
-import google.generativeai as genai
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from app import cassette, llm_rest, token_budget, tracing
+from app.text_fit import fit_linkedin, fit_x
+
+EDITOR_SOURCE = "linkedin_and_x_editor"
+POST_FIELDS = ("source", "title", "url", "linkedin", "x")
+
+# Strict JSON schema for OpenAI structured outputs
+POST_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "source": {"type": "string", "enum": [EDITOR_SOURCE]},
+        "title": {"type": "string"},
+        "url": {"type": "string"},
+        "linkedin": {"type": "string"},
+        "x": {"type": "string"},
+    },
+    "required": list(POST_FIELDS),
+    "additionalProperties": False,
+}
+
+# Gemini accepts an OpenAPI subset: no additionalProperties
+GEMINI_POST_SCHEMA: Dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "source": {"type": "STRING", "enum": [EDITOR_SOURCE]},
+        "title": {"type": "STRING"},
+        "url": {"type": "STRING"},
+        "linkedin": {"type": "STRING"},
+        "x": {"type": "STRING"},
+    },
+    "required": list(POST_FIELDS),
+}
+
+# How each generation ended: valid, repaired, reask, invalid, empty, error, budget
+_OUTCOMES: Counter = Counter()
+_OUTCOMES_LOCK = threading.Lock()
+
+
+def _count(outcome: str) -> None:
+    with _OUTCOMES_LOCK:
+        _OUTCOMES[outcome] += 1
+
+
+def outcome_counts() -> Dict[str, int]:
+    with _OUTCOMES_LOCK:
+        return dict(_OUTCOMES)
+
+
+def _unpack(value: Any) -> Tuple[Optional[str], Optional[List[int]]]:
+    """(text, [prompt_tokens, output_tokens]) from a model call; older cassettes stored the text alone."""
+    if isinstance(value, dict):
+        return value.get("text"), value.get("usage")
+    return value, None
+
+
+# Below this many seconds before the deadline an invalid answer is not re-asked
+MIN_REASK_SECONDS = float(os.getenv("LLM_MIN_REASK_SECONDS", "10"))
+
+
+def _time_left(deadline: Optional[float]) -> Optional[float]:
+    """Seconds until deadline (time.monotonic) for use as a request timeout; None without a deadline."""
+    if deadline is None:
+        return None
+    return max(1.0, deadline - time.monotonic())
+
+
+_FENCE = re.compile(r"^\s*```(?:json|JSON)?\s*|\s*```\s*$")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def _first_json_block(text: str) -> Optional[str]:
+    """The first balanced {...} or [...] in text, ignoring brackets inside strings."""
+    start = next((i for i, ch in enumerate(text) if ch in "{["), None)
+    if start is None:
+        return None
+    depth, quote, escaped = 0, None, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+def repair_json(text: str) -> Optional[Dict[str, Any]]:
+    """Best-effort fix of common model output defects without another model call.
+
+    Handles code fences, prose around the object, trailing commas, Python-style
+    single quotes, a single-element array and a wrong `source` value.
+    """
+    block = _first_json_block(_FENCE.sub("", text or ""))
+    if block is None:
+        return None
+    parsed: Any = None
+    for candidate in (block, _TRAILING_COMMA.sub(r"\1", block)):
+        try:
+            parsed = json.loads(candidate)
+            break
+        except json.JSONDecodeError:
+            try:
+                parsed = ast.literal_eval(candidate)
+                break
+            except (ValueError, SyntaxError):
+                continue
+    if isinstance(parsed, list) and len(parsed) == 1:
+        parsed = parsed[0]
+    if not isinstance(parsed, dict):
+        return None
+    if all(isinstance(parsed.get(f), str) for f in POST_FIELDS if f != "source"):
+        # The constant is ours to set; a different value is not a content problem
+        parsed["source"] = EDITOR_SOURCE
+    return {k: (v.strip() if isinstance(v, str) else v) for k, v in parsed.items()}
+
+
+def _reask_message(error: str) -> str:
+    return (
+        f"That answer could not be used: {error}\n"
+        "Return ONLY the corrected single JSON object with exactly the keys "
+        f"{', '.join(POST_FIELDS)} (all strings, source set to '{EDITOR_SOURCE}'). "
+        "No code fences, no arrays, no extra text."
+    )
 
 
 class PostGenerator:
-    def __init__(self, api_key: str, provider: str = "openai", model: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: str,
+        provider: str = "openai",
+        model: Optional[str] = None,
+        backend: str = "sdk",
+        session: Optional[requests.Session] = None,
+    ):
         """
         provider: "openai" or "gemini"
         model: optional override for model (defaults set internally)
+        backend: "sdk" (official client libraries) or "rest" (plain HTTP via app/llm_rest.py)
+        session: pooled session for the rest backend
         """
         self.api_key = api_key
         self.provider = provider.lower()
         self.model = model or ("gpt-4o" if self.provider == "openai" else "gemini-2.5-pro")
+        # Schema-constrained decoding; LLM_STRUCTURED_OUTPUT=0 falls back to plain JSON mode
+        self.structured = os.getenv("LLM_STRUCTURED_OUTPUT", "1").lower() not in ("0", "false", "no")
+
+        self.backend = backend.lower()
+        # Error from the last generate() call, if it failed; the runtime then drops this generator
+        self.last_error: Optional[str] = None
+
+        print(f"[INFO] Using provider: {provider}, model: {model}, backend: {self.backend}")
 
-        print(f"[INFO] Using provider: {provider}, model: {model}")
+        if self.provider not in ("openai", "gemini"):
+            raise ValueError("Provider must be 'openai' or 'gemini'")
+        if self.backend == "rest":
+            self.session = session or requests.Session()
+            self.client = None
+        elif self.backend != "sdk":
+            raise ValueError("Backend must be 'sdk' or 'rest'")
+        elif self.provider == "gemini":
+            # SDKs are imported on demand so the rest backend can ship without them
+            import google.generativeai as genai
 
-        if self.provider == "gemini":
             genai.configure(api_key=self.api_key)
             self.client = genai.GenerativeModel(self.model)
-        elif self.provider == "openai":
-            self.client = OpenAI(api_key=self.api_key)
         else:
-            raise ValueError("Provider must be 'openai' or 'gemini'")
+            from openai import OpenAI
+
+            self.client = OpenAI(api_key=self.api_key)
 
     def _build_prompt(self, items: List[Dict]) -> str:
         instructions = (
@@ -87,28 +252,73 @@ class PostGenerator:
 
         lines = [instructions, "Items:"]
         for idx, it in enumerate(items, start=1):
-            title = (it.get("title") or "").strip()
-            url = (it.get("url") or "").strip()
-            source = (it.get("source") or "").strip()
-            lines.append(f"{idx}. [{source}] {title} ({url})")
+            lines.extend(self._item_lines(idx, it))
         return "\n".join(lines)
 
-    def generate(self, items: List[Dict]) -> List[Dict]:
+    @staticmethod
+    def _item_lines(idx: int, it: Dict) -> List[str]:
+        title = (it.get("title") or "").strip()
+        url = (it.get("url") or "").strip()
+        source = (it.get("source") or "").strip()
+        lines = [f"{idx}. [{source}] {title} ({url})"]
+        excerpt = (it.get("excerpt") or "").strip()
+        if excerpt:
+            lines.append(f"   Excerpt: {excerpt}")
+        return lines
+
+    def _fit_items(self, items: List[Dict]) -> List[Dict]:
+        """The highest-scored items (without excerpts where needed) whose prompt fits LLM_MAX_PROMPT_TOKENS."""
+        def estimate(text: str) -> int:
+            return token_budget.estimate_tokens(text, self.model)
+
+        used = estimate(self._build_prompt([]))
+        # Room for the re-ask, which resends the prompt with the previous answer
+        room = token_budget.MAX_PROMPT_TOKENS - used - token_budget.MAX_OUTPUT_TOKENS // 2
+        keep: Dict[int, Dict] = {}
+        ranked = sorted(range(len(items)), key=lambda i: items[i].get("score", 0), reverse=True)
+        for i in ranked:
+            it = items[i]
+            cost = estimate("\n" + "\n".join(self._item_lines(i + 1, it)))
+            if cost > room and it.get("excerpt"):
+                it = {k: v for k, v in it.items() if k != "excerpt"}
+                cost = estimate("\n" + "\n".join(self._item_lines(i + 1, it)))
+            if cost > room:
+                continue
+            keep[i] = it
+            room -= cost
+        fitted = [keep[i] for i in sorted(keep)]
+        dropped = len(items) - len(fitted)
+        trimmed = sum(1 for i, it in keep.items() if it is not items[i])
+        if dropped or trimmed:
+            print(f"[Tokens] prompt budget {token_budget.MAX_PROMPT_TOKENS}: dropped {dropped} items, {trimmed} excerpts")
+        return fitted
+
+    def _reserve(self, prompt_tokens: int) -> Optional[Dict[str, Any]]:
+        if prompt_tokens > token_budget.MAX_PROMPT_TOKENS:
+            raise token_budget.BudgetExceeded(
+                f"prompt of ~{prompt_tokens} tokens is over LLM_MAX_PROMPT_TOKENS ({token_budget.MAX_PROMPT_TOKENS})"
+            )
+        return token_budget.reserve(self.provider, prompt_tokens + token_budget.MAX_OUTPUT_TOKENS)
+
+    def generate(self, items: List[Dict], deadline: Optional[float] = None) -> List[Dict]:
+        """Pick one item and write its posts. deadline (time.monotonic) bounds every LLM request."""
+        self.last_error = None
+        items = self._fit_items(items)
         if not items:
             return []
 
         if self.provider == "openai":
-            return self._generate_openai(items)
+            return self._generate_openai(items, deadline)
         elif self.provider == "gemini":
-            return self._generate_gemini(items)
+            return self._generate_gemini(items, deadline)
         else:
             raise ValueError("Unsupported provider")
-        
-    def validate_generated_post(data: str):
-        print(data)
+
+    @staticmethod
+    def validate_generated_post(data: Any) -> Tuple[bool, Any]:
         """
-        Validate the generated post output.
-        
+        Validate the generated post output (a JSON string or an already parsed object).
+
         The output must strictly follow this structure:
         {
         'source': string,   (always set to 'linkedin_and_x_editor')
@@ -122,7 +332,7 @@ class PostGenerator:
         required_fields = ["source", "title", "url", "linkedin", "x"]
 
         try:
-            parsed = json.loads(data)
+            parsed = json.loads(data) if isinstance(data, str) else data
 
             # Check it is a dictionary (not array or text)
             if not isinstance(parsed, dict):
@@ -136,83 +346,230 @@ class PostGenerator:
                     return False, f"Field '{field}' must be a string."
 
             # Validate fixed "source"
-            if parsed["source"] != "linkedin_and_x_editor":
-                return False, "Field 'source' must be exactly 'linkedin_and_x_editor'."
+            if parsed["source"] != EDITOR_SOURCE:
+                return False, f"Field 'source' must be exactly '{EDITOR_SOURCE}'."
 
             return True, parsed
 
         except json.JSONDecodeError as e:
             return False, f"Invalid JSON format: {str(e)}"
 
-
-    def _generate_openai(self, items: List[Dict]) -> List[Dict]:
-        try:
-            prompt = self._build_prompt(items)
-            resp = self.client.chat.completions.create(
+    def _resolve(self, content: Optional[str], reask: Callable[[str, str], Optional[str]]) -> Optional[Dict]:
+        """Validate, repair locally, and re-ask the model once before giving up. Records the outcome."""
+        if not content:
+            _count("empty")
+            return None
+        ok, result = PostGenerator.validate_generated_post(content)
+        if ok:
+            _count("valid")
+            return result
+        repaired = repair_json(content)
+        if repaired is not None:
+            ok, repaired_result = PostGenerator.validate_generated_post(repaired)
+            if ok:
+                _count("repaired")
+                return repaired_result
+            result = repaired_result
+
+        print(f"⚠️ Validation failed ({self.provider}), re-asking once:", result)
+        retry = reask(content, str(result))
+        if retry:
+            ok, retry_result = PostGenerator.validate_generated_post(retry)
+            if not ok:
+                repaired = repair_json(retry)
+                if repaired is not None:
+                    ok, retry_result = PostGenerator.validate_generated_post(repaired)
+            if ok:
+                _count("reask")
+                return retry_result
+            print(f"⚠️ Re-ask still invalid ({self.provider}):", retry_result)
+        _count("invalid")
+        return None
+
+    def _openai_complete(self, messages: List[Dict[str, str]], timeout: Optional[float] = None) -> str:
+        if self.structured:
+            response_format: Dict[str, Any] = {
+                "type": "json_schema",
+                "json_schema": {"name": "social_post", "strict": True, "schema": POST_SCHEMA},
+            }
+        else:
+            response_format = {"type": "json_object"}
+
+        def _call() -> Dict[str, Any]:
+            if self.backend == "rest":
+                text, usage = llm_rest.openai_chat(
+                    self.session,
+                    self.api_key,
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.5,
+                    response_format=response_format,
+                    max_tokens=token_budget.MAX_OUTPUT_TOKENS,
+                    timeout=timeout,
+                )
+                return {"text": text, "usage": usage}
+            # SDK retries would run past the deadline, so a deadline call gets one attempt
+            client = self.client.with_options(timeout=timeout, max_retries=0) if timeout else self.client
+            resp = client.chat.completions.create(
                 model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+                messages=messages,
                 temperature=0.5,
-                response_format={"type": "json_object"},
+                response_format=response_format,
+                max_tokens=token_budget.MAX_OUTPUT_TOKENS,
             )
-            content = resp.choices[0].message.content or "{}"
-
-            # ✅ Validate JSON
-            ok, result = PostGenerator.validate_generated_post(content)
-            if not ok:
-                print("⚠️ Validation failed (OpenAI):", result)
-                return self._fallback(items)
+            usage = resp.usage
+            return {
+                "text": resp.choices[0].message.content or "{}",
+                "usage": [usage.prompt_tokens, usage.completion_tokens] if usage else None,
+            }
 
+        key = "\n".join(m["content"] for m in messages)
+        # Chat formatting adds a few tokens per message
+        reservation = self._reserve(token_budget.estimate_tokens(key, self.model) + 4 * len(messages))
+        try:
+            with tracing.span("llm", provider="openai", model=self.model):
+                text, usage = _unpack(cassette.call("openai", f"{self.model}\n{key}", _call))
+        except Exception:
+            token_budget.release(reservation)
+            raise
+        token_budget.settle(reservation, *(usage or (None, None)))
+        return text
+
+    def _generate_openai(self, items: List[Dict], deadline: Optional[float] = None) -> List[Dict]:
+        try:
+            prompt = self._build_prompt(items)
+            messages = [{"role": "user", "content": prompt}]
+            content = self._openai_complete(messages, _time_left(deadline))
+
+            def _reask(previous: str, error: str) -> Optional[str]:
+                timeout = _time_left(deadline)
+                if timeout is not None and timeout < MIN_REASK_SECONDS:
+                    print(f"⚠️ {timeout:.1f}s left; not re-asking")
+                    return None
+                try:
+                    return self._openai_complete(
+                        messages
+                        + [
+                            {"role": "assistant", "content": previous},
+                            {"role": "user", "content": _reask_message(error)},
+                        ],
+                        timeout,
+                    )
+                except token_budget.BudgetExceeded as exc:
+                    print(f"⚠️ Not re-asking: {exc}")
+                    return None
+
+            result = self._resolve(content, _reask)
+            if result is None:
+                return self.fallback(items)
             return [result]
 
+        except token_budget.BudgetExceeded as e:
+            print("⚠️ OpenAI call skipped:", e)
+            _count("budget")
+            return self.fallback(items)
         except Exception as e:
             print("⚠️ OpenAI error:", e)
-            return self._fallback(items)
-
-    def _generate_gemini(self, items: List[Dict]) -> List[Dict]:
-        try:
-            prompt = self._build_prompt(items)
-
-            # ✅ Add generation config
-            generation_config = {
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "top_k": 40,
-                "max_output_tokens": 1024,
-                "response_mime_type": "application/json"
-            }
-
+            _count("error")
+            self.last_error = str(e)
+            return self.fallback(items)
+
+    def _gemini_complete(self, prompt: str, timeout: Optional[float] = None) -> Optional[str]:
+        # ✅ Add generation config
+        generation_config = {
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "top_k": 40,
+            "max_output_tokens": token_budget.MAX_OUTPUT_TOKENS,
+            "response_mime_type": "application/json"
+        }
+        if self.structured:
+            generation_config["response_schema"] = GEMINI_POST_SCHEMA
+
+        def _call() -> Dict[str, Any]:
+            if self.backend == "rest":
+                text, usage = llm_rest.gemini_generate(
+                    self.session,
+                    self.api_key,
+                    model=self.model,
+                    prompt=prompt,
+                    generation_config=generation_config,
+                    timeout=timeout,
+                )
+                return {"text": text, "usage": usage}
+            extra = {"request_options": {"timeout": timeout}} if timeout else {}
             resp = self.client.generate_content(
                 prompt,
-                generation_config=generation_config
+                generation_config=generation_config,
+                **extra,
             )
+            meta = getattr(resp, "usage_metadata", None)
+            usage = None
+            if meta:
+                # Thinking models bill thoughts_token_count on top of the candidates; the total covers both
+                prompt_tokens = meta.prompt_token_count or 0
+                total = getattr(meta, "total_token_count", None) or (
+                    prompt_tokens + (meta.candidates_token_count or 0) + (getattr(meta, "thoughts_token_count", None) or 0)
+                )
+                usage = [prompt_tokens, total - prompt_tokens]
 
             # Extract text safely
-            content = None
             if resp.candidates:
                 for cand in resp.candidates:
                     if cand.content and cand.content.parts:
                         for part in cand.content.parts:
                             if hasattr(part, "text") and part.text:
-                                content = part.text.strip()
-                                break
-                    if content:
-                        break
+                                return {"text": part.text.strip(), "usage": usage}
+            return {"text": None, "usage": usage}
+
+        reservation = self._reserve(token_budget.estimate_tokens(prompt, self.model))
+        try:
+            with tracing.span("llm", provider="gemini", model=self.model):
+                text, usage = _unpack(cassette.call("gemini", f"{self.model}\n{prompt}", _call))
+        except Exception:
+            token_budget.release(reservation)
+            raise
+        token_budget.settle(reservation, *(usage or (None, None)))
+        return text
+
+    def _generate_gemini(self, items: List[Dict], deadline: Optional[float] = None) -> List[Dict]:
+        try:
+            prompt = self._build_prompt(items)
+            content = self._gemini_complete(prompt, _time_left(deadline))
 
             if not content:
                 print("⚠️ No text content returned. Safety filters may have blocked the response.")
-                return self._fallback(items)
-
-            # ✅ Validate JSON
-            ok, result = PostGenerator.validate_generated_post(content)
-            if not ok:
-                print("⚠️ Validation failed (Gemini):", result)
-                return self._fallback(items)
-
+                _count("empty")
+                return self.fallback(items)
+
+            def _reask(previous: str, error: str) -> Optional[str]:
+                timeout = _time_left(deadline)
+                if timeout is not None and timeout < MIN_REASK_SECONDS:
+                    print(f"⚠️ {timeout:.1f}s left; not re-asking")
+                    return None
+                try:
+                    return self._gemini_complete(
+                        f"{prompt}\n\nYour previous answer was:\n{previous}\n\n{_reask_message(error)}",
+                        timeout,
+                    )
+                except token_budget.BudgetExceeded as exc:
+                    print(f"⚠️ Not re-asking: {exc}")
+                    return None
+
+            result = self._resolve(content, _reask)
+            if result is None:
+                return self.fallback(items)
             return [result]
 
+        except token_budget.BudgetExceeded as e:
+            print("⚠️ Gemini call skipped:", e)
+            _count("budget")
+            return self.fallback(items)
         except Exception as e:
             print("⚠️ Gemini error:", e)
-            return self._fallback(items)
+            _count("error")
+            self.last_error = str(e)
+            return self.fallback(items)
 
 
     def _extract_results(self, data: Dict, items: List[Dict]) -> List[Dict]:
@@ -228,19 +585,16 @@ class PostGenerator:
             })
         return output
 
-    def _fallback(self, items: List[Dict]) -> List[Dict]:
-        """Fallback if API fails"""
+    def fallback(self, items: List[Dict]) -> List[Dict]:
+        """Template posts for the first item, used when the model cannot be (or was not) asked"""
         first = items[0]
         title = (first.get("title") or "").strip()
         url = (first.get("url") or "").strip()
-        linkedin = (
+        linkedin = fit_linkedin(
             f"{title}\n\nWhy it matters: Practical impact for engineers and teams.\n"
             f"Source: {url}\n\n#AI #Tech #Software #DevOps #Cloud"
         )
-        xtweet_core = f"{title} — why it matters for builders."
-        if len(xtweet_core) > 220:
-            xtweet_core = xtweet_core[:217] + "..."
-        xtweet = f"{xtweet_core} {url}\n#AI #Tech"
+        xtweet = fit_x(f"{title} — why it matters for builders.", url=url, hashtags=("#AI", "#Tech"))
         return [
             {
                 "source": first.get("source") or "",
@@ -0,0 +1,149 @@
+"""Bounded, revalidating HTTP GETs shared by the article and feed fetchers."""
+import ipaddress
+import socket
+import time
+import urllib.parse
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import requests
+
+from app import cassette
+
+DEFAULT_MAX_BYTES = 1_000_000
+DEFAULT_TIMEOUT = (5, 10)  # (connect, read) seconds
+CHUNK_SIZE = 16384
+MAX_REDIRECTS = 5
+
+
+@dataclass
+class FetchResult:
+    status: int
+    body: Optional[bytes] = None
+    encoding: Optional[str] = None
+    content_type: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    final_url: Optional[str] = None
+    truncated: bool = False
+    error: Optional[str] = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300 and self.body is not None
+
+    def text(self) -> str:
+        return (self.body or b"").decode(self.encoding or "utf-8", errors="replace")
+
+
+def public_host_error(url: str) -> Optional[str]:
+    """Why url must not be fetched from the server (non-http scheme, or a host resolving to a
+    private, loopback, link-local or otherwise non-public address), or None when it may be."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return f"not an http(s) URL: {url[:100]}"
+    if cassette.is_replaying():
+        # Replayed responses never reach the network (and replay must work offline)
+        return None
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        infos = socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError, ValueError) as exc:
+        return f"cannot resolve {parts.hostname}: {exc}"
+    for info in infos:
+        addr = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if isinstance(addr, ipaddress.IPv6Address) and addr.ipv4_mapped:
+            addr = addr.ipv4_mapped
+        if not addr.is_global or addr.is_multicast:
+            return f"{parts.hostname} resolves to non-public address {addr}"
+    return None
+
+
+def validator_headers(cached: Optional[Dict]) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since headers from a cache record holding etag/last_modified."""
+    headers: Dict[str, str] = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+def conditional_get(
+    session: requests.Session,
+    url: str,
+    *,
+    cached: Optional[Dict] = None,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    timeout=DEFAULT_TIMEOUT,
+    deadline: Optional[float] = None,
+    headers: Optional[Dict[str, str]] = None,
+    public_only: bool = False,
+) -> FetchResult:
+    """GET url with the cached validators, streaming at most max_bytes of body.
+
+    deadline is an absolute time.monotonic() value bounding the whole download;
+    the read timeout alone only bounds the gap between chunks. With public_only
+    (URLs from untrusted content) the URL and every redirect target must resolve
+    to public addresses (see public_host_error). Never raises.
+    """
+    req_headers = {**(headers or {}), **validator_headers(cached)}
+    try:
+        resp = _get(session, url, req_headers, timeout, public_only)
+        if isinstance(resp, FetchResult):
+            return resp
+        with resp:
+            result = FetchResult(
+                status=resp.status_code,
+                content_type=resp.headers.get("Content-Type", ""),
+                etag=resp.headers.get("ETag"),
+                last_modified=resp.headers.get("Last-Modified"),
+                final_url=resp.url,
+            )
+            if resp.status_code == 304 or not 200 <= resp.status_code < 300:
+                return result
+            declared = resp.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > max_bytes * 4:
+                # Far too large to be worth a partial read
+                result.status, result.error = 413, f"content-length {declared} over cap"
+                return result
+
+            chunks = []
+            size = 0
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= max_bytes:
+                    result.truncated = True
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    result.truncated = True
+                    break
+            result.body = b"".join(chunks)[:max_bytes]
+            # requests assumes ISO-8859-1 for text/* without a charset; most pages are UTF-8
+            result.encoding = resp.encoding if "charset=" in result.content_type.lower() else None
+            return result
+    except requests.RequestException as exc:
+        return FetchResult(status=0, error=str(exc))
+
+
+def _get(session: requests.Session, url: str, headers: Dict[str, str], timeout, public_only: bool):
+    """The streamed response, or a FetchResult when a URL on the way is refused."""
+    if not public_only:
+        return session.get(url, headers=headers, timeout=timeout, stream=True, allow_redirects=True)
+    # Redirects are followed by hand so every hop is checked before it is requested
+    for _ in range(MAX_REDIRECTS + 1):
+        error = public_host_error(url)
+        if error:
+            return FetchResult(status=0, error=f"refused: {error}", final_url=url)
+        resp = session.get(url, headers=headers, timeout=timeout, stream=True, allow_redirects=False)
+        if not resp.is_redirect:
+            return resp
+        url = urllib.parse.urljoin(url, resp.headers.get("Location", ""))
+        resp.close()
+    return FetchResult(status=0, error=f"more than {MAX_REDIRECTS} redirects", final_url=url)
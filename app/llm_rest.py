@@ -0,0 +1,102 @@
+"""Thin REST clients for the two LLM calls PostGenerator makes (LLM_BACKEND=rest).
+
+They send the same request as the SDKs through a pooled requests.Session, so
+the Lambda package can leave out `openai`, `google-generativeai` and
+`protobuf` (see requirements-rest.txt).
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+OPENAI_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/") + "/chat/completions"
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+TIMEOUT = (5, float(os.getenv("LLM_TIMEOUT_SECONDS", "60")))
+
+# SDK-style snake_case generation config -> REST camelCase
+_GEMINI_CONFIG_KEYS = {
+    "temperature": "temperature",
+    "top_p": "topP",
+    "top_k": "topK",
+    "max_output_tokens": "maxOutputTokens",
+    "response_mime_type": "responseMimeType",
+    "response_schema": "responseSchema",
+}
+
+
+def _check(resp: requests.Response, provider: str) -> Dict[str, Any]:
+    if not 200 <= resp.status_code < 300:
+        raise RuntimeError(f"{provider} API error: {resp.status_code} {resp.text[:300]}")
+    try:
+        return resp.json()
+    except ValueError as exc:
+        raise RuntimeError(f"{provider} API returned invalid JSON: {exc}")
+
+
+def _timeout(seconds: Optional[float]) -> Tuple[float, float]:
+    """(connect, read) timeout; a caller's deadline can only shorten the default."""
+    if seconds is None:
+        return TIMEOUT
+    read = min(TIMEOUT[1], seconds)
+    return min(TIMEOUT[0], read), read
+
+
+def openai_chat(
+    session: requests.Session,
+    api_key: str,
+    *,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    response_format: Dict[str, Any],
+    max_tokens: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[str, Optional[List[int]]]:
+    """(content, [prompt_tokens, completion_tokens]) for one chat completion."""
+    body: Dict[str, Any] = {"model": model, "messages": messages, "temperature": temperature, "response_format": response_format}
+    if max_tokens:
+        body["max_tokens"] = max_tokens
+    resp = session.post(
+        OPENAI_URL,
+        headers={"Authorization": f"Bearer {api_key}"},
+        json=body,
+        timeout=_timeout(timeout),
+    )
+    data = _check(resp, "OpenAI")
+    usage = data.get("usage")
+    content = (data.get("choices") or [{}])[0].get("message", {}).get("content") or "{}"
+    return content, [usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)] if usage else None
+
+
+def gemini_generate(
+    session: requests.Session,
+    api_key: str,
+    *,
+    model: str,
+    prompt: str,
+    generation_config: Dict[str, Any],
+    timeout: Optional[float] = None,
+) -> Tuple[Optional[str], Optional[List[int]]]:
+    """(text, [prompt_tokens, output_tokens]) for one generateContent call."""
+    config = {_GEMINI_CONFIG_KEYS.get(k, k): v for k, v in generation_config.items()}
+    resp = session.post(
+        GEMINI_URL.format(model=model),
+        headers={"x-goog-api-key": api_key},
+        json={"contents": [{"role": "user", "parts": [{"text": prompt}]}], "generationConfig": config},
+        timeout=_timeout(timeout),
+    )
+    data = _check(resp, "Gemini")
+    meta = data.get("usageMetadata")
+    usage = None
+    if meta:
+        # Thinking models bill thoughtsTokenCount on top of the candidates; the total covers both
+        prompt_tokens = meta.get("promptTokenCount", 0)
+        total = meta.get("totalTokenCount") or (
+            prompt_tokens + meta.get("candidatesTokenCount", 0) + meta.get("thoughtsTokenCount", 0)
+        )
+        usage = [prompt_tokens, total - prompt_tokens]
+    for cand in data.get("candidates") or []:
+        for part in (cand.get("content") or {}).get("parts") or []:
+            if part.get("text"):
+                return part["text"].strip(), usage
+    return None, usage
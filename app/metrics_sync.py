@@ -0,0 +1,165 @@
+"""Incremental engagement-metrics sync for published tweets and LinkedIn shares.
+
+    python -m app.metrics_sync [--max-age-days 7] [--platform x|linkedin]
+
+Only posts with a stored post_id that were published within the max age are
+refreshed. X metrics are fetched 100 tweet ids per call, LinkedIn social
+actions in batches per account, and the results are written back with one
+bulk_write per batch.
+"""
+import argparse
+import os
+import urllib.parse
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+from pymongo import UpdateOne
+
+from app import rate_limit
+from app.config import get_config
+from app.db_mongo import get_mongo_collection
+from app.fetch_x import make_search_client
+from app.publisher import load_target_accounts
+
+X_BATCH_SIZE = 100  # maximum ids per GET /2/tweets
+LINKEDIN_BATCH_SIZE = int(os.getenv("LINKEDIN_METRICS_BATCH_SIZE", "50"))
+LINKEDIN_SOCIAL_ACTIONS_ENDPOINT = "https://api.linkedin.com/v2/socialActions"
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _recent_posts(platform: str, max_age_days: int) -> List[Dict[str, Any]]:
+    col = get_mongo_collection()
+    since = datetime.utcnow() - timedelta(days=max_age_days)
+    query = {
+        "platform": platform,
+        "post_id": {"$type": "string"},
+        "posted_at": {"$type": "date", "$gte": since},
+    }
+    return list(col.find(query, {"_id": 1, "post_id": 1, "account_id": 1}))
+
+
+def _write_metrics(updates: Dict[Any, Dict[str, Any]]) -> int:
+    if not updates:
+        return 0
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne({"_id": _id}, {"$set": {"metrics": metrics, "metrics_updated_at": now}})
+        for _id, metrics in updates.items()
+    ]
+    get_mongo_collection().bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def sync_x_metrics(bearer_token: str, max_age_days: int) -> int:
+    posts = _recent_posts("x", max_age_days)
+    if not posts:
+        return 0
+    client = make_search_client(bearer_token, bucket=rate_limit.X_TWEET_LOOKUP)
+    if client is None:
+        print("[Metrics] tweepy not available; skipping X metrics")
+        return 0
+
+    synced = 0
+    for batch in _chunks(posts, X_BATCH_SIZE):
+        allowed, _ = rate_limit.acquire(rate_limit.X_TWEET_LOOKUP)
+        if not allowed:
+            print("[Metrics] X lookup budget exhausted; remaining tweets wait for the next sync")
+            break
+        by_id = {p["post_id"]: p["_id"] for p in batch}
+        try:
+            resp = client.get_tweets(ids=list(by_id), tweet_fields=["public_metrics"])
+        except Exception as exc:
+            print(f"[Metrics] X lookup failed: {exc}")
+            continue
+        updates = {}
+        for tweet in resp.data or []:
+            _id = by_id.get(str(tweet.id))
+            if _id is not None:
+                updates[_id] = dict(tweet.public_metrics or {})
+        synced += _write_metrics(updates)
+    return synced
+
+
+def _linkedin_batch(access_token: str, urns: List[str], account_id: str) -> Dict[str, Dict[str, Any]]:
+    # Rest.li 2.0 BATCH_GET: ids=List(urn1,urn2) with each URN URL-encoded
+    ids = ",".join(urllib.parse.quote(u, safe="") for u in urns)
+    bucket = rate_limit.bucket_key(rate_limit.LINKEDIN_SOCIAL_ACTIONS, account_id)
+    resp = requests.get(
+        f"{LINKEDIN_SOCIAL_ACTIONS_ENDPOINT}?ids=List({ids})",
+        headers={"Authorization": f"Bearer {access_token}", "X-Restli-Protocol-Version": "2.0.0"},
+        timeout=20,
+        hooks={"response": rate_limit.response_hook(bucket)},
+    )
+    if not 200 <= resp.status_code < 300:
+        raise RuntimeError(f"LinkedIn socialActions error: {resp.status_code} {resp.text[:300]}")
+    results = resp.json().get("results", {})
+    out: Dict[str, Dict[str, Any]] = {}
+    for urn, data in results.items():
+        out[urn] = {
+            "like_count": (data.get("likesSummary") or {}).get("totalLikes", 0),
+            "comment_count": (data.get("commentsSummary") or {}).get("aggregatedTotalComments", 0),
+        }
+    return out
+
+
+def sync_linkedin_metrics(max_age_days: int) -> int:
+    posts = _recent_posts("linkedin", max_age_days)
+    if not posts:
+        return 0
+    tokens = {a.account_id: a.linkedin_access_token for a in load_target_accounts(get_config()) if a.linkedin_access_token}
+
+    by_account: Dict[str, List[Dict[str, Any]]] = {}
+    for p in posts:
+        by_account.setdefault(p.get("account_id"), []).append(p)
+
+    synced = 0
+    for account_id, account_posts in by_account.items():
+        token: Optional[str] = tokens.get(account_id)
+        if not token:
+            print(f"[Metrics] no LinkedIn token for account {account_id}; skipping {len(account_posts)} posts")
+            continue
+        for batch in _chunks(account_posts, LINKEDIN_BATCH_SIZE):
+            allowed, _ = rate_limit.acquire(rate_limit.bucket_key(rate_limit.LINKEDIN_SOCIAL_ACTIONS, account_id))
+            if not allowed:
+                print(f"[Metrics] LinkedIn budget exhausted for {account_id}; remaining posts wait for the next sync")
+                break
+            by_urn = {p["post_id"]: p["_id"] for p in batch}
+            try:
+                stats = _linkedin_batch(token, list(by_urn), account_id)
+            except Exception as exc:
+                print(f"[Metrics] {exc}")
+                continue
+            synced += _write_metrics({by_urn[urn]: m for urn, m in stats.items() if urn in by_urn})
+    return synced
+
+
+def sync_metrics(max_age_days: Optional[int] = None, platforms: Iterable[str] = ("x", "linkedin")) -> Dict[str, int]:
+    cfg = get_config()
+    age = max_age_days if max_age_days is not None else int(os.getenv("METRICS_MAX_AGE_DAYS", "7"))
+    result: Dict[str, int] = {}
+    if "x" in platforms:
+        if cfg.x_bearer_token:
+            result["x"] = sync_x_metrics(cfg.x_bearer_token, age)
+        else:
+            print("[Metrics] X_BEARER_TOKEN not set; skipping X metrics")
+    if "linkedin" in platforms:
+        result["linkedin"] = sync_linkedin_metrics(age)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh engagement metrics for recently published posts")
+    parser.add_argument("--max-age-days", type=int, default=None, help="Only posts younger than this (default: METRICS_MAX_AGE_DAYS or 7)")
+    parser.add_argument("--platform", choices=["x", "linkedin"], help="Only sync this platform")
+    args = parser.parse_args()
+    platforms = (args.platform,) if args.platform else ("x", "linkedin")
+    print(f"[Metrics] synced: {sync_metrics(args.max_age_days, platforms)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Migration of post records from ISO-string dates to BSON datetimes (also run by initialize_database).
+
+    python -m app.migrate_dates [--batch-size 1000] [--dry-run]
+
+Safe to re-run: only documents that still hold string dates are touched.
+"""
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from app.db_mongo import post_retention, get_mongo_collection
+
+DATE_FIELDS = ("posted_at", "created_at", "updated_at")
+
+
+def _parse(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        # Stored values came from datetime.utcnow().isoformat(), so they are naive UTC
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _convert(doc: Dict[str, Any]) -> Dict[str, Any]:
+    update: Dict[str, Any] = {"$set": {}}
+    for name in DATE_FIELDS:
+        if isinstance(doc.get(name), str):
+            update["$set"][name] = _parse(doc[name])
+    posted = update["$set"].get("posted_at", doc.get("posted_at"))
+    if not isinstance(posted, datetime) and "expire_at" not in doc:
+        # Old errored/pending records get the same retention as new ones
+        base = update["$set"].get("updated_at") or _parse(doc.get("updated_at")) or datetime.utcnow()
+        update["$set"]["expire_at"] = base + post_retention()
+    return update
+
+
+def migrate(batch_size: int = 1000, dry_run: bool = False) -> int:
+    col = get_mongo_collection()
+    query = {"$or": [{name: {"$type": "string"}} for name in DATE_FIELDS]}
+    projection = {name: 1 for name in DATE_FIELDS + ("expire_at",)}
+    ops: List[UpdateOne] = []
+    migrated = 0
+    for doc in col.find(query, projection, batch_size=batch_size):
+        ops.append(UpdateOne({"_id": doc["_id"]}, _convert(doc)))
+        if len(ops) >= batch_size:
+            migrated += _flush(col, ops, dry_run)
+            ops = []
+    migrated += _flush(col, ops, dry_run)
+    return migrated
+
+
+def _flush(col, ops: List[UpdateOne], dry_run: bool) -> int:
+    if not ops:
+        return 0
+    if not dry_run:
+        col.bulk_write(ops, ordered=False)
+    print(f"[Migrate] {'would convert' if dry_run else 'converted'} {len(ops)} records")
+    return len(ops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert post record dates from ISO strings to BSON datetimes")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Records per bulk write (default: 1000)")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the records that would change")
+    args = parser.parse_args()
+    total = migrate(batch_size=args.batch_size, dry_run=args.dry_run)
+    print(f"[Migrate] done: {total} records")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from typing import Optional, Tuple
 import os
 import requests
+from app import rate_limit
 from app.linkedin_api import resolve_person_urn
 
 LINKEDIN_UGC_ENDPOINT = "https://api.linkedin.com/v2/ugcPosts"
@@ -15,7 +16,8 @@ def post_linkedin(
     title: Optional[str] = None,
     description: Optional[str] = None,
     visibility: str = "PUBLIC",
-) -> Tuple[bool, Optional[str]]:
+    account_id: Optional[str] = None,
+) -> Tuple[bool, Optional[str], Optional[str]]:
     print(f"Posting on linkedIn")
     headers = {
         "Authorization": f"Bearer {access_token}",
@@ -30,7 +32,7 @@ def post_linkedin(
         id_token = os.getenv("LINKEDIN_ID_TOKEN")
         resolved_urn, err = resolve_person_urn(access_token=access_token, id_token=id_token)
         if not resolved_urn:
-            return False, err or "unable to resolve LinkedIn person URN"
+            return False, err or "unable to resolve LinkedIn person URN", None
 
     share_content = {
         "shareCommentary": {"text": text},
@@ -57,11 +59,29 @@ def post_linkedin(
 
     print(body)
 
+    bucket = rate_limit.bucket_key(rate_limit.LINKEDIN_UGC_POSTS, account_id)
+    allowed, wait = rate_limit.acquire(bucket)
+    if not allowed:
+        return False, f"rate limited: LinkedIn ugcPosts budget exhausted, resets in {int(wait)}s", None
+
     try:
-        resp = requests.post(LINKEDIN_UGC_ENDPOINT, headers=headers, json=body, timeout=20)
+        resp = requests.post(
+            LINKEDIN_UGC_ENDPOINT,
+            headers=headers,
+            json=body,
+            timeout=20,
+            hooks={"response": rate_limit.response_hook(bucket)},
+        )
         if 200 <= resp.status_code < 300:
-            return True, None
-        return False, f"LinkedIn error: {resp.status_code} {resp.text[:500]}"
+            # The created post URN comes back in X-RestLi-Id (and usually the body)
+            post_id = resp.headers.get("x-restli-id")
+            if not post_id:
+                try:
+                    post_id = resp.json().get("id")
+                except ValueError:
+                    post_id = None
+            return True, None, post_id
+        return False, f"LinkedIn error: {resp.status_code} {resp.text[:500]}", None
     except Exception as exc:
         print(exc);
-        return False, str(exc)
+        return False, str(exc), None
@@ -7,6 +7,31 @@ except Exception:  # pragma: no cover
 
 import requests
 
+from app import rate_limit
+
+
+def make_oauth1_client(
+    *,
+    api_key: str,
+    api_secret: str,
+    access_token: str,
+    access_token_secret: str,
+    account_id: Optional[str] = None,
+):
+    if tweepy is None:
+        return None
+    # No blocking sleeps here; the shared bucket decides whether we may call at all
+    client = tweepy.Client(
+        consumer_key=api_key,
+        consumer_secret=api_secret,
+        access_token=access_token,
+        access_token_secret=access_token_secret,
+        wait_on_rate_limit=False,
+    )
+    bucket = rate_limit.bucket_key(rate_limit.X_CREATE_TWEET, account_id)
+    client.session.hooks["response"].append(rate_limit.response_hook(bucket))
+    return client
+
 
 def post_x_oauth1(
     *,
@@ -15,44 +40,67 @@ def post_x_oauth1(
     access_token: str,
     access_token_secret: str,
     text: str,
-) -> Tuple[bool, Optional[str]]:
+    account_id: Optional[str] = None,
+    client=None,
+) -> Tuple[bool, Optional[str], Optional[str]]:
     if tweepy is None:
-        return False, "tweepy not available"
+        return False, "tweepy not available", None
+
+    bucket = rate_limit.bucket_key(rate_limit.X_CREATE_TWEET, account_id)
+    allowed, wait = rate_limit.acquire(bucket)
+    if not allowed:
+        return False, f"rate limited: X create tweet budget exhausted, resets in {int(wait)}s", None
 
     try:
-        client = tweepy.Client(
-            consumer_key=api_key,
-            consumer_secret=api_secret,
+        client = client or make_oauth1_client(
+            api_key=api_key,
+            api_secret=api_secret,
             access_token=access_token,
             access_token_secret=access_token_secret,
-            wait_on_rate_limit=True,
+            account_id=account_id,
         )
         resp = client.create_tweet(text=text)
         if getattr(resp, "errors", None):
-            return False, str(resp.errors)
-        return True, None
+            return False, str(resp.errors), None
+        tweet_id = (resp.data or {}).get("id")
+        return True, None, str(tweet_id) if tweet_id else None
     except Exception as exc:
-        return False, str(exc)
+        return False, str(exc), None
 
 
 def post_x_oauth2(
     *,
     access_token: str,
     text: str,
-) -> Tuple[bool, Optional[str]]:
+    account_id: Optional[str] = None,
+) -> Tuple[bool, Optional[str], Optional[str]]:
     # Twitter v2 create tweet with OAuth2 user context token (requires tweet.write scope)
+    bucket = rate_limit.bucket_key(rate_limit.X_CREATE_TWEET, account_id)
+    allowed, wait = rate_limit.acquire(bucket)
+    if not allowed:
+        return False, f"rate limited: X create tweet budget exhausted, resets in {int(wait)}s", None
     try:
         headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json",
         }
         body = {"text": text}
-        resp = requests.post("https://api.twitter.com/2/tweets", headers=headers, json=body, timeout=20)
+        resp = requests.post(
+            "https://api.twitter.com/2/tweets",
+            headers=headers,
+            json=body,
+            timeout=20,
+            hooks={"response": rate_limit.response_hook(bucket)},
+        )
         if 200 <= resp.status_code < 300:
-            return True, None
-        return False, f"X error: {resp.status_code} {resp.text[:500]}"
+            try:
+                tweet_id = resp.json().get("data", {}).get("id")
+            except ValueError:
+                tweet_id = None
+            return True, None, str(tweet_id) if tweet_id else None
+        return False, f"X error: {resp.status_code} {resp.text[:500]}", None
     except Exception as exc:
-        return False, str(exc)
+        return False, str(exc), None
 
 
 def post_x(
@@ -63,7 +111,9 @@ def post_x(
     access_token: Optional[str] = None,
     access_token_secret: Optional[str] = None,
     oauth2_access_token: Optional[str] = None,
-) -> Tuple[bool, Optional[str]]:
+    account_id: Optional[str] = None,
+    oauth1_client=None,
+) -> Tuple[bool, Optional[str], Optional[str]]:
     # Prefer OAuth1 if fully configured, else fallback to OAuth2 user token
     if api_key and api_secret and access_token and access_token_secret:
         return post_x_oauth1(
@@ -72,7 +122,9 @@ def post_x(
             access_token=access_token,
             access_token_secret=access_token_secret,
             text=text,
+            account_id=account_id,
+            client=oauth1_client,
         )
     if oauth2_access_token:
-        return post_x_oauth2(access_token=oauth2_access_token, text=text)
-    return False, "no valid X credentials found (need OAuth1 keys or OAuth2 user access token)"
+        return post_x_oauth2(access_token=oauth2_access_token, text=text, account_id=account_id)
+    return False, "no valid X credentials found (need OAuth1 keys or OAuth2 user access token)", None
@@ -0,0 +1,165 @@
+"""Publish jobs over SQS (PUBLISH_MODE=queue): one message per post, account and platform.
+
+    {"account_id": "default", "platform": "x",
+     "post": {"source": ..., "title": ..., "url": ..., "linkedin": ..., "x": ...}}
+
+The scheduled handler enqueues the jobs instead of posting; publish_handler.handler
+consumes them in batches and reports the failed messages (ReportBatchItemFailures)
+so SQS retries only those. PUBLISH_QUEUE_URL=local uses LocalQueue, an in-memory
+stand-in that drives the handler the way the Lambda event source mapping does:
+
+    PUBLISH_MODE=queue PUBLISH_QUEUE_URL=local python -m app.publish_queue --use-samples
+"""
+import argparse
+import json
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.config import AccountConfig
+from app.db_mongo import PLATFORMS
+from app.generate import POST_FIELDS
+
+LOCAL_URL = "local"
+# SendMessageBatch limit
+MAX_BATCH = 10
+
+
+def make_jobs(posts: List[Dict], accounts: List[AccountConfig]) -> List[Dict[str, Any]]:
+    return [
+        {"account_id": account.account_id, "platform": platform, "post": {k: gen.get(k) for k in POST_FIELDS}}
+        for gen in posts
+        for account in accounts
+        for platform in PLATFORMS
+    ]
+
+
+def enqueue(client: Any, queue_url: str, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Send jobs in batches of 10. Returns the jobs SQS did not accept."""
+    unsent: List[Dict[str, Any]] = []
+    for start in range(0, len(jobs), MAX_BATCH):
+        chunk = jobs[start:start + MAX_BATCH]
+        try:
+            resp = client.send_message_batch(
+                QueueUrl=queue_url,
+                Entries=[{"Id": str(i), "MessageBody": json.dumps(job)} for i, job in enumerate(chunk)],
+            )
+        except Exception as exc:
+            print(f"[Queue] send failed for {len(chunk)} jobs: {exc}")
+            unsent.extend(chunk)
+            continue
+        for failed in resp.get("Failed") or []:
+            print(f"[Queue] send failed: {failed.get('Code')} {failed.get('Message')}")
+            unsent.append(chunk[int(failed["Id"])])
+    print(f"[Queue] {len(jobs) - len(unsent)}/{len(jobs)} publish jobs enqueued")
+    return unsent
+
+
+class LocalQueue:
+    """In-memory SQS queue plus event source mapping, for running the queue path without AWS.
+
+    Messages are delivered in batches as Lambda SQS events. Messages the handler
+    reports in batchItemFailures (or the whole batch, when it raises or reports
+    an unknown id) become visible again, and go to `dead_letters` after
+    max_receives deliveries.
+    """
+
+    def __init__(self, batch_size: int = 10, max_receives: int = 3):
+        self.batch_size = batch_size
+        self.max_receives = max_receives
+        self.visible: Deque[Dict[str, Any]] = deque()
+        self.dead_letters: List[Dict[str, Any]] = []
+        self.deleted = 0
+
+    def send_message_batch(self, QueueUrl: str, Entries: List[Dict[str, str]]) -> Dict[str, Any]:
+        for entry in Entries:
+            self.visible.append({"messageId": str(uuid.uuid4()), "body": entry["MessageBody"], "receives": 0})
+        return {"Successful": [{"Id": e["Id"]} for e in Entries], "Failed": []}
+
+    def __len__(self) -> int:
+        return len(self.visible)
+
+    def _event(self, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "Records": [
+                {
+                    "messageId": msg["messageId"],
+                    "receiptHandle": f"{msg['messageId']}:{msg['receives']}",
+                    "body": msg["body"],
+                    "attributes": {"ApproximateReceiveCount": str(msg["receives"])},
+                    "eventSource": "aws:sqs",
+                }
+                for msg in batch
+            ]
+        }
+
+    def deliver(self, handler: Callable[[Dict[str, Any], Any], Dict[str, Any]], context: Any = None) -> int:
+        """Run the handler on one batch. Returns the number of messages that failed."""
+        batch = [self.visible.popleft() for _ in range(min(self.batch_size, len(self.visible)))]
+        if not batch:
+            return 0
+        for msg in batch:
+            msg["receives"] += 1
+        ids = {msg["messageId"] for msg in batch}
+        try:
+            failed = {f.get("itemIdentifier") for f in (handler(self._event(batch), context) or {}).get("batchItemFailures") or []}
+        except Exception as exc:
+            print(f"[Queue] handler raised, whole batch will be retried: {exc}")
+            failed = ids
+        if not failed <= ids:
+            # Lambda treats an unknown or empty id as a failure of the whole batch
+            failed = ids
+        for msg in batch:
+            if msg["messageId"] not in failed:
+                self.deleted += 1
+            elif msg["receives"] >= self.max_receives:
+                self.dead_letters.append(msg)
+            else:
+                self.visible.append(msg)
+        return len(failed)
+
+    def drain(self, handler: Callable[[Dict[str, Any], Any], Dict[str, Any]], context: Any = None) -> Dict[str, int]:
+        """Deliver batches until the queue is empty."""
+        batches = 0
+        while self.visible:
+            self.deliver(handler, context)
+            batches += 1
+        return {"batches": batches, "deleted": self.deleted, "dead_letters": len(self.dead_letters)}
+
+
+_LOCAL: Optional[LocalQueue] = None
+
+
+def local_queue() -> LocalQueue:
+    """The process-wide LocalQueue behind PUBLISH_QUEUE_URL=local."""
+    global _LOCAL
+    if _LOCAL is None:
+        _LOCAL = LocalQueue()
+    return _LOCAL
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one cycle through the local publish queue and drain it")
+    parser.add_argument("--use-samples", action="store_true", help="Use run_now's sample items instead of fetching")
+    parser.add_argument("--max-receives", type=int, default=3, help="Deliveries before a job is dead-lettered")
+    args = parser.parse_args()
+
+    import dataclasses
+
+    import publish_handler
+    from app.runtime import get_runtime
+    from main import run_once
+    from run_now import SAMPLE_ITEMS
+
+    rt, _ = get_runtime()
+    rt.config = dataclasses.replace(rt.config, publish_mode="queue", publish_queue_url=LOCAL_URL)
+    queue = local_queue()
+    queue.max_receives = args.max_receives
+    run_once(runtime=rt, override_items=SAMPLE_ITEMS if args.use_samples else None)
+    print(f"[Queue] {queue.drain(publish_handler.handler)}")
+    for msg in queue.dead_letters:
+        print(f"[Queue] dead letter: {msg['body']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app import circuit_breaker, tracing
+from app.config import AccountConfig, AppConfig, account_from_dict
+from app.db_mongo import (
+    MISSING_CREDENTIALS,
+    PostKey,
+    PostWriteBuffer,
+    claim_post,
+    fetch_accounts,
+    fetch_pending_posts,
+    finalize_post,
+    load_post_states,
+    record_post,
+)
+from app.post_linkedin import post_linkedin
+from app.post_x import post_x
+from app.text_fit import fit_linkedin, fit_x
+
+# What happened to one post on one platform for one account (see publish_jobs)
+POSTED, FAILED, SKIPPED, PENDING, DEFERRED = "posted", "failed", "skipped", "pending", "deferred"
+
+_LABELS = {"linkedin": "LinkedIn", "x": "X"}
+
+# A platform call is not started with less than this many seconds before the run deadline
+# (the post requests themselves time out after 20 s)
+PUBLISH_RESERVE_SECONDS = float(os.getenv("PUBLISH_RESERVE_SECONDS", "25"))
+
+# Pending records retried per publish pass (0 disables), and how old they may be before they are given up
+PENDING_LIMIT = int(os.getenv("PUBLISH_PENDING_LIMIT", "10"))
+PENDING_MAX_AGE_HOURS = float(os.getenv("PUBLISH_PENDING_MAX_AGE_HOURS", "72"))
+
+
+def load_target_accounts(cfg: AppConfig) -> List[AccountConfig]:
+    if cfg.accounts_source == "mongo":
+        accounts = [account_from_dict(doc) for doc in fetch_accounts()]
+        if accounts:
+            return accounts
+        print("[Publish] No enabled accounts in Mongo; using accounts from environment")
+    return list(cfg.accounts)
+
+
+@dataclass
+class PublishBatch:
+    """Per-run state shared by the publisher threads."""
+
+    buffer: PostWriteBuffer
+    # Existing records for this run's accounts/URLs: key -> posted successfully
+    states: Dict[PostKey, bool] = field(default_factory=dict)
+    runtime: Optional[Any] = None
+    # Lease owner id for claim_post/finalize_post; unique per run
+    owner: str = field(default_factory=lambda: f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+    # Run deadline (time.monotonic); calls that cannot finish before it are recorded as pending
+    deadline: Optional[float] = None
+
+    def exists(self, account: AccountConfig, platform: str, url: str) -> bool:
+        return (account.account_id, platform, url) in self.states
+
+    def posted(self, account: AccountConfig, platform: str, url: str) -> bool:
+        return self.states.get((account.account_id, platform, url), False)
+
+    def out_of_time(self) -> bool:
+        return self.deadline is not None and self.deadline - time.monotonic() < PUBLISH_RESERVE_SECONDS
+
+
+def _record_pending(
+    account: AccountConfig,
+    platform: str,
+    gen: Dict,
+    batch: PublishBatch,
+    error: str,
+    linkedin_text: Optional[str] = None,
+    x_text: Optional[str] = None,
+) -> None:
+    record_post(
+        account_id=account.account_id,
+        platform=platform,
+        source=gen.get("source") or "",
+        source_url=gen.get("url") or "",
+        title=gen.get("title") or "",
+        linkedin_text=linkedin_text,
+        x_text=x_text,
+        success=False,
+        error=error,
+        posted_at=None,
+        buffer=batch.buffer,
+    )
+
+
+def _claim_and_send(
+    account: AccountConfig,
+    platform: str,
+    gen: Dict,
+    batch: PublishBatch,
+    send: Callable[[], Tuple[bool, Optional[str], Optional[str]]],
+    credential: Optional[str],
+    linkedin_text: Optional[str] = None,
+    x_text: Optional[str] = None,
+) -> str:
+    """Take the publishing lease, ask the circuit breaker, call the platform, and finalize the record right away.
+
+    The breaker is asked only once the call is certain to be made, so a half-open
+    probe slot is never taken by a post that is then deferred or skipped.
+    """
+    url = gen.get("url") or ""
+    if batch.out_of_time():
+        print(f"[Publish] {platform} {url} ({account.account_id}) deferred: run deadline reached")
+        _record_pending(account, platform, gen, batch, "pending: run deadline reached", linkedin_text, x_text)
+        return DEFERRED
+    claimed = claim_post(
+        account_id=account.account_id,
+        platform=platform,
+        source=gen.get("source") or "",
+        source_url=url,
+        title=gen.get("title") or "",
+        linkedin_text=linkedin_text,
+        x_text=x_text,
+        owner=batch.owner,
+    )
+    if not claimed:
+        print(f"[Publish] {platform} {url} ({account.account_id}) already posted or being posted elsewhere; skipping")
+        return SKIPPED
+    allowed, _ = circuit_breaker.allow_request(platform, credential)
+    if not allowed:
+        finalize_post(
+            account_id=account.account_id,
+            platform=platform,
+            source_url=url,
+            owner=batch.owner,
+            success=False,
+            error=f"pending: {_LABELS[platform]} circuit open",
+            pending=True,
+        )
+        # Not attempted: like a deadline deferral, a queued job should be delivered again later
+        return DEFERRED
+    try:
+        success, error, post_id = send()
+    except Exception as exc:
+        success, error, post_id = False, str(exc), None
+    circuit_breaker.record_result(platform, credential, success, error)
+    finalize_post(
+        account_id=account.account_id,
+        platform=platform,
+        source_url=url,
+        owner=batch.owner,
+        success=success,
+        error=error,
+        post_id=post_id,
+    )
+    return POSTED if success else FAILED
+
+
+def _publish_linkedin(account: AccountConfig, gen: Dict, batch: PublishBatch) -> str:
+    url = gen.get("url") or ""
+    title = gen.get("title") or ""
+    text = fit_linkedin(gen.get("linkedin") or f"{title}\n\n{url}")
+
+    if not account.linkedin_access_token:
+        # Queue as pending if not already recorded
+        if not batch.exists(account, "linkedin", url):
+            _record_pending(account, "linkedin", gen, batch, f"{MISSING_CREDENTIALS}LinkedIn credentials", linkedin_text=text)
+        return PENDING
+
+    if batch.posted(account, "linkedin", url):
+        return SKIPPED
+
+    def _send() -> Tuple[bool, Optional[str], Optional[str]]:
+        return post_linkedin(
+            access_token=account.linkedin_access_token,
+            text=text,
+            author_urn=account.linkedin_person_urn,
+            url=url,
+            title=title,
+            account_id=account.account_id,
+        )
+
+    return _claim_and_send(account, "linkedin", gen, batch, _send, account.linkedin_access_token, linkedin_text=text)
+
+
+def _publish_x(account: AccountConfig, gen: Dict, batch: PublishBatch) -> str:
+    url = gen.get("url") or ""
+    title = gen.get("title") or ""
+    x_text = fit_x(gen["x"]) if gen.get("x") else fit_x(title, url=url)
+
+    if not account.has_x:
+        # Queue as pending if not already recorded
+        if not batch.exists(account, "x", url):
+            _record_pending(account, "x", gen, batch, f"{MISSING_CREDENTIALS}X credentials", x_text=x_text)
+        return PENDING
+
+    if batch.posted(account, "x", url):
+        return SKIPPED
+
+    def _send() -> Tuple[bool, Optional[str], Optional[str]]:
+        success, error, post_id = post_x(
+            text=x_text,
+            api_key=account.x_api_key,
+            api_secret=account.x_api_secret,
+            access_token=account.x_access_token,
+            access_token_secret=account.x_access_token_secret,
+            oauth2_access_token=account.x_oauth2_access_token,
+            account_id=account.account_id,
+            oauth1_client=batch.runtime.x_post_client(account) if batch.runtime is not None else None,
+        )
+        if not success and batch.runtime is not None and circuit_breaker.is_outage_error(error):
+            # Rebuild the warm OAuth1 client on the next post rather than reuse a broken one
+            batch.runtime.reset("x_post")
+        return success, error, post_id
+
+    return _claim_and_send(account, "x", gen, batch, _send, account.x_credential, x_text=x_text)
+
+
+_PLATFORMS: Dict[str, Callable[[AccountConfig, Dict, PublishBatch], str]] = {
+    "linkedin": _publish_linkedin,
+    "x": _publish_x,
+}
+
+
+def publish_for_account(account: AccountConfig, posts: List[Dict], batch: PublishBatch) -> None:
+    with tracing.span(f"account:{account.account_id}"):
+        for gen in posts:
+            _publish_linkedin(account, gen, batch)
+            _publish_x(account, gen, batch)
+
+
+def publish_to_accounts(
+    posts: List[Dict],
+    accounts: List[AccountConfig],
+    max_workers: int = 4,
+    runtime: Optional[Any] = None,
+    deadline: Optional[float] = None,
+) -> None:
+    """Fan the generated posts out to every account, at most max_workers accounts at a time.
+
+    Existing records are read with one query up front. Each platform call is
+    guarded by a lease on its record (claim_post) so overlapping runs never post
+    the same URL twice; outcomes are finalized immediately, while pending records
+    are collected and written with one bulk write at the end. Past the deadline
+    (time.monotonic) the remaining posts are recorded as pending instead of sent.
+    """
+    if not posts or not accounts:
+        return
+    states = load_post_states([a.account_id for a in accounts], [p.get("url") or "" for p in posts])
+    with PostWriteBuffer() as buffer:
+        batch = PublishBatch(buffer=buffer, states=states, runtime=runtime, deadline=deadline)
+        workers = max(1, min(max_workers, len(accounts)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="publish") as pool:
+            futures = {pool.submit(publish_for_account, acc, posts, batch): acc.account_id for acc in accounts}
+            for fut in as_completed(futures):
+                try:
+                    fut.result()
+                except Exception as exc:
+                    # One broken account must not stop the others
+                    print(f"[Publish] account {futures[fut]} failed: {exc}")
+
+
+def pending_jobs(
+    accounts: List[AccountConfig],
+    limit: int = PENDING_LIMIT,
+    updated_before: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Publish jobs (see publish_jobs) for records earlier runs left pending, with their stored text.
+
+    updated_before skips records this run has just written. Records pending on
+    missing credentials are only retried once the account has them.
+    """
+    if limit <= 0 or not accounts:
+        return []
+    try:
+        docs = fetch_pending_posts(
+            [a.account_id for a in accounts],
+            max_age=timedelta(hours=PENDING_MAX_AGE_HOURS),
+            limit=limit,
+            updated_before=updated_before,
+            credentialed=[(a.account_id, "linkedin") for a in accounts if a.linkedin_access_token]
+            + [(a.account_id, "x") for a in accounts if a.has_x],
+        )
+    except Exception as exc:
+        print(f"[Publish] could not load pending posts: {exc}")
+        return []
+    return [
+        {
+            "account_id": doc["account_id"],
+            "platform": doc["platform"],
+            "post": {
+                "source": doc.get("source") or "",
+                "title": doc.get("title") or "",
+                "url": doc["source_url"],
+                "linkedin": doc.get("linkedin_text"),
+                "x": doc.get("x_text"),
+            },
+        }
+        for doc in docs
+    ]
+
+
+def publish_jobs(
+    jobs: List[Dict[str, Any]],
+    accounts: List[AccountConfig],
+    runtime: Optional[Any] = None,
+    deadline: Optional[float] = None,
+) -> List[str]:
+    """Publish queued jobs ({"account_id", "platform", "post"}, see app/publish_queue.py) one by one.
+
+    Returns one outcome per job: posted, failed, skipped (already posted or
+    claimed elsewhere), pending (recorded, missing credentials), deferred
+    (recorded, run deadline reached or circuit open), invalid (unknown
+    account/platform) or error (unexpected exception).
+    """
+    by_id = {a.account_id: a for a in accounts}
+    outcomes: List[str] = []
+    states = load_post_states(
+        [str(j.get("account_id")) for j in jobs],
+        [(j.get("post") or {}).get("url") or "" for j in jobs],
+    )
+    with PostWriteBuffer() as buffer:
+        batch = PublishBatch(buffer=buffer, states=states, runtime=runtime, deadline=deadline)
+        for job in jobs:
+            account = by_id.get(str(job.get("account_id")))
+            publish = _PLATFORMS.get(str(job.get("platform")))
+            if account is None or publish is None:
+                print(f"[Publish] dropping job for unknown account/platform: {job.get('account_id')}/{job.get('platform')}")
+                outcomes.append("invalid")
+                continue
+            try:
+                with tracing.span(f"account:{account.account_id}", platform=job["platform"]):
+                    outcomes.append(publish(account, job.get("post") or {}, batch))
+            except Exception as exc:
+                print(f"[Publish] job {account.account_id}/{job['platform']} failed: {exc}")
+                outcomes.append("error")
+    return outcomes
@@ -0,0 +1,186 @@
+import os
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from app import cassette
+from app.db_mongo import get_mongo_db
+
+
+# Bucket keys are "<platform>:<endpoint>"
+X_SEARCH = "x:search"
+X_CREATE_TWEET = "x:create_tweet"
+LINKEDIN_UGC_POSTS = "linkedin:ugc_posts"
+REDDIT_LISTING = "reddit:listing"
+X_TWEET_LOOKUP = "x:tweet_lookup"
+LINKEDIN_SOCIAL_ACTIONS = "linkedin:social_actions"
+
+# (limit, window_seconds) used until the platform reports its own numbers via headers
+DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+    X_SEARCH: (450, 15 * 60),
+    X_CREATE_TWEET: (17, 24 * 60 * 60),
+    LINKEDIN_UGC_POSTS: (150, 24 * 60 * 60),
+    REDDIT_LISTING: (100, 60),
+    X_TWEET_LOOKUP: (300, 15 * 60),
+    LINKEDIN_SOCIAL_ACTIONS: (500, 24 * 60 * 60),
+}
+FALLBACK_LIMIT: Tuple[int, int] = (60, 60)
+
+
+def bucket_key(key: str, account_id: Optional[str] = None) -> str:
+    """Scope a per-user endpoint bucket (tweet creation, ugcPosts) to one publishing account."""
+    return f"{key}:{account_id}" if account_id else key
+
+
+def _defaults(key: str) -> Tuple[int, int]:
+    base = ":".join(key.split(":")[:2])
+    return DEFAULT_LIMITS.get(base, FALLBACK_LIMIT)
+
+
+def _collection():
+    return get_mongo_db()[os.getenv("MONGO_RATE_LIMIT_COLLECTION", "rate_limits")]
+
+
+def _ensure_bucket(col, key: str, now: float) -> Dict[str, Any]:
+    limit, window = _defaults(key)
+    doc = col.find_one_and_update(
+        {"_id": key},
+        {"$setOnInsert": {"limit": limit, "window": window, "remaining": limit, "reset_at": now + window}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc["reset_at"] <= now:
+        # Window elapsed without fresher headers: refill. Matching on the old reset_at
+        # makes the refill happen once even when several invocations race here.
+        col.update_one(
+            {"_id": key, "reset_at": doc["reset_at"]},
+            {"$set": {"remaining": doc["limit"], "reset_at": now + doc["window"]}},
+        )
+        doc = col.find_one({"_id": key}) or doc
+    return doc
+
+
+def try_acquire(key: str) -> Tuple[bool, float]:
+    """Take one token from the bucket. Returns (acquired, seconds until the bucket refills)."""
+    if cassette.is_replaying():
+        # Replayed traffic costs no quota and must not depend on Mongo
+        return True, 0.0
+    now = time.time()
+    try:
+        col = _collection()
+        doc = _ensure_bucket(col, key, now)
+        taken = col.find_one_and_update(
+            {"_id": key, "remaining": {"$gt": 0}},
+            {"$inc": {"remaining": -1}, "$set": {"updated_at": now}},
+        )
+        if taken is not None:
+            return True, 0.0
+        return False, max(0.0, float(doc["reset_at"]) - now)
+    except Exception as exc:
+        # Never block publishing because the limiter store is unavailable
+        print(f"[RateLimit] {key}: limiter unavailable ({exc}); allowing call")
+        return True, 0.0
+
+
+def acquire(key: str, max_wait: float = 0.0) -> Tuple[bool, float]:
+    """Acquire a token, sleeping up to max_wait seconds if the bucket refills soon enough."""
+    ok, wait = try_acquire(key)
+    if ok:
+        return True, 0.0
+    if wait <= max_wait:
+        print(f"[RateLimit] {key}: budget exhausted; waiting {wait:.1f}s for reset")
+        time.sleep(wait)
+        return try_acquire(key)
+    print(f"[RateLimit] {key}: budget exhausted; next window in {wait:.0f}s")
+    return False, wait
+
+
+def _header(headers: Mapping[str, Any], name: str) -> Optional[float]:
+    # requests uses a case-insensitive dict; plain mappings need a manual lookup
+    value = headers.get(name)
+    if value is None:
+        lname = name.lower()
+        for k, v in headers.items():
+            if k.lower() == lname:
+                value = v
+                break
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _store(key: str, *, remaining: float, reset_at: float, limit: Optional[float] = None) -> None:
+    if cassette.is_replaying():
+        return
+    fields: Dict[str, Any] = {"remaining": int(remaining), "reset_at": reset_at, "updated_at": time.time()}
+    if limit is not None:
+        fields["limit"] = int(limit)
+    default_limit, window = _defaults(key)
+    on_insert: Dict[str, Any] = {"window": window}
+    if limit is None:
+        on_insert["limit"] = default_limit
+    try:
+        _collection().update_one({"_id": key}, {"$set": fields, "$setOnInsert": on_insert}, upsert=True)
+    except Exception as exc:
+        print(f"[RateLimit] {key}: failed to persist headers ({exc})")
+
+
+def update_from_headers(key: str, headers: Mapping[str, Any]) -> bool:
+    """Feed the bucket from X (x-rate-limit-*) or Reddit (X-Ratelimit-*) response headers.
+
+    Returns True when the headers carried any rate-limit information.
+    """
+    now = time.time()
+
+    # X: limit/remaining plus reset as an epoch timestamp
+    remaining = _header(headers, "x-rate-limit-remaining")
+    if remaining is not None:
+        reset = _header(headers, "x-rate-limit-reset")
+        _store(
+            key,
+            remaining=remaining,
+            reset_at=reset if reset is not None else now + _defaults(key)[1],
+            limit=_header(headers, "x-rate-limit-limit"),
+        )
+        return True
+
+    # Reddit: remaining/used plus reset as seconds from now
+    remaining = _header(headers, "x-ratelimit-remaining")
+    if remaining is not None:
+        reset = _header(headers, "x-ratelimit-reset")
+        used = _header(headers, "x-ratelimit-used")
+        _store(
+            key,
+            remaining=remaining,
+            reset_at=now + (reset if reset is not None else _defaults(key)[1]),
+            limit=(remaining + used) if used is not None else None,
+        )
+        return True
+
+    # Anything else (e.g. LinkedIn): only a 429 Retry-After tells us something
+    retry_after = _header(headers, "retry-after")
+    if retry_after is not None:
+        mark_exhausted(key, retry_after=retry_after)
+        return True
+    return False
+
+
+def mark_exhausted(key: str, retry_after: Optional[float] = None) -> None:
+    """Record a 429 so other invocations stop calling until the window resets."""
+    wait = retry_after if retry_after is not None else _defaults(key)[1]
+    _store(key, remaining=0, reset_at=time.time() + wait)
+
+
+def response_hook(key: str) -> Callable:
+    """requests response hook that keeps the bucket in sync with every response on a session."""
+
+    def _hook(resp, *args, **kwargs):
+        if not update_from_headers(key, resp.headers) and resp.status_code == 429:
+            mark_exhausted(key)
+        return resp
+
+    return _hook
@@ -0,0 +1,198 @@
+"""Local relevance scoring so off-topic candidates never reach the LLM.
+
+Texts are embedded as signed, hashed word and character n-gram vectors (no
+model download, stable across processes). Topic centroids start from the
+configured keywords and are pulled towards the titles of past successful posts.
+Candidates are scored in one matrix product and items below the threshold are
+dropped.
+
+The centroid matrix is saved as .npy next to a small JSON manifest and loaded
+with mmap_mode, so warm starts do not rebuild it.
+
+    python -m app.relevance build
+    python -m app.relevance score "Some headline" "Another headline"
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # scoring is skipped without numpy
+    np = None
+
+from app.db_mongo import POSTED_FILTER, get_mongo_collection
+
+DIM = 1 << 14
+INDEX_PATH = os.getenv("RELEVANCE_INDEX_PATH", "/tmp/relevance_index.npy")
+MAX_AGE_HOURS = float(os.getenv("RELEVANCE_INDEX_MAX_AGE_HOURS", "24"))
+MIN_SCORE = float(os.getenv("RELEVANCE_MIN_SCORE", "0.12"))
+MIN_KEEP = int(os.getenv("RELEVANCE_MIN_KEEP", "3"))
+HISTORY_POSTS = int(os.getenv("RELEVANCE_HISTORY_POSTS", "500"))
+# Weight of the keyword seed against the mean of the past posts assigned to it
+SEED_WEIGHT = 1.0
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.\-]*")
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _features(text: str) -> List[str]:
+    words = _TOKEN.findall(text.lower())
+    feats = [f"w:{w}" for w in words]
+    feats += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f" {w} "
+        feats += [f"c:{padded[i:i + 4]}" for i in range(max(1, len(padded) - 3))]
+    return feats
+
+
+def embed(texts: Sequence[str]) -> "np.ndarray":
+    """(len(texts), DIM) float32 matrix of L2-normalised hashed n-gram vectors."""
+    out = np.zeros((len(texts), DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feat in _features(text or ""):
+            h = zlib.crc32(feat.encode("utf-8"))
+            # Word features carry more meaning than character shingles
+            weight = 1.0 if feat[0] != "c" else 0.3
+            out[row, h % DIM] += weight if h & 0x80000000 else -weight
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return out / norms
+
+
+def _history_titles(limit: int) -> List[str]:
+    try:
+        cursor = (
+            get_mongo_collection()
+            .find(POSTED_FILTER, {"title": 1})
+            .sort("posted_at", -1)
+            .limit(limit)
+        )
+        return [d["title"] for d in cursor if d.get("title")]
+    except Exception as exc:
+        print(f"[Relevance] no post history for centroids: {exc}")
+        return []
+
+
+def build_centroids(keywords: Sequence[str], history: Sequence[str] = ()) -> "np.ndarray":
+    """One centroid per keyword, shifted towards the past post titles nearest to it."""
+    seeds = embed(list(keywords))
+    if not history:
+        return seeds
+    past = embed(list(history))
+    nearest = (past @ seeds.T).argmax(axis=1)
+    sums = np.zeros_like(seeds)
+    np.add.at(sums, nearest, past)
+    counts = np.bincount(nearest, minlength=len(seeds)).astype(np.float32)[:, None]
+    centroids = SEED_WEIGHT * seeds + np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (centroids / norms).astype(np.float32)
+
+
+def _fingerprint(keywords: Sequence[str]) -> str:
+    return hashlib.sha256(json.dumps([DIM, sorted(keywords)]).encode("utf-8")).hexdigest()[:16]
+
+
+def _manifest_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def load_index(keywords: Sequence[str], path: Optional[str] = None, rebuild: bool = False) -> Optional["np.ndarray"]:
+    """Memory-map the saved centroids, rebuilding them when keywords changed or the file is stale.
+
+    Without an explicit path each keyword set gets its own file, so tenants with
+    different keywords never overwrite each other's index.
+    """
+    if np is None or not keywords:
+        return None
+    fingerprint = _fingerprint(keywords)
+    if path is None:
+        root, ext = os.path.splitext(INDEX_PATH)
+        path = f"{root}-{fingerprint}{ext or '.npy'}"
+    if not rebuild:
+        try:
+            with open(_manifest_path(path)) as fh:
+                manifest = json.load(fh)
+            fresh = time.time() - manifest.get("built_at", 0) < MAX_AGE_HOURS * 3600
+            if manifest.get("fingerprint") == fingerprint and fresh:
+                return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            pass
+
+    history = _history_titles(HISTORY_POSTS)
+    centroids = build_centroids(keywords, history)
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp.npy"
+        np.save(tmp, centroids)
+        os.replace(tmp, path)
+        with open(_manifest_path(path), "w") as fh:
+            json.dump({"fingerprint": fingerprint, "built_at": time.time(), "topics": len(centroids), "history": len(history)}, fh)
+        print(f"[Relevance] built index: {len(centroids)} topics, {len(history)} past posts -> {path}")
+        return np.load(path, mmap_mode="r")
+    except OSError as exc:
+        print(f"[Relevance] could not persist index ({exc}); using it in memory")
+        return centroids
+
+
+def score(texts: Sequence[str], centroids: "np.ndarray") -> "np.ndarray":
+    """Best cosine similarity of each text against any topic centroid."""
+    if not texts:
+        return np.zeros(0, dtype=np.float32)
+    return (embed(texts) @ np.asarray(centroids).T).max(axis=1)
+
+
+def _item_text(it: Dict) -> str:
+    return " ".join(filter(None, [it.get("title"), it.get("excerpt")]))
+
+
+def filter_relevant(
+    items: List[Dict],
+    centroids: Optional["np.ndarray"],
+    *,
+    min_score: float = MIN_SCORE,
+    min_keep: int = MIN_KEEP,
+) -> List[Dict]:
+    """Drop items scoring below min_score, keeping at least min_keep of the best. Sets item["relevance"]."""
+    if centroids is None or not items:
+        return items
+    scores = score([_item_text(it) for it in items], centroids)
+    for it, s in zip(items, scores):
+        it["relevance"] = round(float(s), 4)
+    floor = sorted(scores, reverse=True)[min(min_keep, len(items)) - 1] if min_keep > 0 else float("inf")
+    kept = [it for it, s in zip(items, scores) if s >= min(min_score, floor)]
+    if len(kept) < len(items):
+        print(f"[Relevance] kept {len(kept)}/{len(items)} candidates (min score {min_score})")
+    return kept
+
+
+def main():
+    from app.config import get_config
+
+    parser = argparse.ArgumentParser(description="Build or query the local relevance index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Rebuild the centroid matrix from keywords and post history")
+    p_score = sub.add_parser("score", help="Score texts against the current index")
+    p_score.add_argument("texts", nargs="+")
+    args = parser.parse_args()
+
+    if np is None:
+        raise SystemExit("numpy is required for the relevance index (pip install numpy)")
+    keywords = get_config().keywords
+    centroids = load_index(keywords, rebuild=args.command == "build")
+    if args.command == "score":
+        for text, s in zip(args.texts, score(args.texts, centroids)):
+            print(f"{s:.4f}  {text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import AccountConfig, AppConfig, get_config
+from app.db_mongo import initialize_database, ping_mongo, reset_mongo_client
+from app.fetch_reddit import make_reddit_client
+from app.fetch_x import make_search_client
+from app.generate import PostGenerator
+from app.post_x import make_oauth1_client
+from app import publish_queue, relevance
+
+
+class RuntimeContext:
+    """Long-lived clients shared by every run in this process (warm Lambda invocations, run_now repeats).
+
+    Clients are created lazily on first use and dropped by reset() so the next use rebuilds them.
+    """
+
+    def __init__(self, cfg: Optional[AppConfig] = None):
+        self.config = cfg or get_config()
+        self.created_at = time.time()
+        self.invocations = 0
+        self._lock = threading.Lock()
+        self._db_ready = False
+        self._generator: Optional[PostGenerator] = None
+        self._x_search_client: Any = None
+        self._reddit: Any = None
+        self._x_post_clients: Dict[str, Any] = {}
+        self._http: Optional[requests.Session] = None
+        self._relevance: Any = None
+        self._relevance_loaded_at = 0.0
+        self._sqs: Any = None
+
+    def ensure_database(self) -> None:
+        # Indexes and backfills only need to run once per process
+        if not self._db_ready:
+            initialize_database()
+            self._db_ready = True
+
+    def ensure_healthy(self) -> None:
+        """Ping Mongo and reconnect if the pooled client went stale (e.g. after a long freeze)."""
+        if not self._db_ready:
+            return
+        if not ping_mongo():
+            print("[Runtime] Mongo unhealthy; reconnecting")
+            reset_mongo_client()
+            if not ping_mongo():
+                print("[Runtime] Mongo still unreachable after reconnect")
+
+    def generator(self) -> PostGenerator:
+        if self._generator is None:
+            cfg = self.config
+            if cfg.gemini_api_key:
+                provider, api_key, model = "gemini", cfg.gemini_api_key, cfg.gemini_model
+            elif cfg.openai_api_key:
+                provider, api_key, model = "openai", cfg.openai_api_key, cfg.openai_model
+            else:
+                raise ValueError("No API key found for Gemini or OpenAI")
+            self._generator = PostGenerator(
+                api_key=api_key,
+                provider=provider,
+                model=model,
+                backend=cfg.llm_backend,
+                session=self.http_session() if cfg.llm_backend == "rest" else None,
+            )
+        return self._generator
+
+    def x_search_client(self):
+        if self._x_search_client is None and self.config.x_bearer_token:
+            self._x_search_client = make_search_client(self.config.x_bearer_token)
+        return self._x_search_client
+
+    def reddit(self):
+        cfg = self.config
+        if self._reddit is None and cfg.reddit_client_id and cfg.reddit_client_secret:
+            self._reddit = make_reddit_client(
+                client_id=cfg.reddit_client_id,
+                client_secret=cfg.reddit_client_secret,
+                user_agent=cfg.reddit_user_agent or "linkedin-x-autoposter/1.0",
+            )
+        return self._reddit
+
+    def http_session(self) -> requests.Session:
+        # Plain page/feed fetches; sized so every enrichment worker gets a pooled connection
+        if self._http is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._http = session
+        return self._http
+
+    def relevance_index(self):
+        # Centroid matrix (memory-mapped); reloaded once it is older than the index max age
+        if not relevance.available():
+            return None
+        if self._relevance is None or time.time() - self._relevance_loaded_at > relevance.MAX_AGE_HOURS * 3600:
+            self._relevance = relevance.load_index(self.config.keywords)
+            self._relevance_loaded_at = time.time()
+        return self._relevance
+
+    def sqs(self):
+        # PUBLISH_QUEUE_URL=local is the in-memory stand-in; boto3 ships with the Lambda runtime
+        if self.config.publish_queue_url == publish_queue.LOCAL_URL:
+            return publish_queue.local_queue()
+        if self._sqs is None:
+            import boto3
+
+            self._sqs = boto3.client("sqs")
+        return self._sqs
+
+    def x_post_client(self, account: AccountConfig):
+        if not account.has_x_oauth1:
+            return None
+        # Publishing runs one thread per account, so guard the shared cache
+        with self._lock:
+            client = self._x_post_clients.get(account.account_id)
+            if client is None:
+                client = make_oauth1_client(
+                    api_key=account.x_api_key,
+                    api_secret=account.x_api_secret,
+                    access_token=account.x_access_token,
+                    access_token_secret=account.x_access_token_secret,
+                    account_id=account.account_id,
+                )
+                self._x_post_clients[account.account_id] = client
+            return client
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """Drop one client ("generator", "x_search", "reddit", "x_post", "http", "relevance", "sqs", "mongo") or all of them."""
+        if name in (None, "generator"):
+            self._generator = None
+        if name in (None, "x_search"):
+            self._x_search_client = None
+        if name in (None, "reddit"):
+            self._reddit = None
+        if name in (None, "x_post"):
+            with self._lock:
+                self._x_post_clients.clear()
+        if name in (None, "http"):
+            if self._http is not None:
+                self._http.close()
+            self._http = None
+        if name in (None, "relevance"):
+            self._relevance = None
+        if name in (None, "sqs"):
+            self._sqs = None
+        if name in (None, "mongo"):
+            reset_mongo_client()
+            self._db_ready = False
+
+
+_RUNTIME: Optional[RuntimeContext] = None
+_RUNTIME_LOCK = threading.Lock()
+
+
+def get_runtime() -> Tuple[RuntimeContext, bool]:
+    """Returns the process-wide runtime and whether this call created it (a cold start)."""
+    global _RUNTIME
+    with _RUNTIME_LOCK:
+        cold = _RUNTIME is None
+        if cold:
+            _RUNTIME = RuntimeContext()
+        _RUNTIME.invocations += 1
+        return _RUNTIME, cold
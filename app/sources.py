@@ -0,0 +1,225 @@
+"""Source plugins, and running the enabled ones in parallel under one deadline.
+
+A source is a callable taking (deadline, partial) and returning (items,
+rate_limited) in the shared item shape (source, title, url, score, ...).
+deadline is the time.monotonic() by which gather_sources stops waiting; a
+source that works in units (subreddits, feeds, query shards) should not start
+new ones after it and should extend `partial` with each unit's items as they
+arrive, so whatever it collected is kept if it is still running at the
+deadline. Plugins register a factory with @register_source; the factory gets
+the runtime context and returns the callable, or None when the source is not
+configured. SOURCES picks and orders them.
+
+Merge strategies:
+
+- all: every item from every source that finished in time
+- first-non-empty: items of the first source, in priority order, that returned any
+- quota-per-source: the top `quota` items (by score) from each source
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app import tracing
+from app.enrich import canonical_url
+from app.fetch_feeds import fetch_feed_items, fetch_hackernews_items
+from app.fetch_reddit import fetch_reddit_items
+from app.fetch_x import fetch_x_items
+
+SourceFn = Callable[[float, List[Dict]], Tuple[List[Dict], bool]]
+SourceFactory = Callable[[Any], Optional[SourceFn]]
+
+SOURCE_REGISTRY: Dict[str, SourceFactory] = {}
+
+STRATEGIES = ("all", "first-non-empty", "quota-per-source")
+
+# RuntimeContext client each built-in source uses (see RuntimeContext.reset)
+SOURCE_CLIENTS: Dict[str, str] = {"x": "x_search", "reddit": "reddit"}
+
+
+def register_source(name: str) -> Callable[[SourceFactory], SourceFactory]:
+    def _register(factory: SourceFactory) -> SourceFactory:
+        SOURCE_REGISTRY[name] = factory
+        return factory
+
+    return _register
+
+
+@register_source("x")
+def _x_source(rt) -> Optional[SourceFn]:
+    cfg = rt.config
+    if not cfg.x_bearer_token:
+        return None
+    return lambda deadline, partial: fetch_x_items(
+        bearer_token=cfg.x_bearer_token,
+        keywords=list(cfg.keywords),
+        max_results=cfg.x_max_results,
+        queries=cfg.x_query_shards,
+        client=rt.x_search_client(),
+        deadline=deadline,
+        partial=partial,
+    )
+
+
+@register_source("reddit")
+def _reddit_source(rt) -> Optional[SourceFn]:
+    cfg = rt.config
+    if not (cfg.reddit_client_id and cfg.reddit_client_secret and cfg.reddit_user_agent):
+        return None
+    return lambda deadline, partial: fetch_reddit_items(
+        client_id=cfg.reddit_client_id,
+        client_secret=cfg.reddit_client_secret,
+        user_agent=cfg.reddit_user_agent,
+        keywords=list(cfg.keywords),
+        limit_per_subreddit=20,
+        subreddits=list(cfg.subreddits),
+        keyword_pattern=cfg.keyword_pattern,
+        reddit=rt.reddit(),
+        deadline=deadline,
+        partial=partial,
+    )
+
+
+@register_source("rss")
+def _rss_source(rt) -> Optional[SourceFn]:
+    cfg = rt.config
+    if not cfg.rss_feeds:
+        return None
+    return lambda deadline, partial: fetch_feed_items(
+        feeds=cfg.rss_feeds,
+        keyword_pattern=cfg.keyword_pattern,
+        session=rt.http_session(),
+        deadline=deadline,
+        partial=partial,
+    )
+
+
+@register_source("hackernews")
+def _hackernews_source(rt) -> Optional[SourceFn]:
+    # One request, so nothing partial to keep
+    return lambda deadline, partial: fetch_hackernews_items(
+        keyword_pattern=rt.config.keyword_pattern, session=rt.http_session()
+    )
+
+
+def build_sources(rt, names: Iterable[str], exclude: Iterable[str] = ()) -> List[Tuple[str, SourceFn]]:
+    """Configured sources among `names`, in that (priority) order."""
+    skip = set(exclude)
+    sources: List[Tuple[str, SourceFn]] = []
+    for name in names:
+        if name in skip:
+            continue
+        factory = SOURCE_REGISTRY.get(name)
+        if factory is None:
+            print(f"[Sources] unknown source {name!r}; registered: {', '.join(sorted(SOURCE_REGISTRY))}")
+            continue
+        fn = factory(rt)
+        if fn is not None:
+            sources.append((name, fn))
+    return sources
+
+
+@dataclass
+class SourceResult:
+    name: str
+    items: List[Dict] = field(default_factory=list)
+    rate_limited: bool = False
+    error: Optional[str] = None
+    timed_out: bool = False
+    elapsed: float = 0.0
+
+
+def _run(name: str, fn: SourceFn, deadline: float, partial: List[Dict]) -> SourceResult:
+    started = time.monotonic()
+    try:
+        with tracing.span(f"source:{name}"):
+            items, rate_limited = fn(deadline, partial)
+        return SourceResult(name, list(items or []), rate_limited, elapsed=time.monotonic() - started)
+    except Exception as exc:
+        return SourceResult(name, error=str(exc), elapsed=time.monotonic() - started)
+
+
+def dedupe_items(items: List[Dict]) -> List[Dict]:
+    """One item per canonical URL, keeping the highest-scored copy, in first-seen order."""
+    best: Dict[str, Dict] = {}
+    for it in items:
+        url = it.get("url")
+        if not url:
+            continue
+        key = canonical_url(url)
+        current = best.get(key)
+        if current is None or it.get("score", 0) > current.get("score", 0):
+            best[key] = it
+    return list(best.values())
+
+
+def merge_results(results: Sequence[SourceResult], strategy: str = "all", quota: int = 10) -> List[Dict]:
+    """results must be in source priority order."""
+    if strategy == "first-non-empty":
+        for res in results:
+            if res.items:
+                return dedupe_items(res.items)
+        return []
+    if strategy == "quota-per-source":
+        picked: List[Dict] = []
+        for res in results:
+            picked += sorted(res.items, key=lambda d: d.get("score", 0), reverse=True)[:quota]
+        return dedupe_items(picked)
+    return dedupe_items([it for res in results for it in res.items])
+
+
+def gather_sources(
+    sources: Sequence[Tuple[str, SourceFn]],
+    *,
+    strategy: str = "all",
+    deadline_seconds: float = 20.0,
+    quota: int = 10,
+) -> Tuple[List[Dict], List[SourceResult]]:
+    """Run (name, fn) sources concurrently and merge whatever finished before the deadline.
+
+    Sources still running at the deadline are abandoned (their threads finish in
+    the background); only the items they had already added to `partial` are kept.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown source strategy {strategy!r}; expected one of {', '.join(STRATEGIES)}")
+    if not sources:
+        return [], []
+
+    started = time.monotonic()
+    end = started + deadline_seconds
+    partials: Dict[str, List[Dict]] = {name: [] for name, _ in sources}
+    pool = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="source")
+    futures = [(name, pool.submit(_run, name, fn, end, partials[name])) for name, fn in sources]
+    try:
+        if strategy == "first-non-empty":
+            # Stop waiting as soon as the highest-priority non-empty source is known
+            for _, fut in futures:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait([fut], timeout=remaining)
+                if fut.done() and fut.result().items:
+                    break
+        else:
+            wait([fut for _, fut in futures], timeout=deadline_seconds)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    results: List[SourceResult] = []
+    for name, fut in futures:
+        if fut.done() and not fut.cancelled():
+            res = fut.result()
+        else:
+            # Copy: the abandoned thread may still be appending
+            res = SourceResult(name, list(partials[name]), timed_out=True, elapsed=time.monotonic() - started)
+        results.append(res)
+        if res.timed_out:
+            status = f"still running, kept {len(res.items)} items collected so far"
+        else:
+            status = res.error or f"{len(res.items)} items"
+        print(f"[Sources] {name}: {status} in {res.elapsed:.2f}s{' (rate limited)' if res.rate_limited else ''}")
+
+    items = merge_results(results, strategy, quota)
+    print(f"[Sources] {strategy}: {len(items)} candidates")
+    return items, results
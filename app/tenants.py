@@ -0,0 +1,124 @@
+"""Tenant configs and the source fetches shared between tenants.
+
+A tenant document in the `tenants` collection (MONGO_TENANTS_COLLECTION):
+
+    {"tenant_id": "acme", "enabled": true,
+     "keywords": ["kubernetes", "platform engineering"],
+     "subreddits": ["kubernetes", "devops"],
+     "rss_feeds": ["https://kubernetes.io/feed.xml"],
+     "sources": ["x", "reddit", "rss"],          # optional, defaults to SOURCES
+     "source_strategy": "quota-per-source",      # optional
+     "timeout_seconds": 300,                     # optional, defaults to TENANT_TIMEOUT_SECONDS
+     "credentials": {"x_bearer_token": "...", "openai_api_key": "..."},  # optional
+     "accounts": [{"account_id": "main", "linkedin_access_token": "..."}]}
+
+Anything not set falls back to the environment config, except accounts: a
+tenant publishes only to the accounts in its own document (never the
+operator's), and each account id is prefixed with the tenant id ("acme:main",
+or "acme" / "acme:1", ... when unnamed) so tenants never share dedup records or
+leases. `credentials` may override the X search bearer token and the LLM keys
+and models (TENANT_CREDENTIALS). Reddit, RSS and Hacker News are fetched once
+for the union of all tenants with the operator's credentials, and each tenant
+gets the items from its own subreddits/feeds that match its keywords.
+"""
+import dataclasses
+import re
+from typing import Any, Dict, List, Sequence
+
+from app.config import (
+    AppConfig,
+    account_from_dict,
+    compile_keyword_pattern,
+    normalize_keywords,
+    validate_subreddits,
+)
+
+# Sources whose results do not depend on tenant keywords, so one fetch serves every tenant
+SHARED_SOURCES = ("reddit", "rss", "hackernews")
+
+_MATCH_ALL = re.compile("")
+
+# AppConfig fields a tenant's `credentials` may override; the LLM keys are replaced together
+TENANT_CREDENTIALS = ("x_bearer_token", "openai_api_key", "openai_model", "gemini_api_key", "gemini_model")
+_LLM_KEYS = ("openai_api_key", "gemini_api_key")
+
+
+def tenant_account_id(tenant_id: str, index: int, account_id: Any = None) -> str:
+    if account_id:
+        return f"{tenant_id}:{account_id}"
+    return tenant_id if index == 0 else f"{tenant_id}:{index}"
+
+
+def tenant_config(base: AppConfig, doc: Dict[str, Any]) -> AppConfig:
+    """The environment config with this tenant's keywords, sources, credentials and accounts applied.
+
+    The result has no accounts when the document lists none; such a tenant must not publish.
+    """
+    from app.fetch_x import build_query_shards
+
+    tenant_id = str(doc["tenant_id"])
+    keywords = normalize_keywords(doc["keywords"]) if doc.get("keywords") else base.keywords
+    accounts = tuple(
+        account_from_dict({**a, "account_id": tenant_account_id(tenant_id, i, a.get("account_id"))})
+        for i, a in enumerate(doc.get("accounts") or [])
+    )
+    creds = {k: v for k, v in (doc.get("credentials") or {}).items() if k in TENANT_CREDENTIALS and v}
+    if any(k in creds for k in _LLM_KEYS):
+        # Otherwise an operator Gemini key would still win over a tenant OpenAI key
+        creds = {"openai_api_key": "", "gemini_api_key": None, **creds}
+    return dataclasses.replace(
+        base,
+        keywords=keywords,
+        keyword_pattern=compile_keyword_pattern(keywords),
+        x_query_shards=tuple(build_query_shards(list(keywords))),
+        subreddits=validate_subreddits(doc["subreddits"]) if doc.get("subreddits") else base.subreddits,
+        rss_feeds=tuple(doc["rss_feeds"]) if doc.get("rss_feeds") else base.rss_feeds,
+        sources=tuple(s.lower() for s in doc["sources"]) if doc.get("sources") else base.sources,
+        source_strategy=(doc.get("source_strategy") or base.source_strategy).lower(),
+        # Only the tenant's own accounts, never the operator's env or Mongo accounts
+        accounts=accounts,
+        accounts_source="env",
+        # Queued jobs are published with the operator's accounts (publish_handler), so tenants post inline
+        publish_mode="inline",
+        **creds,
+    )
+
+
+def shared_fetch_config(base: AppConfig, tenants: Sequence[AppConfig]) -> AppConfig:
+    """One config covering every tenant's shared sources, without keyword filtering."""
+    subreddits: Dict[str, str] = {}
+    feeds: Dict[str, None] = {}
+    sources: Dict[str, None] = {}
+    for cfg in tenants:
+        for sub in cfg.subreddits:
+            subreddits.setdefault(sub.lower(), sub)
+        feeds.update(dict.fromkeys(cfg.rss_feeds))
+        sources.update(dict.fromkeys(s for s in cfg.sources if s in SHARED_SOURCES))
+    return dataclasses.replace(
+        base,
+        subreddits=tuple(subreddits.values()),
+        rss_feeds=tuple(feeds),
+        sources=tuple(sources),
+        keyword_pattern=_MATCH_ALL,
+    )
+
+
+def items_for_tenant(cfg: AppConfig, shared: Dict[str, List[Dict]]) -> Dict[str, List[Dict]]:
+    """The slice of the shared fetch results that belongs to this tenant, per source name."""
+    subs = {s.lower() for s in cfg.subreddits}
+    feeds = set(cfg.rss_feeds)
+    out: Dict[str, List[Dict]] = {}
+    for name, items in shared.items():
+        if name not in cfg.sources:
+            continue
+        picked = []
+        for it in items:
+            if name == "reddit" and (it.get("subreddit") or "").lower() not in subs:
+                continue
+            if name == "rss" and it.get("feed") not in feeds:
+                continue
+            if cfg.keyword_pattern is not None and not cfg.keyword_pattern.search(it.get("title") or ""):
+                continue
+            picked.append(it)
+        out[name] = picked
+    return out
@@ -0,0 +1,241 @@
+"""Fit post text to platform limits the way the platforms count it.
+
+X counts a weighted length (twitter-text v3 config): every URL is 23, code
+points in the Latin/punctuation ranges below are 1, everything else (CJK,
+most symbols) is 2, and an emoji sequence is 2 however many code points it
+has. Text is NFC-normalized first. LinkedIn's commentary limit is counted here
+in UTF-16 code units, which is never less than the character count.
+
+Fitting keeps the trailing URL / "Source: <url>" / hashtag block and shortens
+the text before it at a grapheme boundary (a word boundary when one is close),
+dropping hashtags from the end only when the text would otherwise be cut to
+almost nothing. URLs are never cut.
+"""
+import re
+import unicodedata
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+X_MAX_WEIGHTED = 280
+X_URL_WEIGHT = 23
+LINKEDIN_MAX_CHARS = 3000
+ELLIPSIS = "…"
+
+# Code point ranges that weigh 1 on X (twitter-text v3 "ranges")
+_X_LIGHT = ((0x0000, 0x10FF), (0x2000, 0x200D), (0x2010, 0x201F), (0x2032, 0x2037))
+
+# Body weight kept before trailing hashtags are given up
+MIN_BODY_WEIGHT = 60
+
+# Scheme/www URLs, or bare domains on common TLDs (what X links as well)
+_URL = re.compile(
+    r"(?:https?://|www\.)[^\s<>\"]+"
+    r"|(?<![\w@.-])(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+"
+    r"(?:com|org|net|io|ai|dev|co|app|ly|me|gg|tech|news|blog|info|xyz|edu|gov|us|uk|de|in)"
+    r"(?![\w-])(?:/[^\s<>\"]*)?",
+    re.IGNORECASE,
+)
+_URL_TRAILING = ".,;:!?'\"”’»"
+_HASHTAG = re.compile(r"#\w+")
+_LABEL = re.compile(r"\w{1,20}:")
+
+_ZWJ = 0x200D
+
+
+def find_urls(text: str) -> List[Tuple[int, int]]:
+    """(start, end) of every URL, without trailing punctuation or an unbalanced closing parenthesis."""
+    if "." not in text:
+        return []
+    spans = []
+    for match in _URL.finditer(text):
+        start, end = match.span()
+        while end > start:
+            ch = text[end - 1]
+            if ch in _URL_TRAILING or (ch == ")" and text.count("(", start, end) < text.count(")", start, end)):
+                end -= 1
+            else:
+                break
+        if end > start:
+            spans.append((start, end))
+    return spans
+
+
+def _extends(cp: int, prev: int) -> bool:
+    """Whether code point cp belongs to the grapheme cluster ending in prev."""
+    if prev == _ZWJ or cp == _ZWJ:
+        return True
+    if 0xFE00 <= cp <= 0xFE0F or 0xE0100 <= cp <= 0xE01EF:  # variation selectors
+        return True
+    if 0x1F3FB <= cp <= 0x1F3FF or 0xE0020 <= cp <= 0xE007F or cp == 0x20E3:  # skin tones, tags, keycap
+        return True
+    return unicodedata.category(chr(cp)) in ("Mn", "Me", "Mc")
+
+
+def _regional(cp: int) -> bool:
+    return 0x1F1E6 <= cp <= 0x1F1FF
+
+
+def graphemes(text: str) -> Iterator[str]:
+    """Split text into (approximate extended) grapheme clusters: combining marks, emoji ZWJ/modifier
+    sequences, flags and CRLF stay together."""
+    start = 0
+    n = len(text)
+    i = 1
+    pairs = 1 if n and _regional(ord(text[0])) else 0
+    while i < n:
+        cp, prev = ord(text[i]), ord(text[i - 1])
+        if (prev == 0x0D and cp == 0x0A) or _extends(cp, prev):
+            i += 1
+            continue
+        if _regional(cp) and pairs % 2 == 1:
+            pairs += 1
+            i += 1
+            continue
+        yield text[start:i]
+        start = i
+        pairs = 1 if _regional(cp) else 0
+        i += 1
+    if start < n:
+        yield text[start:]
+
+
+def _is_emoji(cluster: str) -> bool:
+    for ch in cluster:
+        cp = ord(ch)
+        if (
+            0x1F000 <= cp <= 0x1FAFF
+            or 0x2600 <= cp <= 0x27BF
+            or 0x2300 <= cp <= 0x23FF
+            or 0x2B00 <= cp <= 0x2BFF
+            or cp == 0xFE0F
+            or cp == 0x20E3
+        ):
+            return True
+    return False
+
+
+def _x_cluster_weight(cluster: str) -> int:
+    if _is_emoji(cluster):
+        return 2
+    total = 0
+    for ch in cluster:
+        cp = ord(ch)
+        total += 1 if any(lo <= cp <= hi for lo, hi in _X_LIGHT) else 2
+    return total
+
+
+def _segments(text: str, weigh: Callable[[str], int], url_weight: Optional[int]) -> List[Tuple[str, int]]:
+    """(piece, weight) for every grapheme, with each URL as one piece."""
+    out: List[Tuple[str, int]] = []
+    pos = 0
+    for start, end in find_urls(text):
+        out.extend((g, weigh(g)) for g in graphemes(text[pos:start]))
+        url = text[start:end]
+        out.append((url, url_weight if url_weight is not None else sum(weigh(g) for g in graphemes(url))))
+        pos = end
+    out.extend((g, weigh(g)) for g in graphemes(text[pos:]))
+    return out
+
+
+def _utf16_len(text: str) -> int:
+    return len(text) + sum(1 for ch in text if ord(ch) > 0xFFFF)
+
+
+def x_length(text: str) -> int:
+    """Weighted length of text as X counts it."""
+    text = unicodedata.normalize("NFC", text)
+    urls = find_urls(text)
+    if text.isascii():
+        # Every ASCII character weighs 1
+        return len(text) + sum(X_URL_WEIGHT - (end - start) for start, end in urls)
+    return sum(w for _, w in _segments(text, _x_cluster_weight, X_URL_WEIGHT))
+
+
+def linkedin_length(text: str) -> int:
+    return _utf16_len(text)
+
+
+def _truncate(text: str, budget: int, weigh: Callable[[str], int], url_weight: Optional[int]) -> str:
+    """Shorten text to at most budget (including the ellipsis) at a grapheme boundary."""
+    segments = _segments(text, weigh, url_weight)
+    if sum(w for _, w in segments) <= budget:
+        return text
+    room = budget - weigh(ELLIPSIS)
+    used = end = 0
+    for piece, weight in segments:
+        if used + weight > room:
+            break
+        used += weight
+        end += len(piece)
+    cut = text[:end]
+    # Prefer ending on a word when that loses little
+    space = max(cut.rfind(" "), cut.rfind("\n"))
+    if space >= len(cut) * 0.8:
+        cut = cut[:space]
+    cut = cut.rstrip(" \t\n,;:-–—")
+    return f"{cut}{ELLIPSIS}" if cut else ""
+
+
+def _split_tail(text: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Split off the trailing run of URLs, hashtags and short labels ("Source:").
+
+    Returns the body and the tail as (separator, token) pairs.
+    """
+    urls = {start: end for start, end in find_urls(text)}
+    tokens = [(m.start(), m.end()) for m in re.finditer(r"\S+", text)]
+    tail: List[Tuple[str, str]] = []
+    body_end = len(text)
+    for i in range(len(tokens) - 1, -1, -1):
+        start, end = tokens[i]
+        token = text[start:end]
+        if not (_HASHTAG.fullmatch(token) or urls.get(start) == end or _LABEL.fullmatch(token)):
+            break
+        prev_end = tokens[i - 1][1] if i > 0 else 0
+        # Keep line breaks, drop trailing spaces before them
+        tail.insert(0, (text[prev_end:start].lstrip(" \t") or " ", token))
+        body_end = prev_end
+    return text[:body_end], tail
+
+
+def _fit(text: str, limit: int, weigh: Callable[[str], int], url_weight: Optional[int], length: Callable[[str], int]) -> str:
+    text = unicodedata.normalize("NFC", text.strip())
+    if length(text) <= limit:
+        return text
+    body, tail = _split_tail(text)
+
+    def _join(parts: List[Tuple[str, str]]) -> str:
+        return "".join(sep + token for sep, token in parts)
+
+    min_body = min(MIN_BODY_WEIGHT, length(body))
+    while length(_join(tail)) > limit - min_body and any(_HASHTAG.fullmatch(t) for _, t in tail):
+        # Drop the last hashtag
+        last = max(i for i, (_, t) in enumerate(tail) if _HASHTAG.fullmatch(t))
+        tail = tail[:last] + tail[last + 1:]
+    tail_text = _join(tail)
+    if not body.strip():
+        return _truncate(tail_text.strip(), limit, weigh, url_weight)
+    budget = limit - length(tail_text)
+    if budget <= weigh(ELLIPSIS):
+        return _truncate(text, limit, weigh, url_weight)
+    return (_truncate(body, budget, weigh, url_weight) + tail_text).strip()
+
+
+def fit_x(
+    text: str,
+    *,
+    url: Optional[str] = None,
+    hashtags: Sequence[str] = (),
+    limit: int = X_MAX_WEIGHTED,
+) -> str:
+    """text, followed by url and hashtags when given and not already in it, within limit as X counts it."""
+    text = text.strip()
+    if url and url not in text:
+        text = f"{text} {url}".strip()
+    missing = [tag for tag in hashtags if tag not in text]
+    if missing:
+        text = f"{text}\n{' '.join(missing)}".strip()
+    return _fit(text, limit, _x_cluster_weight, X_URL_WEIGHT, x_length)
+
+
+def fit_linkedin(text: str, *, limit: int = LINKEDIN_MAX_CHARS) -> str:
+    """text within LinkedIn's commentary limit, keeping the trailing source line and hashtags."""
+    return _fit(text, limit, _utf16_len, None, linkedin_length)
@@ -0,0 +1,158 @@
+"""LLM token budgets: local prompt estimates, a per-call prompt cap and a per-day budget in MongoDB.
+
+Before each model call PostGenerator estimates the prompt locally (tiktoken when
+it is installed, otherwise a conservative character/word heuristic) and reserves
+prompt + max output tokens against the day's budget for its provider:
+
+    reservation = token_budget.reserve("openai", estimate + MAX_OUTPUT_TOKENS)
+    ... call the model ...
+    token_budget.settle(reservation, prompt_tokens, output_tokens)
+
+Reservations are atomic, so concurrent runs cannot jointly overshoot the budget.
+settle() swaps the reservation for the usage the provider reported. Daily totals
+live in MONGO_LLM_USAGE_COLLECTION (default `llm_usage`), one document per
+provider and UTC day.
+"""
+import math
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from app import cassette
+from app.db_mongo import get_mongo_db
+
+try:
+    import tiktoken
+except Exception:  # pragma: no cover
+    tiktoken = None  # type: ignore
+
+# Largest prompt sent in one call; the item list is shrunk to fit
+MAX_PROMPT_TOKENS = int(os.getenv("LLM_MAX_PROMPT_TOKENS", "6000"))
+# max_tokens (OpenAI) / max_output_tokens (Gemini)
+MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "1024"))
+# Prompt + output tokens per provider per UTC day; 0 disables the daily budget
+DAILY_TOKEN_BUDGET = int(os.getenv("LLM_DAILY_TOKEN_BUDGET", "200000"))
+
+# Heuristic estimate: ~4 characters per token for words, one per punctuation mark or non-Latin character
+_PIECES = re.compile(r"[A-Za-z0-9]+|\s+|[^\sA-Za-z0-9]")
+_SAFETY = 1.1
+
+_encodings: Dict[str, Any] = {}
+_encodings_lock = threading.Lock()
+
+
+class BudgetExceeded(Exception):
+    """Raised when a call would go over the per-call or per-day token budget."""
+
+
+def _encoding(model: Optional[str]):
+    if tiktoken is None:
+        return None
+    name = model or ""
+    with _encodings_lock:
+        if name not in _encodings:
+            try:
+                _encodings[name] = tiktoken.encoding_for_model(name)
+            except Exception:
+                try:
+                    _encodings[name] = tiktoken.get_encoding("o200k_base")
+                except Exception:
+                    _encodings[name] = None
+        return _encodings[name]
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """Prompt tokens for text: exact with tiktoken (OpenAI models), otherwise a slight overestimate."""
+    enc = _encoding(model) if model and not model.startswith("gemini") else None
+    if enc is not None:
+        return len(enc.encode(text))
+    count = 0
+    for piece in _PIECES.findall(text):
+        if piece[0].isspace():
+            continue
+        count += math.ceil(len(piece) / 4) if piece[0].isalnum() and piece.isascii() else 1
+    return math.ceil(count * _SAFETY)
+
+
+def _collection():
+    return get_mongo_db()[os.getenv("MONGO_LLM_USAGE_COLLECTION", "llm_usage")]
+
+
+def _day_key(provider: str) -> str:
+    return f"{provider}:{datetime.utcnow().strftime('%Y-%m-%d')}"
+
+
+def reserve(provider: str, tokens: int, budget: int = DAILY_TOKEN_BUDGET) -> Optional[Dict[str, Any]]:
+    """Reserve tokens against today's budget. Raises BudgetExceeded when they do not fit.
+
+    Returns the reservation for settle(), or None when nothing was recorded
+    (no budget, cassette replay, or the usage store is unavailable).
+    """
+    if budget <= 0 or cassette.is_replaying():
+        return None
+    if tokens > budget:
+        raise BudgetExceeded(f"{provider}: call needs {tokens} tokens, daily budget is {budget}")
+    key = _day_key(provider)
+    # Two attempts: the first upsert of the day can collide with another run's
+    for attempt in range(2):
+        try:
+            # Matches only while the reservation fits; otherwise the upsert collides with the existing day document
+            _collection().update_one(
+                {"_id": key, "tokens": {"$lte": budget - tokens}},
+                {"$inc": {"tokens": tokens, "reserved": tokens, "calls": 1}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True,
+            )
+            return {"_id": key, "tokens": tokens}
+        except DuplicateKeyError:
+            if attempt:
+                break
+        except Exception as exc:
+            # Same policy as the rate limiter: an unavailable store never blocks generation
+            print(f"[Tokens] {provider}: usage store unavailable ({exc}); allowing call")
+            return None
+    raise BudgetExceeded(f"{provider}: daily token budget of {budget} reached")
+
+
+def settle(reservation: Optional[Dict[str, Any]], prompt_tokens: Optional[int], output_tokens: Optional[int]) -> None:
+    """Replace a reservation with the usage the provider reported (kept as is when it reported none)."""
+    if reservation is None or prompt_tokens is None:
+        return
+    actual = prompt_tokens + (output_tokens or 0)
+    try:
+        _collection().update_one(
+            {"_id": reservation["_id"]},
+            {
+                "$inc": {
+                    "tokens": actual - reservation["tokens"],
+                    "reserved": -reservation["tokens"],
+                    "prompt_tokens": prompt_tokens,
+                    "output_tokens": output_tokens or 0,
+                },
+                "$set": {"updated_at": datetime.utcnow()},
+            },
+        )
+    except Exception as exc:
+        print(f"[Tokens] could not record usage: {exc}")
+
+
+def release(reservation: Optional[Dict[str, Any]]) -> None:
+    """Give back a reservation whose call failed (timeout, HTTP error), so it does not hold the budget."""
+    settle(reservation, 0, 0)
+
+
+def usage_today(provider: str) -> Dict[str, Any]:
+    doc = _collection().find_one({"_id": _day_key(provider)}, {"_id": 0}) or {}
+    return {"budget": DAILY_TOKEN_BUDGET, **doc}
+
+
+def main():
+    for provider in ("openai", "gemini"):
+        print(f"[Tokens] {provider}: {usage_today(provider)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Lightweight spans for profiling runs (run_now.py --timeline / --trace-malloc).
+
+    with tracing.span("fetch"):
+        ...
+
+Spans cost one check when nothing is recording. While a recorder is active
+every span becomes a Chrome trace event ("X" phase, microseconds), viewable in
+chrome://tracing or https://ui.perfetto.dev. Listeners get a callback when a
+stage span (STAGES) ends, which the tracemalloc option uses to diff memory
+per stage.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Top-level pipeline stages, in run order
+STAGES = ("fetch", "rank", "enrich", "generate", "publish")
+
+_lock = threading.Lock()
+_events: Optional[List[Dict[str, Any]]] = None
+_listeners: List[Callable[[str], None]] = []
+_thread_names: Dict[int, str] = {}
+_origin = time.perf_counter()
+
+
+def start() -> None:
+    """Begin collecting trace events (clears any previous ones)."""
+    global _events
+    with _lock:
+        _events = []
+
+
+def stop() -> List[Dict[str, Any]]:
+    global _events
+    with _lock:
+        events, _events = _events or [], None
+    return events
+
+
+def add_stage_listener(fn: Callable[[str], None]) -> None:
+    _listeners.append(fn)
+
+
+def remove_stage_listener(fn: Callable[[str], None]) -> None:
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+def _now_us() -> float:
+    return (time.perf_counter() - _origin) * 1_000_000
+
+
+@contextmanager
+def span(name: str, **args: Any) -> Iterator[None]:
+    if _events is None and not _listeners:
+        yield
+        return
+    begin = _now_us()
+    try:
+        yield
+    finally:
+        end = _now_us()
+        with _lock:
+            if _events is not None:
+                _thread_names.setdefault(threading.get_ident(), threading.current_thread().name)
+                _events.append({
+                    "name": name,
+                    "cat": "stage" if name in STAGES else "span",
+                    "ph": "X",
+                    "ts": round(begin, 1),
+                    "dur": round(end - begin, 1),
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": {k: str(v) for k, v in args.items()},
+                })
+        if name in STAGES:
+            for fn in list(_listeners):
+                fn(name)
+
+
+def save(path: str, events: List[Dict[str, Any]]) -> None:
+    """Write events in Chrome trace-event JSON format, with thread names for readability."""
+    meta = [
+        {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": _thread_names.get(tid, str(tid))}}
+        for tid in {e["tid"] for e in events}
+    ]
+    with open(path, "w") as fh:
+        json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, fh)
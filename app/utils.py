@@ -1,14 +1,11 @@
 from typing import List, Dict
 
+from app.text_fit import X_MAX_WEIGHTED, fit_x
 
-def truncate_for_x(text: str, url: str, max_len: int = 280) -> str:
-    # Reserve space for space + url
-    reserve = len(url) + 1
-    core_max = max_len - reserve
-    core = text.strip()
-    if len(core) > core_max:
-        core = core[: max(0, core_max - 3)] + "..."
-    return f"{core} {url}".strip()
+
+def truncate_for_x(text: str, url: str, max_len: int = X_MAX_WEIGHTED) -> str:
+    # Weighted like X counts it (URL = 23, CJK/emoji = 2); see app/text_fit.py
+    return fit_x(text, url=url, limit=max_len)
 
 
 def pick_top_items(items: List[Dict], max_items: int = 2) -> List[Dict]:
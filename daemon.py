@@ -0,0 +1,215 @@
+import argparse
+import os
+import signal
+import threading
+from datetime import datetime
+from typing import Dict, List
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from app.archive import archive
+from app.runtime import RuntimeContext, get_runtime
+from main import fetch_items, generate_posts, publish_posts
+
+# Cap on fetched candidates kept between generate runs; the oldest are dropped first
+MAX_CANDIDATES = 200
+
+
+class DaemonState:
+    """Hand-off between the fetch, generate and publish jobs. All access goes through the lock."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.candidates: Dict[str, Dict] = {}
+        self.ready: List[Dict] = []
+
+    def add_candidates(self, items: List[Dict]) -> int:
+        with self.lock:
+            for it in items:
+                url = it.get("url")
+                if url:
+                    # Later fetches refresh score/metadata for the same URL
+                    self.candidates.pop(url, None)
+                    self.candidates[url] = it
+            while len(self.candidates) > MAX_CANDIDATES:
+                self.candidates.pop(next(iter(self.candidates)))
+            return len(self.candidates)
+
+    def take_candidates(self) -> List[Dict]:
+        with self.lock:
+            items = list(self.candidates.values())
+            self.candidates.clear()
+        items.sort(key=lambda d: d.get("score", 0), reverse=True)
+        return items
+
+    def add_ready(self, posts: List[Dict]) -> None:
+        with self.lock:
+            self.ready.extend(posts)
+
+    def take_ready(self) -> List[Dict]:
+        with self.lock:
+            posts, self.ready = self.ready, []
+        return posts
+
+
+def _guarded(name: str, lock: threading.Lock, fn):
+    """Skip a tick instead of overlapping with a previous run of the same job."""
+
+    def _run():
+        if not lock.acquire(blocking=False):
+            print(f"[Daemon] {name}: previous run still in progress; skipping")
+            return
+        try:
+            fn()
+        except Exception as exc:
+            print(f"[Daemon] {name} failed: {exc}")
+        finally:
+            lock.release()
+
+    return _run
+
+
+def build_scheduler(
+    rt: RuntimeContext,
+    state: DaemonState,
+    *,
+    fetch_minutes: float,
+    generate_minutes: float,
+    publish_minutes: float,
+    archive_hours: float = 0,
+) -> BackgroundScheduler:
+    """Fetch and archive start right away; generate first runs when the first fetch ends, and
+    publish when the first generate ends, so the first post does not wait a whole interval."""
+    scheduler = BackgroundScheduler(timezone="UTC")
+    waiting = {"generate", "publish"}
+
+    def _start(name: str) -> None:
+        # First run of a chained job; later runs follow its own interval
+        if name in waiting:
+            waiting.discard(name)
+            if scheduler.get_job(name) is not None:
+                scheduler.modify_job(name, next_run_time=datetime.utcnow())
+
+    def fetch_job():
+        try:
+            rt.ensure_healthy()
+            total = state.add_candidates(fetch_items(rt))
+            print(f"[Daemon] fetch: {total} candidates queued")
+        finally:
+            _start("generate")
+
+    def generate_job():
+        try:
+            items = state.take_candidates()
+            if not items:
+                return
+            posts = generate_posts(rt, items)
+            state.add_ready(posts)
+            print(f"[Daemon] generate: {len(posts)} posts ready from {len(items)} candidates")
+        finally:
+            _start("publish")
+
+    def publish_job():
+        # Runs even without new posts: publish_posts also retries pending records
+        posts = state.take_ready()
+        rt.ensure_healthy()
+        publish_posts(rt, posts)
+        if posts:
+            print(f"[Daemon] publish: {len(posts)} posts published")
+
+    def archive_job():
+        rt.ensure_healthy()
+        totals = archive()
+        print(f"[Daemon] archive: {totals['archived']} records moved")
+
+    now = datetime.utcnow()
+    jobs = (
+        ("fetch", fetch_minutes, fetch_job, None),
+        ("generate", generate_minutes, generate_job, "fetch"),
+        ("publish", publish_minutes, publish_job, "generate"),
+        ("archive", archive_hours * 60, archive_job, None),
+    )
+    enabled = {name for name, minutes, _, _ in jobs if minutes > 0}
+    for name, minutes, fn, after in jobs:
+        if minutes <= 0:
+            continue
+        if after in enabled:
+            # Added paused; _start() schedules the first run once `after` has run
+            first_run = None
+        else:
+            waiting.discard(name)
+            first_run = now
+        scheduler.add_job(
+            _guarded(name, threading.Lock(), fn),
+            "interval",
+            minutes=minutes,
+            id=name,
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=60,
+            next_run_time=first_run,
+        )
+    return scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fetch/generate/publish pipeline on an in-process schedule")
+    parser.add_argument(
+        "--fetch-minutes", type=float, default=float(os.getenv("DAEMON_FETCH_MINUTES", "30")),
+        help="Minutes between source fetches (default: DAEMON_FETCH_MINUTES or 30)",
+    )
+    parser.add_argument(
+        "--generate-minutes", type=float, default=float(os.getenv("DAEMON_GENERATE_MINUTES", "240")),
+        help="Minutes between generation passes (default: DAEMON_GENERATE_MINUTES or 240)",
+    )
+    parser.add_argument(
+        "--publish-minutes", type=float, default=float(os.getenv("DAEMON_PUBLISH_MINUTES", "5")),
+        help="Minutes between publish passes (default: DAEMON_PUBLISH_MINUTES or 5)",
+    )
+    parser.add_argument(
+        "--archive-hours", type=float, default=float(os.getenv("DAEMON_ARCHIVE_HOURS", "24")),
+        help="Hours between archival runs (app/archive.py); 0 disables (default: DAEMON_ARCHIVE_HOURS or 24)",
+    )
+    args = parser.parse_args()
+
+    rt, _ = get_runtime()
+    rt.ensure_database()
+    state = DaemonState()
+    scheduler = build_scheduler(
+        rt,
+        state,
+        fetch_minutes=args.fetch_minutes,
+        generate_minutes=args.generate_minutes,
+        publish_minutes=args.publish_minutes,
+        archive_hours=args.archive_hours,
+    )
+
+    stop = threading.Event()
+
+    def _request_stop(signum, _frame):
+        print(f"[Daemon] signal {signum} received; shutting down after running jobs finish")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    scheduler.start()
+    print(
+        f"[Daemon] started: fetch every {args.fetch_minutes}m, "
+        f"generate every {args.generate_minutes}m, publish every {args.publish_minutes}m, "
+        f"archive every {args.archive_hours}h"
+    )
+    stop.wait()
+
+    scheduler.shutdown(wait=True)
+    # Generated posts already cost a model call; publish them rather than dropping them
+    leftover = state.take_ready()
+    if leftover:
+        print(f"[Daemon] publishing {len(leftover)} generated posts before exit")
+        publish_posts(rt, leftover)
+    rt.reset("mongo")
+    print("[Daemon] stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,28 @@
 import os
 from typing import Any, Dict
+from app.deadline import Deadline
+from app.generate import outcome_counts
+from app.runtime import get_runtime
 from main import run_once
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    # Always run a full cycle (no dry-run, fetch from both sources)
-    run_once()
-    return {"status": "ok"}
+    # Always run a full cycle (no dry-run, fetch from both sources).
+    # The runtime (config, Mongo, LLM, X and Reddit clients) survives between warm invocations.
+    # Stages split the invocation's remaining time; work that does not fit is recorded as pending.
+    deadline = Deadline.from_lambda_context(context)
+    runtime, cold = get_runtime()
+    runtime.ensure_healthy()
+    run_once(runtime=runtime, deadline=deadline)
+    out = {
+        "status": "ok",
+        "start": "cold" if cold else "warm",
+        "invocation": runtime.invocations,
+        "generation": outcome_counts(),
+    }
+    if deadline is not None:
+        out["seconds_to_spare"] = round(deadline.remaining(), 1)
+    return out
 
 
 if __name__ == "__main__":
@@ -1,150 +1,142 @@
 import argparse
+import os
+import time
+from collections import Counter
 from datetime import datetime
 from typing import List, Dict, Optional
 
-from app.config import read_config
-from app.db_mongo import (
-    initialize_database,
-    has_been_posted,
-    record_post,
-    exists_record,
-)
-from app.fetch_reddit import fetch_reddit_items
-from app.fetch_x import fetch_x_items
-from app.generate import  PostGenerator
-from app.post_linkedin import post_linkedin
-from app.post_x import post_x
-from app.utils import truncate_for_x
+from app import tracing
+from app.deadline import Deadline
+from app.enrich import enrich_items
+from app.publish_queue import enqueue, make_jobs
+from app.publisher import load_target_accounts, pending_jobs, publish_jobs, publish_to_accounts
+from app.relevance import filter_relevant
+from app.runtime import RuntimeContext, get_runtime
+from app.sources import SOURCE_CLIENTS, build_sources, gather_sources
 
+# Seconds of generate budget below which the LLM call is not attempted
+MIN_GENERATE_SECONDS = float(os.getenv("DEADLINE_MIN_GENERATE_SECONDS", "8"))
 
 
-def run_once(*, override_items: Optional[List[Dict]] = None) -> None:
-    cfg = read_config()
-    initialize_database()
+def fetch_items(
+    rt: RuntimeContext,
+    *,
+    disable_reddit: bool = False,
+    disable_x: bool = False,
+    deadline: Optional[Deadline] = None,
+) -> List[Dict]:
+    cfg = rt.config
+    # Enabled sources in priority order; they run in parallel and are merged by cfg.source_strategy
+    exclude = [name for name, off in (("reddit", disable_reddit), ("x", disable_x)) if off]
+    wait_seconds = cfg.source_deadline_seconds
+    if deadline is not None:
+        wait_seconds = min(wait_seconds, deadline.budget("fetch"))
+    with tracing.span("fetch"):
+        items, results = gather_sources(
+            build_sources(rt, cfg.sources, exclude),
+            strategy=cfg.source_strategy,
+            deadline_seconds=wait_seconds,
+            quota=cfg.source_quota,
+        )
+    # A source that raised or hung may hold a broken client; rebuild it next run
+    for res in results:
+        client = SOURCE_CLIENTS.get(res.name)
+        if client and (res.error or res.timed_out):
+            print(f"[Runtime] dropping {client} client after {res.name} failure")
+            rt.reset(client)
+    return items
+
+
+def generate_posts(rt: RuntimeContext, items: List[Dict], deadline: Optional[Deadline] = None) -> List[Dict]:
+    # Drop off-topic items before they cost tokens, give the model article excerpts
+    # for the top candidates, then let it pick one
+    with tracing.span("rank", candidates=len(items)):
+        items = filter_relevant(items, rt.relevance_index())
+    if not items:
+        return []
+    # Article fetches share the rank budget; they are optional, so they just stop early
+    enrich_until = time.monotonic() + deadline.budget("rank") if deadline is not None else None
+    with tracing.span("enrich"):
+        items = enrich_items(items, session=rt.http_session(), deadline=enrich_until)
+    generate_until = None
+    if deadline is not None:
+        budget = deadline.budget("generate")
+        if budget < MIN_GENERATE_SECONDS:
+            # Template posts still reach publishing, which records them as pending if it is out of time too
+            print(f"[Deadline] {budget:.1f}s left for generation; using template posts instead of the LLM")
+            return rt.generator().fallback(items)
+        generate_until = time.monotonic() + budget
+    generator = rt.generator()
+    with tracing.span("generate"):
+        posts = generator.generate(items=items, deadline=generate_until)
+    if generator.last_error:
+        print("[Runtime] dropping the LLM client after a failed call")
+        rt.reset("generator")
+    return posts
+
+
+def publish_posts(rt: RuntimeContext, posts: List[Dict], deadline: Optional[Deadline] = None) -> None:
+    # Post and log: one generation pass fans out to every target account.
+    # Publishing gets all the time left; posts that cannot start in time are recorded as pending,
+    # and pending posts from earlier runs are retried with their stored text.
+    cfg = rt.config
+    until = deadline.at if deadline is not None else None
+    with tracing.span("publish", posts=len(posts)):
+        rt.ensure_database()
+        accounts = load_target_accounts(cfg)
+        if cfg.publish_mode == "queue" and cfg.publish_queue_url:
+            # publish_handler posts the jobs; any SQS did not accept are posted here instead
+            jobs = make_jobs(posts, accounts) + pending_jobs(accounts)
+            unsent = enqueue(rt.sqs(), cfg.publish_queue_url, jobs) if jobs else []
+            if unsent:
+                publish_jobs(unsent, accounts, runtime=rt, deadline=until)
+            return
+        if cfg.publish_mode == "queue":
+            print("[Publish] PUBLISH_MODE=queue but PUBLISH_QUEUE_URL is not set; publishing inline")
+        started = datetime.utcnow()
+        publish_to_accounts(posts, accounts, max_workers=cfg.publish_concurrency, runtime=rt, deadline=until)
+        retry = pending_jobs(accounts, updated_before=started)
+        if retry:
+            outcomes = publish_jobs(retry, accounts, runtime=rt, deadline=until)
+            print(f"[Publish] retried {len(retry)} pending posts: {dict(Counter(outcomes))}")
+
+
+def run_once(
+    *,
+    override_items: Optional[List[Dict]] = None,
+    dry_run: bool = False,
+    disable_reddit: bool = False,
+    disable_x: bool = False,
+    runtime: Optional[RuntimeContext] = None,
+    deadline: Optional[Deadline] = None,
+) -> None:
+    """One fetch -> generate -> publish cycle. With a deadline each stage keeps to its time budget."""
+    rt = runtime or get_runtime()[0]
+    if not dry_run:
+        rt.ensure_database()
 
-    # Collect items from sources with rate-limit-aware fallback
-    items: List[Dict] = []
     if override_items is not None:
         items = list(override_items)
     else:
-        x_rate_limited = False
-        if cfg.x_bearer_token:
-            x_items, x_rate_limited = fetch_x_items(bearer_token=cfg.x_bearer_token, keywords=cfg.keywords, max_results=3)
-            items += x_items
-        if cfg.reddit_client_id and cfg.reddit_client_secret and cfg.reddit_user_agent:
-            # If X was rate-limited or returned nothing, try Reddit
-            if x_rate_limited or not items:
-                r_items, r_rate_limited = fetch_reddit_items(
-                    client_id=cfg.reddit_client_id,
-                    client_secret=cfg.reddit_client_secret,
-                    user_agent=cfg.reddit_user_agent,
-                    keywords=cfg.keywords,
-                    limit_per_subreddit=20,
-                )
-                items += r_items
+        items = fetch_items(rt, disable_reddit=disable_reddit, disable_x=disable_x, deadline=deadline)
 
     if not items:
         print("No items fetched.")
+        if not dry_run:
+            # Still retry what earlier runs left pending
+            publish_posts(rt, [], deadline=deadline)
         return
 
-    # Generate posts from all items; model will pick top one
-    
-    if cfg.gemini_api_key:
-        provider = "gemini"
-        api_key = cfg.gemini_api_key
-        model = cfg.gemini_model
-    elif cfg.openai_api_key:
-        provider = "openai"
-        api_key = cfg.openai_api_key
-        model = cfg.openai_model
-    else:
-        raise ValueError("No API key found for Gemini or OpenAI")
-
-    generator = PostGenerator(api_key=api_key, provider=provider, model=model)
-    posts = generator.generate(items=items)
-
-    # Post and log
-    for gen in posts:
-        url = gen.get("url") or ""
-        title = gen.get("title") or ""
-
-        # LinkedIn
-        if cfg.linkedin_access_token:
-            if not has_been_posted("linkedin", url):
-                text = gen.get("linkedin") or f"{title}\n\n{url}"
-                success, error = post_linkedin(
-                    access_token=cfg.linkedin_access_token, 
-                    text=text, 
-                    url=url, 
-                    title=title
-                )
-                record_post(
-                    platform="linkedin",
-                    source=gen.get("source") or "",
-                    source_url=url,
-                    title=title,
-                    linkedin_text=text,
-                    x_text=None,
-                    success=success,
-                    error=error,
-                    posted_at=datetime.utcnow() if success else None,
-                )
-        else:
-            # Queue as pending if not already recorded
-            text = gen.get("linkedin") or f"{title}\n\n{url}"
-            if not exists_record(platform="linkedin", source_url=url):
-                record_post(
-                    platform="linkedin",
-                    source=gen.get("source") or "",
-                    source_url=url,
-                    title=title,
-                    linkedin_text=text,
-                    x_text=None,
-                    success=False,
-                    error="pending: missing LinkedIn credentials",
-                    posted_at=None,
-                )
-
-        # X
-        has_oauth1 = bool(cfg.x_api_key and cfg.x_api_secret and cfg.x_access_token and cfg.x_access_token_secret)
-        has_oauth2 = bool(cfg.x_oauth2_access_token)
-        if has_oauth1 or has_oauth2:
-            if not has_been_posted("x", url):
-                x_text = gen.get("x") or truncate_for_x(title, url)
-                success, error = post_x(
-                    text=x_text,
-                    api_key=cfg.x_api_key,
-                    api_secret=cfg.x_api_secret,
-                    access_token=cfg.x_access_token,
-                    access_token_secret=cfg.x_access_token_secret,
-                    oauth2_access_token=cfg.x_oauth2_access_token,
-                )
-                record_post(
-                    platform="x",
-                    source=gen.get("source") or "",
-                    source_url=url,
-                    title=title,
-                    linkedin_text=None,
-                    x_text=x_text,
-                    success=success,
-                    error=error,
-                    posted_at=datetime.utcnow() if success else None,
-                )
-        else:
-            # Queue as pending if not already recorded
-            x_text = gen.get("x") or truncate_for_x(title, url)
-            if not exists_record(platform="x", source_url=url):
-                record_post(
-                    platform="x",
-                    source=gen.get("source") or "",
-                    source_url=url,
-                    title=title,
-                    linkedin_text=None,
-                    x_text=x_text,
-                    success=False,
-                    error="pending: missing X credentials",
-                    posted_at=None,
-                )
+    posts = generate_posts(rt, items, deadline=deadline)
+
+    if dry_run:
+        # Nothing is posted and no post records are written. Fetching and generation still use Mongo
+        # (article/feed caches, token budget reservations and usage, rate-limit buckets).
+        for gen in posts:
+            print(f"[DRY RUN] {gen.get('url')}\n--- LinkedIn ---\n{gen.get('linkedin')}\n--- X ---\n{gen.get('x')}")
+        return
+
+    publish_posts(rt, posts, deadline=deadline)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,41 @@
+import json
+from collections import Counter
+from typing import Any, Dict, List
+
+from app.deadline import Deadline
+from app.publisher import DEFERRED, FAILED, load_target_accounts, publish_jobs
+from app.runtime import get_runtime
+
+# Outcomes SQS should deliver again (deferred: deadline reached or circuit open); everything else
+# is done (posted, skipped) or cannot succeed on a retry (pending: missing credentials, invalid)
+RETRY_OUTCOMES = {FAILED, DEFERRED, "error"}
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """SQS batch of publish jobs (app/publish_queue.py). Failed jobs are returned in batchItemFailures."""
+    deadline = Deadline.from_lambda_context(context)
+    runtime, _ = get_runtime()
+    runtime.ensure_healthy()
+    runtime.ensure_database()
+
+    records = event.get("Records") or []
+    jobs: List[Dict[str, Any]] = []
+    message_ids: List[str] = []
+    for record in records:
+        try:
+            job = json.loads(record["body"])
+        except (KeyError, ValueError) as exc:
+            # Retrying cannot fix a malformed message
+            print(f"[Queue] dropping malformed message {record.get('messageId')}: {exc}")
+            continue
+        jobs.append(job)
+        message_ids.append(record["messageId"])
+
+    outcomes = []
+    if jobs:
+        accounts = load_target_accounts(runtime.config)
+        outcomes = publish_jobs(jobs, accounts, runtime=runtime, deadline=deadline.at if deadline is not None else None)
+    failures = [{"itemIdentifier": mid} for mid, outcome in zip(message_ids, outcomes) if outcome in RETRY_OUTCOMES]
+    print(f"[Queue] {len(records)} messages: {dict(Counter(outcomes))}, {len(failures)} to retry")
+    return {"batchItemFailures": failures}
+
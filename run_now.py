@@ -1,6 +1,15 @@
 import argparse
+import cProfile
+import os
+import pstats
+import sys
+import threading
 import time
+import tracemalloc
+from typing import List
 
+from app import cassette, tracing
+from app.deadline import Deadline
 from main import run_once
 
 SAMPLE_ITEMS = [
@@ -17,6 +26,83 @@ SAMPLE_ITEMS = [
 ]
 
 
+class MallocStages:
+    """Prints the allocation growth of each pipeline stage (tracemalloc snapshot diff at every stage end)."""
+
+    def __init__(self, top: int):
+        self.top = top
+        tracemalloc.start(25)
+        self.previous = self._snapshot()
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+
+    def __call__(self, stage: str) -> None:
+        snapshot = self._snapshot()
+        stats = snapshot.compare_to(self.previous, "lineno")
+        self.previous = snapshot
+        grown = sum(s.size_diff for s in stats)
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"[Malloc] {stage}: {grown / 1024:+.1f} KiB (current {current / 1024:.0f} KiB, peak {peak / 1024:.0f} KiB)")
+        for stat in stats[: self.top]:
+            print(f"  {stat}")
+
+    def close(self) -> None:
+        tracemalloc.stop()
+
+
+class ThreadProfiler:
+    """cProfile for the whole process: source, enrichment and publish work runs in thread pools.
+
+    Before Python 3.12 a cProfile.Profile only sees the thread that enabled it, so
+    every thread started while profiling gets its own profiler (enabled and
+    disabled inside the thread) and the stats are merged. From 3.12 cProfile
+    already covers all threads. Threads still running at the end (e.g. a source
+    abandoned at its deadline) are left out.
+    """
+
+    def __init__(self):
+        self.main = cProfile.Profile()
+        self.finished: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._original_run = None
+
+    def enable(self) -> None:
+        if sys.version_info < (3, 12):
+            original = self._original_run = threading.Thread.run
+            profiler = self
+
+            def _run(thread: threading.Thread) -> None:
+                prof = cProfile.Profile()
+                prof.enable()
+                try:
+                    original(thread)
+                finally:
+                    prof.disable()
+                    with profiler._lock:
+                        profiler.finished.append(prof)
+
+            threading.Thread.run = _run
+        self.main.enable()
+
+    def disable(self) -> None:
+        self.main.disable()
+        if self._original_run is not None:
+            threading.Thread.run = self._original_run
+            self._original_run = None
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.main)
+        with self._lock:
+            for prof in self.finished:
+                stats.add(prof)
+        return stats
+
+
 def main():
     parser = argparse.ArgumentParser(description="Run the LinkedIn/X poster immediately (test helper)")
     parser.add_argument("--dry-run", action="store_true", help="Do not post, only print outputs")
@@ -34,20 +120,95 @@ def main():
         action="store_true",
         help="Use built-in sample items to avoid API calls for instant testing",
     )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        metavar="SECONDS",
+        help="Give each run this many seconds, split into stage budgets like on Lambda",
+    )
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument(
+        "--record",
+        metavar="PATH",
+        help="Record all outbound HTTP and LLM responses to a cassette file",
+    )
+    cassette_group.add_argument(
+        "--replay",
+        metavar="PATH",
+        help="Replay a recorded cassette fully offline (no network, no rate-limit or breaker state)",
+    )
+    profiling = parser.add_argument_group("profiling")
+    profiling.add_argument(
+        "--profile",
+        nargs="?",
+        const="run_now.prof",
+        metavar="PATH",
+        help=(
+            "Run under cProfile (all threads, merged), dump stats to PATH (default: run_now.prof) "
+            "and print the top functions"
+        ),
+    )
+    profiling.add_argument(
+        "--trace-malloc",
+        action="store_true",
+        help="Print tracemalloc allocation diffs after each stage (fetch, rank, enrich, generate, publish)",
+    )
+    profiling.add_argument(
+        "--timeline",
+        nargs="?",
+        const="run_now.trace.json",
+        metavar="PATH",
+        help="Write a Chrome trace-event JSON of stage/source/account spans (default: run_now.trace.json)",
+    )
+    profiling.add_argument("--top", type=int, default=20, help="Rows in the profile and malloc summaries (default: 20)")
     args = parser.parse_args()
 
     override_items = SAMPLE_ITEMS if args.use_samples else None
 
-    for i in range(max(1, args.repeat)):
-        print(f"Run {i+1}/{args.repeat} (dry_run={args.dry_run})")
-        run_once(
-            dry_run=args.dry_run,
-            disable_reddit=args.no_reddit,
-            disable_x=args.no_x,
-            override_items=override_items,
-        )
-        if i < args.repeat - 1 and args.interval_seconds > 0:
-            time.sleep(args.interval_seconds)
+    if args.record:
+        cassette.activate(cassette.RECORD, args.record)
+    elif args.replay:
+        cassette.activate(cassette.REPLAY, args.replay)
+    elif os.getenv("HTTP_CASSETTE_MODE") and os.getenv("HTTP_CASSETTE_PATH"):
+        cassette.activate(os.environ["HTTP_CASSETTE_MODE"], os.environ["HTTP_CASSETTE_PATH"])
+
+    malloc = MallocStages(args.top) if args.trace_malloc else None
+    if malloc:
+        tracing.add_stage_listener(malloc)
+    if args.timeline:
+        tracing.start()
+    profiler = ThreadProfiler() if args.profile else None
+    if profiler:
+        profiler.enable()
+
+    try:
+        for i in range(max(1, args.repeat)):
+            print(f"Run {i+1}/{args.repeat} (dry_run={args.dry_run})")
+            run_once(
+                dry_run=args.dry_run,
+                disable_reddit=args.no_reddit,
+                disable_x=args.no_x,
+                override_items=override_items,
+                deadline=Deadline(args.deadline) if args.deadline else None,
+            )
+            if i < args.repeat - 1 and args.interval_seconds > 0:
+                time.sleep(args.interval_seconds)
+    finally:
+        if profiler:
+            profiler.disable()
+            stats = profiler.stats()
+            stats.dump_stats(args.profile)
+            threads = 1 + len(profiler.finished)
+            print(f"[Profile] stats of {threads} threads written to {args.profile} (inspect with: python -m pstats {args.profile})")
+            stats.strip_dirs().sort_stats("cumulative").print_stats(args.top)
+        if args.timeline:
+            events = tracing.stop()
+            tracing.save(args.timeline, events)
+            print(f"[Timeline] {len(events)} spans written to {args.timeline} (open in chrome://tracing or ui.perfetto.dev)")
+        if malloc:
+            tracing.remove_stage_listener(malloc)
+            malloc.close()
+        cassette.deactivate()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+import argparse
+import multiprocessing
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from app.config import get_config
+from app.deadline import SAFETY_SECONDS, Deadline
+from app.db_mongo import fetch_tenants
+from app.runtime import RuntimeContext
+from app.sources import SourceResult, build_sources, gather_sources, merge_results
+from app.tenants import SHARED_SOURCES, items_for_tenant, shared_fetch_config, tenant_config
+from main import generate_posts, publish_posts
+
+
+def fetch_shared(tenant_configs: List[Any]) -> Dict[str, List[Dict]]:
+    """Fetch Reddit/RSS/Hacker News once for every tenant. Returns items per source name."""
+    cfg = shared_fetch_config(get_config(), tenant_configs)
+    rt = RuntimeContext(cfg)
+    _, results = gather_sources(
+        build_sources(rt, cfg.sources),
+        strategy="all",
+        deadline_seconds=cfg.source_deadline_seconds,
+    )
+    return {res.name: res.items for res in results}
+
+
+def _tenant_worker(doc: Dict[str, Any], shared: Dict[str, List[Dict]], timeout: float, dry_run: bool, conn) -> None:
+    """Entry point of one tenant's process: fetch its own sources, generate and publish."""
+    summary: Dict[str, Any] = {"tenant_id": doc["tenant_id"], "status": "ok"}
+    # Finish (or record pending) before the parent terminates the process
+    deadline = Deadline(timeout - SAFETY_SECONDS)
+    try:
+        cfg = tenant_config(get_config(), doc)
+        rt = RuntimeContext(cfg)
+        own = [name for name in cfg.sources if name not in SHARED_SOURCES]
+        _, own_results = gather_sources(
+            build_sources(rt, own),
+            strategy="all",
+            deadline_seconds=min(cfg.source_deadline_seconds, deadline.budget("fetch")),
+        )
+        by_name = {res.name: res for res in own_results}
+        for name, items in items_for_tenant(cfg, shared).items():
+            by_name[name] = SourceResult(name, items)
+        # Merge in the tenant's source priority order
+        results = [by_name[name] for name in cfg.sources if name in by_name]
+        items = merge_results(results, cfg.source_strategy, cfg.source_quota)
+        summary["candidates"] = len(items)
+        if items:
+            posts = generate_posts(rt, items, deadline=deadline)
+            summary["posts"] = len(posts)
+            if posts and not dry_run:
+                publish_posts(rt, posts, deadline=deadline)
+    except Exception as exc:
+        summary.update(status="error", error=str(exc))
+    conn.send(summary)
+    conn.close()
+
+
+def run_tenants(
+    docs: List[Dict[str, Any]],
+    *,
+    max_workers: int = 4,
+    default_timeout: float = 300.0,
+    dry_run: bool = False,
+) -> List[Dict[str, Any]]:
+    """Run every tenant in its own process, at most max_workers at a time.
+
+    A tenant that exceeds its timeout is terminated; a crash in one tenant does
+    not affect the others. Unless dry_run, tenants without accounts are skipped.
+    """
+    base = get_config()
+    if not dry_run:
+        # A tenant without accounts of its own has nowhere to publish
+        for doc in [d for d in docs if not d.get("accounts")]:
+            print(f"[Tenants] skipping {doc['tenant_id']}: no accounts in its tenant document")
+        docs = [d for d in docs if d.get("accounts")]
+    if not docs:
+        return []
+    shared = fetch_shared([tenant_config(base, d) for d in docs])
+
+    # spawn: children must not inherit the parent's Mongo client or HTTP connection pools
+    ctx = multiprocessing.get_context("spawn")
+    queue = list(docs)
+    running: Dict[str, Any] = {}
+    summaries: List[Dict[str, Any]] = []
+    while queue or running:
+        while queue and len(running) < max_workers:
+            doc = queue.pop(0)
+            parent_conn, child_conn = ctx.Pipe(duplex=False)
+            timeout = float(doc.get("timeout_seconds") or default_timeout)
+            proc = ctx.Process(
+                target=_tenant_worker,
+                args=(doc, shared, timeout, dry_run, child_conn),
+                name=f"tenant-{doc['tenant_id']}",
+            )
+            proc.start()
+            child_conn.close()
+            running[doc["tenant_id"]] = (proc, parent_conn, time.monotonic() + timeout)
+
+        for tenant_id, (proc, conn, deadline) in list(running.items()):
+            summary: Optional[Dict[str, Any]] = None
+            if conn.poll():
+                try:
+                    summary = conn.recv()
+                except EOFError:
+                    pass
+                proc.join(5)
+            elif not proc.is_alive():
+                summary = {"tenant_id": tenant_id, "status": "crashed", "exitcode": proc.exitcode}
+            elif time.monotonic() > deadline:
+                proc.terminate()
+                proc.join(5)
+                summary = {"tenant_id": tenant_id, "status": "timeout"}
+            if summary is not None:
+                if proc.is_alive():
+                    proc.kill()
+                conn.close()
+                del running[tenant_id]
+                summaries.append(summary)
+                print(f"[Tenants] {summary}")
+        time.sleep(0.2)
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline for every enabled tenant in the tenants collection")
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("TENANT_CONCURRENCY", "4")),
+        help="Tenant processes at a time (default: TENANT_CONCURRENCY or 4)",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=float(os.getenv("TENANT_TIMEOUT_SECONDS", "300")),
+        help="Seconds before a tenant is stopped, unless the tenant sets timeout_seconds (default: 300)",
+    )
+    parser.add_argument("--tenant", action="append", help="Only run this tenant_id (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Generate but do not publish")
+    args = parser.parse_args()
+
+    docs = fetch_tenants()
+    if args.tenant:
+        docs = [d for d in docs if d.get("tenant_id") in set(args.tenant)]
+    if not docs:
+        print("[Tenants] No enabled tenants")
+        return
+    if not args.dry_run:
+        RuntimeContext().ensure_database()
+    summaries = run_tenants(docs, max_workers=args.workers, default_timeout=args.timeout, dry_run=args.dry_run)
+    failed = [s for s in summaries if s.get("status") != "ok"]
+    print(f"[Tenants] done: {len(summaries) - len(failed)} ok, {len(failed)} failed")
+
+
+if __name__ == "__main__":
+    main()
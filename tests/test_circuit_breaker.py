@@ -0,0 +1,42 @@
+"""Which publish errors count as an outage for the circuit breaker."""
+import pytest
+
+from app.circuit_breaker import is_outage_error
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        "X error: 503 Service Unavailable",
+        "LinkedIn error: 500 Internal Server Error",
+        "X error: 401 Unauthorized",
+        'X error: 403 {"title":"Unsupported Authentication","detail":"Authenticating with OAuth 2.0 '
+        'Application-Only is forbidden for this endpoint.","type":"https://api.twitter.com/2/problems/'
+        'unsupported-authentication","status":403}',
+        'X error: 403 {"detail":"Your client app is not configured with the appropriate oauth1 app permissions '
+        'for this endpoint. See the developer policy.","status":403}',
+        'LinkedIn error: 403 {"serviceErrorCode":100,"message":"Not enough permissions to access: '
+        'ugcPosts.CREATE.NO_VERSION","status":403} Content-Type: application/json',
+        "403 Forbidden\n453 - You currently have access to a subset of X API endpoints",
+        "HTTPSConnectionPool(host='api.x.com', port=443): Read timed out. (read timeout=20)",
+    ],
+)
+def test_outages(error):
+    assert is_outage_error(error)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        None,
+        "",
+        "rate limited: X create tweet budget exhausted, resets in 300s",
+        'X error: 403 {"detail":"You are not allowed to create a Tweet with duplicate content.","status":403}',
+        "403 Forbidden\n187 - Status is a duplicate.",
+        'LinkedIn error: 403 {"message":"Content is a duplicate of urn:li:share:123","status":403}',
+        'LinkedIn error: 422 {"message":"Content is a duplicate of urn:li:share:123","status":422}',
+        "X error: 400 text mentions 503 followers",
+    ],
+)
+def test_not_outages(error):
+    assert not is_outage_error(error)
@@ -0,0 +1,77 @@
+"""pending_jobs / fetch_pending_posts against an in-memory collection (mongomock)."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db_mongo, publisher
+from app.config import account_from_dict
+
+mongomock = pytest.importorskip("mongomock")
+
+NO_CREDENTIALS = account_from_dict({"account_id": "acme"})
+LINKEDIN_ONLY = account_from_dict({"account_id": "acme", "linkedin_access_token": "li-token"})
+
+
+@pytest.fixture
+def posts(monkeypatch):
+    col = mongomock.MongoClient().db.posts
+    monkeypatch.setattr(db_mongo, "get_mongo_collection", lambda: col)
+    return col
+
+
+def _pending(col, url, platform, error, age_minutes):
+    created = datetime.utcnow() - timedelta(minutes=age_minutes)
+    col.insert_one(
+        {
+            "account_id": "acme",
+            "platform": platform,
+            "source_url": url,
+            "source": "reddit",
+            "title": url,
+            "linkedin_text": f"text for {url}",
+            "x_text": f"text for {url}",
+            "posted_at": None,
+            "error": error,
+            "created_at": created,
+            "updated_at": created,
+        }
+    )
+
+
+def _stuck_and_deferred(col, limit):
+    # More never-changing missing-credential records than the limit, all older than the deferred one
+    for i in range(limit + 2):
+        _pending(col, f"https://example.com/missing-{i}", "linkedin", "pending: missing LinkedIn credentials", 100 - i)
+        _pending(col, f"https://example.com/missing-{i}", "x", "pending: missing X credentials", 100 - i)
+    _pending(col, "https://example.com/deferred", "x", "pending: run deadline reached", 10)
+
+
+def test_missing_credentials_do_not_starve_deferred_records(posts):
+    _stuck_and_deferred(posts, limit=3)
+
+    jobs = publisher.pending_jobs([NO_CREDENTIALS], limit=3)
+
+    assert [(j["platform"], j["post"]["url"]) for j in jobs] == [("x", "https://example.com/deferred")]
+    assert jobs[0]["post"]["x"] == "text for https://example.com/deferred"
+
+
+def test_missing_credentials_are_retried_once_the_account_has_them(posts):
+    _stuck_and_deferred(posts, limit=3)
+
+    jobs = publisher.pending_jobs([LINKEDIN_ONLY], limit=3)
+
+    # Oldest LinkedIn records first; the X ones still have no credentials
+    assert [(j["platform"], j["post"]["url"]) for j in jobs] == [
+        ("linkedin", "https://example.com/missing-0"),
+        ("linkedin", "https://example.com/missing-1"),
+        ("linkedin", "https://example.com/missing-2"),
+    ]
+
+
+def test_circuit_open_records_are_retried(posts):
+    _pending(posts, "https://example.com/open", "linkedin", "pending: LinkedIn circuit open", 5)
+    _pending(posts, "https://example.com/failed", "linkedin", "LinkedIn error: 500", 5)
+
+    jobs = publisher.pending_jobs([NO_CREDENTIALS], limit=3)
+
+    assert [j["post"]["url"] for j in jobs] == ["https://example.com/open"]
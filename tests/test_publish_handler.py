@@ -0,0 +1,207 @@
+"""publish_handler.handler driven through LocalQueue, with Mongo, the breaker and the platform calls stubbed."""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import publish_handler
+from app import publish_queue, publisher
+from app.config import account_from_dict
+
+ACCOUNT = account_from_dict(
+    {
+        "account_id": "acme",
+        "linkedin_access_token": "li-token",
+        "x_api_key": "k",
+        "x_api_secret": "s",
+        "x_access_token": "t",
+        "x_access_token_secret": "ts",
+    }
+)
+POST = {
+    "source": "reddit",
+    "title": "New model released",
+    "url": "https://example.com/model",
+    "linkedin": "A new model is out.\n\nSource: https://example.com/model",
+    "x": "A new model is out https://example.com/model",
+}
+
+
+class Buffer:
+    """Stands in for PostWriteBuffer; record_post is stubbed, so nothing is buffered."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class Lambda:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+@pytest.fixture
+def platforms(monkeypatch):
+    """Stubbed platform calls; set .linkedin / .x to the (success, error, post_id) each returns."""
+    state = SimpleNamespace(
+        linkedin=(True, None, "urn:li:share:1"),
+        x=(True, None, "1"),
+        calls=[],
+        pending=[],
+        finalized=[],
+        circuit_open=False,
+    )
+
+    def post_linkedin(**kwargs):
+        state.calls.append("linkedin")
+        return state.linkedin
+
+    def post_x(**kwargs):
+        state.calls.append("x")
+        return state.x
+
+    def record_post(**kwargs):
+        state.pending.append((kwargs["platform"], kwargs["error"]))
+
+    def finalize_post(**kwargs):
+        state.finalized.append((kwargs["platform"], kwargs["success"], kwargs.get("pending", False)))
+        return True
+
+    runtime = SimpleNamespace(
+        config=SimpleNamespace(),
+        ensure_healthy=lambda: None,
+        ensure_database=lambda: None,
+        x_post_client=lambda account: None,
+        reset=lambda name=None: None,
+    )
+    monkeypatch.setattr(publish_handler, "get_runtime", lambda: (runtime, False))
+    monkeypatch.setattr(publish_handler, "load_target_accounts", lambda cfg: [ACCOUNT])
+    monkeypatch.setattr(publisher, "post_linkedin", post_linkedin)
+    monkeypatch.setattr(publisher, "post_x", post_x)
+    monkeypatch.setattr(publisher, "load_post_states", lambda account_ids, urls: {})
+    monkeypatch.setattr(publisher, "PostWriteBuffer", Buffer)
+    monkeypatch.setattr(publisher, "record_post", record_post)
+    monkeypatch.setattr(publisher, "claim_post", lambda **kwargs: True)
+    monkeypatch.setattr(publisher, "finalize_post", finalize_post)
+    monkeypatch.setattr(
+        publisher.circuit_breaker,
+        "allow_request",
+        lambda platform, credential: (not state.circuit_open, "open" if state.circuit_open else "closed"),
+    )
+    monkeypatch.setattr(publisher.circuit_breaker, "record_result", lambda *args, **kwargs: None)
+    return state
+
+
+def _queue(max_receives=3, jobs=None):
+    queue = publish_queue.LocalQueue(batch_size=10, max_receives=max_receives)
+    unsent = publish_queue.enqueue(queue, publish_queue.LOCAL_URL, jobs or publish_queue.make_jobs([POST], [ACCOUNT]))
+    assert unsent == []
+    return queue
+
+
+def _platform(msg):
+    return json.loads(msg["body"])["platform"]
+
+
+def test_all_jobs_posted(platforms):
+    queue = _queue()
+
+    assert queue.deliver(publish_handler.handler) == 0
+    assert sorted(platforms.calls) == ["linkedin", "x"]
+    assert queue.deleted == 2 and len(queue) == 0
+
+
+def test_partial_batch_failure_retries_only_failed_job(platforms):
+    platforms.x = (False, "X error: 503 Service Unavailable", None)
+    queue = _queue()
+
+    assert queue.deliver(publish_handler.handler) == 1
+    assert queue.deleted == 1
+    assert [_platform(m) for m in queue.visible] == ["x"]
+
+    platforms.x = (True, None, "1")
+    assert queue.deliver(publish_handler.handler) == 0
+    assert platforms.calls == ["linkedin", "x", "x"]
+    assert queue.deleted == 2 and len(queue) == 0
+
+
+def test_failing_job_goes_to_dead_letters_after_max_receives(platforms):
+    platforms.x = (False, "X error: 503 Service Unavailable", None)
+    queue = _queue(max_receives=3)
+
+    summary = queue.drain(publish_handler.handler)
+
+    assert summary == {"batches": 3, "deleted": 1, "dead_letters": 1}
+    assert platforms.calls.count("x") == 3
+    assert platforms.calls.count("linkedin") == 1
+    assert [_platform(m) for m in queue.dead_letters] == ["x"]
+    assert queue.dead_letters[0]["receives"] == 3
+
+
+def test_malformed_bodies_are_dropped_not_retried(platforms):
+    queue = _queue()
+    queue.send_message_batch(
+        QueueUrl=publish_queue.LOCAL_URL,
+        Entries=[{"Id": "0", "MessageBody": "not json"}, {"Id": "1", "MessageBody": "{\"platform\": "}],
+    )
+
+    assert queue.deliver(publish_handler.handler) == 0
+    assert queue.deleted == 4 and len(queue) == 0
+    assert sorted(platforms.calls) == ["linkedin", "x"]
+
+
+def test_unknown_account_is_dropped(platforms):
+    queue = _queue(jobs=[{"account_id": "someone-else", "platform": "x", "post": POST}])
+
+    assert queue.deliver(publish_handler.handler) == 0
+    assert platforms.calls == []
+    assert queue.deleted == 1
+
+
+def test_deferred_by_deadline_is_recorded_pending_and_retried(platforms):
+    queue = _queue()
+    # 10 s left, minus the safety margin, is below PUBLISH_RESERVE_SECONDS: nothing may start
+    context = Lambda(remaining_ms=10_000)
+
+    assert queue.deliver(publish_handler.handler, context) == 2
+    assert platforms.calls == []
+    assert sorted(platforms.pending) == [
+        ("linkedin", "pending: run deadline reached"),
+        ("x", "pending: run deadline reached"),
+    ]
+    assert len(queue) == 2
+
+    assert queue.deliver(publish_handler.handler, Lambda(remaining_ms=600_000)) == 0
+    assert sorted(platforms.calls) == ["linkedin", "x"]
+    assert len(queue) == 0
+
+
+def test_open_circuit_is_retried(platforms):
+    platforms.circuit_open = True
+    queue = _queue()
+
+    assert queue.deliver(publish_handler.handler) == 2
+    assert platforms.calls == []
+    assert sorted(platforms.finalized) == [("linkedin", False, True), ("x", False, True)]
+
+    platforms.circuit_open = False
+    assert queue.deliver(publish_handler.handler) == 0
+    assert sorted(platforms.calls) == ["linkedin", "x"]
+
+
+def test_missing_credentials_are_not_retried(platforms, monkeypatch):
+    monkeypatch.setattr(publish_handler, "load_target_accounts", lambda cfg: [account_from_dict({"account_id": "acme"})])
+    queue = _queue()
+
+    assert queue.deliver(publish_handler.handler) == 0
+    assert platforms.calls == []
+    assert sorted(error for _, error in platforms.pending) == [
+        "pending: missing LinkedIn credentials",
+        "pending: missing X credentials",
+    ]
+    assert queue.deleted == 2